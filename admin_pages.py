@@ -0,0 +1,199 @@
+"""
+এডমিনের লিস্ট (withdraw / task / user) — keyset pagination, এক পেজ = একটা মেসেজ।
+◀️/▶️ চাপলে একই মেসেজ edit হয়; কার্সর হলো পেজের প্রথম/শেষ id, তাই হাজারতম পেজও
+প্রথম পেজের মতোই সস্তা (OFFSET নেই)। ফিল্টার (status / method / user) callback_data তেই থাকে।
+"""
+from collections import namedtuple
+
+from sqlalchemy import text
+from telebot import types
+
+import ledger
+import task_ingest
+from router import callback_data
+
+BULK_CODE = "tb"  # পেজের সব Pending টাস্ক approve/reject (নিশ্চিত করার পরে)
+PAGE_CODE = "pg"
+
+# callback_data: "1pg:<view>:<dir>:<cursor>:<status>:<method>:<user>" — খালি ঘর "-"
+PageFilter = namedtuple("PageFilter", "view status method user")
+Page = namedtuple("Page", "rows has_newer has_older")
+
+STATUSES = {"P": "Pending", "A": "Approved", "R": "Rejected"}
+METHODS = {"b": "📲 Bkash", "n": "📲 Nagad"}
+
+
+def _balance_sql(user_col, snapshot_col):
+    return f"COALESCE({snapshot_col},0) + {ledger.pending_delta_sql(user_col)}"
+
+
+# view -> (SELECT ... FROM ..., key column, কোন ফিল্টার চলে)
+_VIEWS = {
+    "w": ("SELECT w.id, w.user_id, w.method, w.number, w.amount, w.status FROM withdraws w",
+          "w.id", ("status", "method", "user")),
+    "t": (f"""SELECT t.id, t.user_id, t.username, {_balance_sql("t.user_id", "u.balance")}, t.status,
+                     t.parse_status, t.row_count, t.payout, t.dup_rows, t.duplicate_of
+              FROM tasks t LEFT JOIN users u ON u.user_id = t.user_id""",
+          "t.id", ("status", "user")),
+    # users এ user ফিল্টার = ঐ ইউজারের রেফার করা ইউজাররা
+    "u": (f"SELECT u.user_id, {_balance_sql('u.user_id', 'u.balance')} FROM users u",
+          "u.user_id", ("user",)),
+}
+
+_FILTER_SQL = {
+    ("w", "status"): "w.status = :status", ("w", "method"): "w.method = :method", ("w", "user"): "w.user_id = :user",
+    ("t", "status"): "t.status = :status", ("t", "user"): "t.user_id = :user",
+    ("u", "user"): "u.refer_by = :user",
+}
+
+
+def encode(flt: PageFilter, direction: str, cursor) -> str:
+    return callback_data(PAGE_CODE, flt.view, direction, cursor if cursor is not None else "-",
+                         flt.status or "-", flt.method or "-", flt.user if flt.user is not None else "-")
+
+
+def decode(payload: str):
+    """return (PageFilter, direction, cursor)"""
+    view, direction, cursor, status, method, user = payload.split(":")
+    none = lambda v: None if v == "-" else v
+    flt = PageFilter(view, none(status), none(method), int(user) if user != "-" else None)
+    return flt, direction, int(cursor) if cursor != "-" else None
+
+
+def fetch(conn, flt: PageFilter, cursor=None, direction="o", size=10) -> Page:
+    """
+    direction "o" = পুরনোর দিকে (key < cursor, DESC), "n" = নতুনের দিকে (key > cursor, ASC তারপর উল্টে)।
+    size+1 টা এনে দেখা হয় আরও আছে কি না — COUNT লাগে না।
+    """
+    select_sql, key, allowed = _VIEWS[flt.view]
+    conds, params = [], {"lim": size + 1}
+    if flt.status and "status" in allowed:
+        conds.append(_FILTER_SQL[(flt.view, "status")])
+        params["status"] = STATUSES[flt.status]
+    if flt.method and "method" in allowed:
+        conds.append(_FILTER_SQL[(flt.view, "method")])
+        params["method"] = METHODS[flt.method]
+    if flt.user is not None and "user" in allowed:
+        conds.append(_FILTER_SQL[(flt.view, "user")])
+        params["user"] = flt.user
+    if cursor is not None:
+        conds.append(f"{key} {'<' if direction == 'o' else '>'} :cursor")
+        params["cursor"] = cursor
+    where = (" WHERE " + " AND ".join(conds)) if conds else ""
+    order = "DESC" if direction == "o" else "ASC"
+    rows = conn.execute(text(f"{select_sql}{where} ORDER BY {key} {order} LIMIT :lim"), params).fetchall()
+
+    more = len(rows) > size
+    rows = rows[:size]
+    if direction == "o":
+        return Page(rows, has_newer=cursor is not None, has_older=more)
+    if not more:
+        # একদম উপরে পৌঁছে গেছি — পূর্ণ প্রথম পেজ দেখাও
+        return fetch(conn, flt, None, "o", size)
+    rows.reverse()
+    return Page(rows, has_newer=True, has_older=True)
+
+
+# ==============================
+# RENDER
+# ==============================
+_TITLES = {"w": "💳 Withdraw Requests", "t": "🗂️ Tasks", "u": "👥 Users"}
+_STATUS_ICON = {"Pending": "⏳", "Approved": "✅", "Rejected": "❌"}
+_EMPTY = {"w": "📭 কোনো রিকোয়েস্ট পাওয়া যায়নি।", "t": "📭 কোনো টাস্ক নেই।", "u": "📭 এখনো কোনো ইউজার নেই।"}
+
+
+def _line(view, row):
+    if view == "w":
+        wid, uid, method, number, amount, status = row
+        return f"{_STATUS_ICON.get(status, '')} 🆔 {wid} | 👤 {uid} | {method} ({number}) | 💵 {amount}৳"
+    if view == "t":
+        tid, uid, uname, bal, status, parse_status, rows, payout, dups, duplicate_of = row
+        line = f"{_STATUS_ICON.get(status, '')} #{tid} | 👤 {uid} @{uname or '—'} | 💰 {bal}৳"
+        if parse_status == task_ingest.STATUS_PARSED:
+            line += f" | 📊 {rows} → {float(payout or 0):g}৳"
+        if dups:
+            line += f" | 🔁 {dups}"
+        if duplicate_of:
+            line += f" | ♻️ #{duplicate_of}"
+        return line
+    uid, bal = row
+    return f"🆔 {uid} | 💰 Balance: {bal}৳"
+
+
+def _describe(flt: PageFilter):
+    parts = []
+    if flt.status:
+        parts.append(STATUSES[flt.status])
+    if flt.method:
+        parts.append(METHODS[flt.method])
+    if flt.user is not None:
+        parts.append(f"রেফার করেছে {flt.user}" if flt.view == "u" else f"👤 {flt.user}")
+    return " · ".join(parts) if parts else "সব"
+
+
+def render(flt: PageFilter, page: Page, header=""):
+    """return (text, reply_markup JSON)"""
+    lines = [f"{_TITLES[flt.view]} — {_describe(flt)}"]
+    if header:
+        lines.append(header)
+    lines.append("")
+    if page.rows:
+        lines.extend(_line(flt.view, r) for r in page.rows)
+    else:
+        lines.append(_EMPTY[flt.view])
+
+    ikb = types.InlineKeyboardMarkup()
+    # কার্ড খোলার বাটন (withdraw/task) — আগের মতো Approve/Reject কার্ডটাই আলাদা মেসেজে আসে
+    if flt.view in ("w", "t") and page.rows:
+        code = "wc" if flt.view == "w" else "tc"
+        ikb.add(*[types.InlineKeyboardButton(f"🔍 {r[0]}", callback_data=callback_data(code, r[0]))
+                  for r in page.rows], row_width=5)
+    if flt.view == "t" and flt.status == "P" and page.rows:
+        ids = [r[0] for r in page.rows]
+        sel = (min(ids), max(ids), flt.user if flt.user is not None else "-")
+        ikb.row(types.InlineKeyboardButton("✅ পেজের সব", callback_data=callback_data(BULK_CODE, "a", *sel)),
+                types.InlineKeyboardButton("❌ পেজের সব", callback_data=callback_data(BULK_CODE, "r", *sel)))
+
+    nav = []
+    if page.has_newer:
+        nav.append(types.InlineKeyboardButton("◀️", callback_data=encode(flt, "n", page.rows[0][0])))
+    nav.append(types.InlineKeyboardButton("🔄", callback_data=encode(flt, "o", None)))
+    if page.has_older:
+        nav.append(types.InlineKeyboardButton("▶️", callback_data=encode(flt, "o", page.rows[-1][0])))
+    ikb.row(*nav)
+
+    _, _, allowed = _VIEWS[flt.view]
+    if "status" in allowed:
+        ikb.row(*[types.InlineKeyboardButton(("• " if flt.status == k else "") + v,
+                                             callback_data=encode(flt._replace(status=k), "o", None))
+                  for k, v in [*STATUSES.items(), (None, "সব")]])
+    if "method" in allowed:
+        ikb.row(*[types.InlineKeyboardButton(("• " if flt.method == k else "") + v,
+                                             callback_data=encode(flt._replace(method=k), "o", None))
+                  for k, v in [*METHODS.items(), (None, "সব মেথড")]])
+    return "\n".join(lines), ikb.to_json()
+
+
+COMMAND_USAGE = (
+    "/withdraws [pending|approved|rejected] [bkash|nagad] [user_id]\n"
+    "/tasks [pending|approved|rejected] [user_id]\n"
+    "/users [referrer_id]\n"
+    "/approve_tasks, /reject_tasks — /approve_tasks লিখলে বিস্তারিত\n"
+    "/sqlprofile [on|off|reset] — DB কুয়েরি প্রোফাইল"
+)
+
+
+def parse_command(view: str, args):
+    """কমান্ডের আর্গুমেন্ট থেকে ফিল্টার (COMMAND_USAGE দেখো); অচেনা কিছু থাকলে ValueError"""
+    status = method = user = None
+    for a in args:
+        low = a.lower()
+        if low.isdigit():
+            user = int(low)
+        elif low[:1].upper() in STATUSES and STATUSES[low[:1].upper()].lower() == low:
+            status = low[:1].upper()
+        elif low in ("bkash", "nagad"):
+            method = low[0]
+        else:
+            raise ValueError(a)
+    return PageFilter(view, status, method, user)
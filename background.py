@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    interval সেকেন্ড পরপর fn() চালায় একটা daemon thread এ।
+    fork-safe: ensure_started() যে process এ ডাকা হয় সেখানেই thread চালু হয়
+    (gunicorn preload এর পরে master এ নয়, worker এ)।
+    """
+
+    def __init__(self, name, interval, fn):
+        self.name = name
+        self.interval = float(interval)
+        self.fn = fn
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._counts = {"runs": 0, "failed": 0}
+        self.last_result = None
+        self.last_duration = 0.0
+        self.last_error = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or self.interval <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name=f"periodic-{self.name}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def trigger(self):
+        """পরের interval এর অপেক্ষা না করে এখনই একবার চালাও"""
+        self._wake.set()
+
+    def run_once(self):
+        started = time.monotonic()
+        try:
+            self.last_result = self.fn()
+            self.last_error = None
+        except Exception as e:
+            self._counts["failed"] += 1
+            self.last_error = repr(e)
+            log.exception("periodic task %s failed", self.name)
+        finally:
+            self._counts["runs"] += 1
+            self.last_duration = time.monotonic() - started
+        return self.last_result
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.run_once()
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            **self._counts,
+            "last_result": self.last_result,
+            "last_duration_ms": round(self.last_duration * 1000, 2),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,146 @@
+"""
+ব্যালেন্স অপারেশন — প্রতিটা একটাই SQL স্টেটমেন্ট (একটা round trip)।
+সব পরিবর্তন ledger এ INSERT; শুধু ব্যালেন্স চেক করে কাটার পথে আগে users রো লক লাগে (ledger.lock_user)।
+সব ফাংশন চলমান connection/transaction নেয়; commit caller এর দায়িত্ব।
+"""
+from sqlalchemy import text
+
+import ledger
+import referrals
+
+REF_BONUS_RATE = 0.03
+
+
+def ref_bonus(delta: int) -> int:
+    return int(delta * REF_BONUS_RATE) if delta > 0 else 0
+
+
+def create_withdraw(conn, uid: int, method: str, number: str, amount: int):
+    """
+    ব্যালেন্স (snapshot + pending) যথেষ্ট হলে withdraw রো আর -amount লেজার এন্ট্রি বানায়।
+    return (withdraw_id, new_balance) — ব্যালেন্স কম হলে (None, current_balance)
+    """
+    if not ledger.lock_user(conn, uid):
+        return None, 0
+    row = conn.execute(text(f"""
+        WITH cur AS (
+            SELECT COALESCE(u.balance,0) + COALESCE(p.delta,0) AS balance
+            FROM users u
+            LEFT JOIN ({ledger.PENDING_SQL}) p ON p.user_id = u.user_id
+            WHERE u.user_id = :uid
+        ), w AS (
+            INSERT INTO withdraws (user_id, method, number, amount, status)
+            SELECT :uid, :m, :n, :a, 'Pending' FROM cur WHERE cur.balance >= :a
+            RETURNING id
+        ), l AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT :uid, -:a, :k, id FROM w
+        )
+        SELECT (SELECT id FROM w), cur.balance FROM cur
+    """), {"uid": uid, "m": method, "n": number, "a": amount, "k": ledger.KIND_WITHDRAW}).fetchone()
+    withdraw_id, balance = row
+    return (withdraw_id, balance - amount) if withdraw_id is not None else (None, balance)
+
+
+def decide_withdraw(conn, req_id: int, approve: bool):
+    """
+    Pending withdraw কে Approved/Rejected করে; reject হলে একই স্টেটমেন্টে রিফান্ড এন্ট্রি।
+    return (user_id, amount, method) — আগেই প্রসেস হয়ে গেলে বা না থাকলে None
+    """
+    row = conn.execute(text("""
+        WITH w AS (
+            UPDATE withdraws SET status = :st
+            WHERE id = :id AND status = 'Pending'
+            RETURNING id, user_id, amount, method
+        ), refund AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT user_id, amount, :k, id FROM w WHERE NOT :approve
+        )
+        SELECT w.user_id, w.amount, w.method FROM w
+    """), {"id": req_id, "st": "Approved" if approve else "Rejected", "approve": approve,
+           "k": ledger.KIND_WITHDRAW_REFUND}).fetchone()
+    return tuple(row) if row else None
+
+
+def credit_with_ref_bonus(conn, uid: int, amount: int, kind=ledger.KIND_ADMIN_ADD):
+    """
+    ইউজারকে amount আর রেফারার থাকলে তাকে 3% — দুটো লেজার এন্ট্রি, একসাথে।
+    return (referrer_id, bonus) — ইউজার না থাকলে None
+    """
+    bonus = ref_bonus(amount)
+    row = conn.execute(text("""
+        WITH t AS (
+            SELECT user_id, refer_by FROM users WHERE user_id = :uid
+        ), credit AS (
+            INSERT INTO balance_ledger (user_id, delta, kind)
+            SELECT user_id, :a, :k FROM t
+        ), r AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT refer_by, :b, :rk, user_id FROM t
+            WHERE refer_by IS NOT NULL AND :b > 0
+            RETURNING user_id
+        )
+        SELECT (SELECT user_id FROM r) FROM t
+    """), {"uid": uid, "a": amount, "k": kind, "b": bonus, "rk": ledger.KIND_REF_BONUS}).fetchone()
+    if not row:
+        return None
+    return row[0], bonus if row[0] else 0
+
+
+def set_balance_with_ref_bonus(conn, uid: int, new_balance: int):
+    """
+    ব্যালেন্স সেট = (নতুন - বর্তমান) ডেল্টা এন্ট্রি; বাড়লে বৃদ্ধির 3% রেফারারকে।
+    বর্তমান ব্যালেন্স লকের পরে পড়া হয় — মাঝখানে অন্য লেখা ঢুকতে পারে না।
+    return (old_balance, referrer_id, bonus) — ইউজার না থাকলে None
+    """
+    if not ledger.lock_user(conn, uid):
+        return None
+    row = conn.execute(text(f"""
+        WITH old AS (
+            SELECT u.refer_by, COALESCE(u.balance,0) + COALESCE(p.delta,0) AS balance
+            FROM users u
+            LEFT JOIN ({ledger.PENDING_SQL}) p ON p.user_id = u.user_id
+            WHERE u.user_id = :uid
+        ), t AS (
+            INSERT INTO balance_ledger (user_id, delta, kind)
+            SELECT :uid, :nb - balance, :k FROM old WHERE balance <> :nb
+        ), b AS (
+            SELECT refer_by, FLOOR((:nb - balance) * :rate)::int AS bonus FROM old
+        ), r AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT refer_by, bonus, :rk, :uid FROM b
+            WHERE refer_by IS NOT NULL AND bonus > 0
+            RETURNING user_id, delta
+        )
+        SELECT old.balance, (SELECT user_id FROM r), COALESCE((SELECT delta FROM r), 0) FROM old
+    """), {"uid": uid, "nb": new_balance, "rate": REF_BONUS_RATE,
+           "k": ledger.KIND_ADMIN_SET, "rk": ledger.KIND_REF_BONUS}).fetchone()
+    return (row[0], row[1], row[2]) if row else None
+
+
+def debit(conn, uid: int, amount: int):
+    """এডমিনের reduce — ব্যালেন্স নেগেটিভ হতে পারে (আগের আচরণ), তাই লক ছাড়াই শুধু INSERT"""
+    ledger.post(conn, uid, -amount, ledger.KIND_ADMIN_REDUCE)
+
+
+def attach_referrer(conn, uid: int, referrer_id: int) -> bool:
+    """
+    refer_by খালি থাকলে সেট করে, আর রেফারারের জন্য +1৳ ref_join এন্ট্রি
+    (ref_count/ref_earn materializer বাড়ায়; রেফারারের রো না থাকলে সেও বানায়)।
+    একই স্টেটমেন্টে referral_closure এ নতুন জোড়াগুলো; uid আগে থেকেই রেফারারের উপরে থাকলে (চক্র) attach হয় না।
+    return True যদি এইবার attach হলো
+    """
+    referrals.lock_chain(conn, uid, referrer_id)
+    row = conn.execute(text(f"""
+        WITH att AS (
+            UPDATE users SET refer_by = :rid
+            WHERE user_id = :uid AND refer_by IS NULL AND {referrals.NO_CYCLE}
+            RETURNING user_id
+        ), bump AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT :rid, 1, :k, user_id FROM att
+            RETURNING id
+        ), closure AS ({referrals.CLOSURE_INSERT})
+        SELECT count(*) FROM bump
+    """), {"uid": uid, "rid": referrer_id, "k": ledger.KIND_REF_JOIN}).fetchone()
+    return row[0] > 0
@@ -0,0 +1,388 @@
+"""
+লোড টেস্ট / হ্যান্ডলার বেঞ্চমার্ক — ডিপ্লয়ের আগে কোন হ্যান্ডলার ধীর হলো ধরার জন্য।
+
+    BENCH_DATABASE_URL=postgresql://localhost/bench python bench.py --users 200 --concurrency 8
+    python bench.py --json after.json --baseline before.json   # p95 regression হলে exit 1
+
+প্রতিটা ফ্লোর synthetic Update JSON বানিয়ে getMessage এ (Flask test client) পাঠায়:
+/start (রেফারসহ), Balance, Refer, পুরো withdraw কথোপকথন, .xlsx আপলোড, এডমিন add/set/reduce,
+withdraw আর টাস্কের approve/reject callback। Bot API এর জায়গায় লোকাল fake server (সব মেথডে ok),
+তাই network ছাড়া শুধু আমাদের কোড + Postgres মাপা হয়। প্রতি রানে নতুন schema (শেষে মুছে ফেলা হয়),
+update_id/ইউজার id নির্দিষ্ট — একই আর্গুমেন্টে একই লোড।
+রিপোর্ট: হ্যান্ডলার প্রতি p50/p95/p99 (ms) আর 1/mean (এক worker এ কত req/s), মোট updates/s।
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from router import callback_data
+
+BENCH_TOKEN = "123456:BENCH"
+ADMIN_ID = 1000
+USER_BASE = 5_000_000
+
+
+# ==============================
+# FAKE TELEGRAM BOT API
+# ==============================
+def _task_xlsx(rows=50) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["gmail", "password"])
+    for i in range(rows):
+        ws.append([f"benchuser{i:05d}@gmail.com", "pass1234"])
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+class FakeTelegram:
+    """
+    http://127.0.0.1:<port>/bot<token>/<method> — সব মেথডে {"ok": true}, send* এ একটা Message।
+    /file/bot<token>/<path> — আপলোড ফ্লোর .xlsx। latency: প্রতি কলে কৃত্রিম দেরি (সেকেন্ড)।
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._message_id = 0
+        self._xlsx = _task_xlsx()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+    def _result(self, method, params):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self._message_id += 1
+            message_id = self._message_id
+        if method == "getMe":
+            return {"id": int(BENCH_TOKEN.split(":")[0]), "is_bot": True, "first_name": "Bench",
+                    "username": "bench_bot"}
+        if method == "getFile":
+            return {"file_id": params.get("file_id", ""), "file_unique_id": "f", "file_size": len(self._xlsx),
+                    "file_path": "documents/task.xlsx"}
+        if method in ("sendMessage", "sendDocument", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0) or 0)
+            return {"message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        return True
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, body, ctype="application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                url = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if url.path.startswith("/file/"):
+                    return self._reply(200, fake._xlsx, "application/octet-stream")
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if body and "urlencoded" in (self.headers.get("Content-Type") or ""):
+                    params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+                method = url.path.rsplit("/", 1)[-1]
+                result = fake._result(method, params)
+                self._reply(200, json.dumps({"ok": True, "result": result}).encode())
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# ==============================
+# SYNTHETIC UPDATES
+# ==============================
+class UpdateFactory:
+    """update_id আর message_id ক্রমিক — একই রানে একই ক্রম"""
+
+    def __init__(self, first_update_id=1):
+        self._next = first_update_id
+        self._lock = threading.Lock()
+
+    def _id(self):
+        with self._lock:
+            self._next += 1
+            return self._next
+
+    @staticmethod
+    def _user(uid):
+        return {"id": uid, "is_bot": False, "first_name": f"u{uid}", "username": f"u{uid}"}
+
+    def message(self, uid, text=None, document=None):
+        n = self._id()
+        msg = {"message_id": n, "date": int(time.time()), "chat": {"id": uid, "type": "private"},
+               "from": self._user(uid)}
+        if document is not None:
+            msg["document"] = document
+        else:
+            msg["text"] = text
+            if text.startswith("/"):
+                msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": n, "message": msg}
+
+    def document(self, uid, n):
+        return self.message(uid, document={
+            "file_id": f"bench-file-{uid}-{n}", "file_unique_id": f"bench-{uid}-{n}",
+            "file_name": "task.xlsx", "file_size": 4096,
+            "mime_type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        })
+
+    def callback(self, uid, data):
+        n = self._id()
+        return {"update_id": n, "callback_query": {
+            "id": str(n), "from": self._user(uid), "chat_instance": "bench", "data": data,
+            "message": {"message_id": n, "date": int(time.time()), "chat": {"id": uid, "type": "private"},
+                        "from": self._user(int(BENCH_TOKEN.split(":")[0])), "text": "card"},
+        }}
+
+
+# ==============================
+# RUNNER
+# ==============================
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+class Bench:
+    """
+    phase গুলো ক্রমে চলে (withdraw এর আগে ব্যালেন্স, callback এর আগে রিকোয়েস্ট লাগবে)।
+    এক phase এ ইউজার প্রতি একটা script (ক্রমে, কথোপকথন তাই), ইউজাররা concurrency টা thread এ একসাথে।
+    এডমিন একটাই চ্যাট — তার script গুলো একটার পর একটা।
+    """
+
+    def __init__(self, bot_module, users, concurrency):
+        self.bot = bot_module
+        self.users = [USER_BASE + i for i in range(users)]
+        self.concurrency = concurrency
+        self.updates = UpdateFactory()
+        self.samples = {}  # handler -> [ms]
+        self.errors = {}
+        self._lock = threading.Lock()
+        self.app = bot_module.create_app()
+        self.url = "/" + bot_module.TOKEN
+
+    def send(self, label, update):
+        client = self.app.test_client()
+        started = time.perf_counter()
+        resp = client.post(self.url, data=json.dumps(update), content_type="application/json")
+        ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.samples.setdefault(label, []).append(ms)
+            if resp.status_code != 200:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+    def _script(self, steps):
+        for label, update in steps:
+            self.send(label, update)
+
+    def _phase(self, scripts):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for f in [pool.submit(self._script, s) for s in scripts]:
+                f.result()
+
+    def _pending_ids(self, table):
+        from sqlalchemy import text
+        with self.bot.engine.connect() as conn:
+            return conn.execute(text(f"SELECT id FROM {table} WHERE status = 'Pending' ORDER BY id")).scalars().all()
+
+    def run(self):
+        f = self.updates
+        started = time.perf_counter()
+        self._script([("start", f.message(ADMIN_ID, "/start"))])
+        first, rest = self.users[0], self.users[1:]
+        self._phase([[("start", f.message(first, "/start"))]]
+                    + [[("start_ref", f.message(u, f"/start {first}"))] for u in rest])
+        self._phase([[("balance", f.message(u, "💰 Balance")),
+                      ("refer", f.message(u, "👥 Refer")),
+                      ("upload", f.document(u, 1))] for u in self.users])
+        admin = []
+        for u in self.users:
+            admin += [
+                ("admin_add", f.message(ADMIN_ID, "➕ Add Balance")),
+                ("admin_add_userid", f.message(ADMIN_ID, str(u))),
+                ("admin_add_amount", f.message(ADMIN_ID, "200")),
+                ("admin_set", f.message(ADMIN_ID, "✏️ Set Balance")),
+                ("admin_set_userid", f.message(ADMIN_ID, str(u))),
+                ("admin_set_amount", f.message(ADMIN_ID, "180")),
+                ("admin_reduce", f.message(ADMIN_ID, "➖ Reduce Balance")),
+                ("admin_reduce_userid", f.message(ADMIN_ID, str(u))),
+                ("admin_reduce_amount", f.message(ADMIN_ID, "10")),
+            ]
+        self._script(admin)
+        self._phase([[("withdraw", f.message(u, "💵 Withdraw")),
+                      ("withdraw_method", f.message(u, "📲 Bkash")),
+                      ("withdraw_number", f.message(u, "01700000000")),
+                      ("withdraw_amount", f.message(u, "50"))] for u in self.users])
+        decisions = []
+        for i, wid in enumerate(self._pending_ids("withdraws")):
+            code = "wa" if i % 2 == 0 else "wr"
+            label = "withdraw_approve" if code == "wa" else "withdraw_reject"
+            decisions.append((label, f.callback(ADMIN_ID, callback_data(code, wid))))
+        for i, tid in enumerate(self._pending_ids("tasks")):
+            code = "ta" if i % 2 == 0 else "tr"
+            label = "task_approve" if code == "ta" else "task_reject"
+            decisions.append((label, f.callback(ADMIN_ID, callback_data(code, tid))))
+        self._script(decisions)
+        return time.perf_counter() - started
+
+    def report(self, wall):
+        handlers = {}
+        for label, values in sorted(self.samples.items()):
+            values = sorted(values)
+            mean = sum(values) / len(values)
+            handlers[label] = {
+                "n": len(values), "errors": self.errors.get(label, 0),
+                "p50_ms": round(percentile(values, 50), 2), "p95_ms": round(percentile(values, 95), 2),
+                "p99_ms": round(percentile(values, 99), 2), "max_ms": round(values[-1], 2),
+                "rps": round(1000 / mean, 1) if mean else 0,
+            }
+        total = sum(h["n"] for h in handlers.values())
+        return {
+            "users": len(self.users), "concurrency": self.concurrency,
+            "overall": {"updates": total, "seconds": round(wall, 3), "updates_per_s": round(total / wall, 1),
+                        "errors": sum(self.errors.values())},
+            "handlers": handlers,
+        }
+
+
+def print_report(report, out=sys.stdout):
+    o = report["overall"]
+    print(f"\n{o['updates']} updates in {o['seconds']}s → {o['updates_per_s']} updates/s "
+          f"({report['users']} users, concurrency {report['concurrency']}, errors {o['errors']})\n", file=out)
+    print(f"{'handler':<22}{'n':>6}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'rps':>8}", file=out)
+    for label, h in report["handlers"].items():
+        print(f"{label:<22}{h['n']:>6}{h['errors']:>5}{h['p50_ms']:>9}{h['p95_ms']:>9}{h['p99_ms']:>9}"
+              f"{h['max_ms']:>9}{h['rps']:>8}", file=out)
+
+
+def compare(report, baseline, max_regression, min_delta_ms=1.0):
+    """p95 baseline এর চেয়ে max_regression (ভগ্নাংশ) আর min_delta_ms দুটোর বেশি বাড়লে regression"""
+    regressions = []
+    for label, h in report["handlers"].items():
+        base = baseline.get("handlers", {}).get(label)
+        if not base:
+            continue
+        old, new = base["p95_ms"], h["p95_ms"]
+        if new > old * (1 + max_regression) and new - old > min_delta_ms:
+            regressions.append(f"{label}: p95 {old}ms → {new}ms")
+    return regressions
+
+
+# ==============================
+# SETUP
+# ==============================
+def _isolated_url(url, schema):
+    """Postgres: এই রানের জন্য আলাদা schema (search_path) — আগের রানের ডেটা/processed_updates লাগে না"""
+    from sqlalchemy.engine import make_url
+    u = make_url(url)
+    return u.update_query_dict({"options": f"-csearch_path={schema}"}).render_as_string(hide_password=False)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="bot.py হ্যান্ডলার বেঞ্চমার্ক (fake Telegram + লোকাল Postgres)")
+    parser.add_argument("--db", default=os.getenv("BENCH_DATABASE_URL"), help="লোকাল Postgres (BENCH_DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="fake Bot API এর প্রতি কলে দেরি (ms)")
+    parser.add_argument("--json", help="রিপোর্ট JSON এ লেখো")
+    parser.add_argument("--baseline", help="আগের --json রিপোর্ট; p95 regression হলে exit 1")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="p95 কত ভগ্নাংশ বাড়লে ব্যর্থ (0.2 = 20%%)")
+    parser.add_argument("--keep-schema", action="store_true")
+    args = parser.parse_args(argv[1:])
+    if not args.db:
+        raise SystemExit("❌ --db বা BENCH_DATABASE_URL দিন (প্রোডাকশন DB নয় — লোকাল Postgres)")
+
+    from sqlalchemy import create_engine, text
+
+    schema = f"bench_{os.getpid()}"
+    admin_engine = create_engine(args.db)
+    with admin_engine.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    fake = FakeTelegram(latency=args.api_latency / 1000).start()
+    # bot.py import এর আগে — config env থেকে পড়ে
+    os.environ.update({
+        "BOT_TOKEN": BENCH_TOKEN, "ADMIN_ID": str(ADMIN_ID), "DATABASE_URL": _isolated_url(args.db, schema),
+        "INGEST_MODE": "inline", "AUTO_MIGRATE": "1",
+        "OUTBOX_GLOBAL_RATE": "100000", "OUTBOX_CHAT_RATE": "100000", "OUTBOX_CHAT_BURST": "1000",
+        "DB_POOL_SIZE": str(args.concurrency + 2),
+    })
+    # broadcast আর xlsx পার্স (process pool) বন্ধ — চাইলে env দিয়ে চালু করো। লেজার materializer চালু থাকে,
+    # না হলে pending জমে প্রতিটা ব্যালেন্স পড়া ধীর হতো (প্রোডাকশনে যা হয় না)
+    for key in ("BROADCAST_POLL_INTERVAL", "TASK_PARSE_INTERVAL"):
+        os.environ.setdefault(key, "0")
+    from telebot import apihelper
+    apihelper.API_URL = f"http://127.0.0.1:{fake.port}/bot{{0}}/{{1}}"
+    apihelper.FILE_URL = f"http://127.0.0.1:{fake.port}/file/bot{{0}}/{{1}}"
+
+    import bot as bot_module
+    # telebot এর thread pool এ না দিয়ে getMessage এর ভেতরেই হ্যান্ডলার — latency তে পুরো কাজ ধরা পড়ে
+    bot_module.bot.get().threaded = False
+
+    try:
+        bench = Bench(bot_module, args.users, args.concurrency)
+        wall = bench.run()
+        report = bench.report(wall)
+        report["api_calls"] = dict(sorted(fake.calls.items()))
+    finally:
+        fake.stop()
+        if not args.keep_schema:
+            bot_module.engine.dispose()
+            with admin_engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.max_regression)
+        if regressions:
+            print("\n❌ regression:\n  " + "\n  ".join(regressions))
+            return 1
+        print("\n✅ baseline এর তুলনায় regression নেই")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,8 +1,48 @@
 import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+_IMPORT_STARTED = time.perf_counter()
+
 import telebot
 from telebot import types
-from flask import Flask, request
-from sqlalchemy import create_engine, text
+from telebot.apihelper import ApiTelegramException
+from flask import Flask, request, jsonify
+from sqlalchemy import text
+
+from lazy import ForkSafeLazy
+from db import Database, make_engine
+from ingest import UpdateQueue
+from outbox import Outbox
+from cache import TTLCache
+from router import Router, callback_data
+from state_store import make_state_store
+from background import PeriodicTask
+import broadcast
+import task_ingest
+import gmail_dedup
+import task_moderation
+import payouts
+import referrals
+from idempotency import UpdateDedup
+from polling import LongPoller
+from metrics import Registry
+from sql_profile import QueryProfiler
+import ledger
+import migrations
+import stats
+import admin_pages
+from admin_pages import PageFilter
+from bulk_credit import parse_credit_file, apply_bulk_credit
+from balance_ops import (create_withdraw, decide_withdraw, credit_with_ref_bonus,
+                         set_balance_with_ref_bonus, debit, attach_referrer)
+from responses import (
+    BotIdentity, inline_keyboard,
+    MAIN_MENU_KB, ADMIN_MENU_KB, WITHDRAW_METHOD_KB, WITHDRAW_DECISION_KB, TASK_DECISION_KB, BROADCAST_KB,
+    MAIN_MENU_TEXT, ADMIN_MENU_TEXT, WITHDRAW_METHOD_TEXT, NOT_ADMIN_TEXT, SUPPORT_TEXT,
+    CREATE_GMAIL_TEXT, UPLOAD_XLSX_TEXT, BULK_CREDIT_TEXT, BROADCAST_TEXT, REFER_TEXT, TOP_REFERRERS_TEXT, WITHDRAW_CARD_TEXT, TASK_CARD_TEXT,
+)
 
 # ==============================
 # CONFIG
@@ -12,7 +52,39 @@ if not TOKEN:
     raise ValueError("❌ BOT_TOKEN not set in Environment Variables!")
 
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))  # <-- তোমার এডমিন numeric ID
-bot = telebot.TeleBot(TOKEN)
+
+# ---- Ingestion: "inline" = webhook রিকোয়েস্টের ভেতরেই প্রসেস, "queue" = সাথে সাথে 200, পরে worker প্রসেস করবে
+INGEST_MODE = os.getenv("INGEST_MODE", "inline")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "1000"))
+INGEST_OVERFLOW = os.getenv("INGEST_OVERFLOW", "503")  # "503" (Telegram আবার পাঠাবে) বা "shed" (ফেলে দাও)
+
+def _queued():
+    """আপডেট UpdateQueue এর worker এ — queue মোডে, আর polling এ সবসময় (offset সেভের আগে queue খালি হওয়া লাগে)"""
+    return INGEST_MODE == "queue" or RUN_MODE == "polling"
+
+# queue তে আমাদের নিজস্ব worker আছে, তাই telebot এর thread pool লাগবে না।
+# TeleBot(threaded=True) বানানোর সাথে সাথে thread pool চালু করে — তাই প্রতি worker এ প্রথম ব্যবহারে বানাও
+def _make_bot():
+    b = telebot.TeleBot(TOKEN, threaded=not _queued())
+    b.register_message_handler(on_message, content_types=['text', 'document'])
+    b.register_callback_query_handler(on_callback, func=lambda c: True)
+    return b
+
+bot = ForkSafeLazy("bot", _make_bot)
+
+# ---- Outbound: সব send এই dispatcher দিয়ে যাবে (flood limit + 429 retry)
+outbox = Outbox(
+    bot,
+    global_rate=float(os.getenv("OUTBOX_GLOBAL_RATE", "25")),  # Telegram ~30 msg/s
+    chat_rate=float(os.getenv("OUTBOX_CHAT_RATE", "1")),       # প্রতি চ্যাটে ~1 msg/s
+    chat_burst=int(os.getenv("OUTBOX_CHAT_BURST", "3")),
+    senders=int(os.getenv("OUTBOX_SENDERS", "4")),
+    max_retries=int(os.getenv("OUTBOX_MAX_RETRIES", "5")),
+)
+
+# ---- get_me() একবার (স্টার্টআপে), পরে TTL শেষ হলে আবার
+bot_identity = BotIdentity(bot)
 
 # ==============================
 # DATABASE (SQLAlchemy)
@@ -21,158 +93,286 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("❌ DATABASE_URL not set in Environment Variables!")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-
-# ---- Create tables (if not exists)
-with engine.begin() as conn:
-    conn.execute(text("""
-    CREATE TABLE IF NOT EXISTS users (
-        user_id BIGINT PRIMARY KEY,
-        balance INTEGER DEFAULT 0,
-        refer_by BIGINT,
-        ref_count INTEGER DEFAULT 0,
-        ref_earn INTEGER DEFAULT 0
-    )
-    """))
-
-    conn.execute(text("""
-    CREATE TABLE IF NOT EXISTS withdraws (
-        id SERIAL PRIMARY KEY,
-        user_id BIGINT,
-        method  TEXT,
-        number  TEXT,
-        amount  INTEGER,
-        status  TEXT DEFAULT 'Pending'
-    )
-    """))
-
-    conn.execute(text("""
-    CREATE TABLE IF NOT EXISTS tasks (
-        id SERIAL PRIMARY KEY,
-        user_id  BIGINT,
-        username TEXT,
-        file_id  TEXT,
-        status   TEXT DEFAULT 'Pending'
-    )
-    """))
-
-    conn.execute(text("""
-    CREATE TABLE IF NOT EXISTS settings (
-        key TEXT PRIMARY KEY,
-        value TEXT
-    )
-    """))
-
-    # ডিফল্ট task_price (যদি না থাকে)
-    conn.execute(text("""
-        INSERT INTO settings (key, value)
-        VALUES ('task_price', '7')
-        ON CONFLICT (key) DO NOTHING
-    """))
+# প্রতি worker এ নিজস্ব pool (fork এর আগে খোলা connection শেয়ার হয় না); প্রথম কুয়েরিতে বানানো হয়
+# pool সাইজ ঠিক করো: workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) যেন Postgres এর max_connections ছাড়িয়ে না যায়
+# ---- SQL প্রোফাইলার (sql_profile.py): SQL_PROFILE=1 বা এডমিনের /sqlprofile on; বন্ধ থাকলে প্রায় খরচহীন
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0")
+query_profiler = QueryProfiler(
+    enabled=SQL_PROFILE == "1",
+    slow_ms=float(os.getenv("SQL_SLOW_MS", "200")),
+    explain=os.getenv("SQL_EXPLAIN", "0") == "1",
+    max_statements=int(os.getenv("SQL_MAX_STATEMENTS", "30")),
+)
+
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "0") == "1"
+
+def _check_schema(eng):
+    """স্কিমা LATEST এর পেছনে থাকলে সতর্কবার্তা — DB তে পৌঁছানো না গেলে আলাদা বার্তা"""
+    try:
+        version = migrations.current_version(eng)
+    except Exception as e:
+        print(f"⚠️ DB schema ভার্সন দেখা যায়নি: {e}")
+        return
+    if version < migrations.LATEST:
+        print(f"⚠️ DB schema v{migrations.LATEST} এর পেছনে — `python migrations.py` চালাও")
+
+def _make_engine():
+    eng = query_profiler.install(make_engine(
+        DATABASE_URL,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        pre_ping=os.getenv("DB_PRE_PING", "1") == "1",
+    ))
+    # worker এ প্রথম ব্যবহারে (fork এর পরে) একবার; AUTO_MIGRATE এ create_app() নিজেই upgrade করে
+    if not AUTO_MIGRATE:
+        _check_schema(eng)
+    return eng
+
+engine = ForkSafeLazy("engine", _make_engine, on_fork=lambda old: old.dispose(close=False))
+
+# হ্যান্ডলারের সব SQL db.begin() দিয়ে — আপডেট প্রতি একটা connection, একটা commit।
+# DB এরর ধরে হ্যান্ডলার এগিয়ে গেলে সেই ব্লক db.savepoint() দিয়ে, নইলে পুরো আপডেট rollback
+db = Database(engine)
+# মেসেজ আর ক্যাশ invalidate commit এর পরে (rollback হলে বাদ)
+outbox.gate = db.after_commit
+
+# ---- স্কিমা migrations.py তে (ভার্সন করা); ডিপ্লয়ের সময় একবার `python migrations.py`
+# AUTO_MIGRATE=1 দিলে create_app() নিজেই চালায় — লোকাল/single worker এর জন্য সুবিধা
 
 # ==============================
 # STATE
 # ==============================
-withdraw_steps = {}  # {user_id: {step, method, number}}
-admin_steps = {}     # {admin_id: {action, step, target_id, old_balance}}
+# প্রতি ইউজারের একটাই চলমান ফ্লো: {flow, step, ...}
+#   withdraw: {flow: "withdraw", step, method, number}
+#   admin:    {flow: add/set/reduce/set_task_price, step, target_id, old_balance}
+# STATE_BACKEND: "memory" (single worker), "sql" বা "redis://..." (multi worker)
+conv_store = make_state_store(os.getenv("STATE_BACKEND", "memory"), db,
+                              ttl=int(os.getenv("CONV_STATE_TTL", "1800")))
+
+def start_flow(uid: int, flow: str, step: str):
+    conv_store.set(uid, {"flow": flow, "step": step})
+
+def save_flow(uid: int, state: dict):
+    conv_store.set(uid, state)
+
+def end_flow(uid: int):
+    conv_store.delete(uid)
+
+def conversation_state(uid: int):
+    st = conv_store.get(uid)
+    if st:
+        return st["flow"], st["step"], st
+    return None
+
+router = Router(is_admin=lambda uid: uid == ADMIN_ID, state_of=conversation_state)
+
+# ==============================
+# LEDGER MATERIALIZER
+# ==============================
+# ব্যালেন্স পরিবর্তন balance_ledger এ জমা হয়; এটা ব্যাকগ্রাউন্ডে users.balance এ ভাঁজ করে।
+# একাধিক worker এ চললেও সমস্যা নেই (SKIP LOCKED)। 0 দিলে বন্ধ — তখন অন্য কোথাও চালাতে হবে।
+LEDGER_BATCH_SIZE = int(os.getenv("LEDGER_BATCH_SIZE", "5000"))
+ledger_materializer = PeriodicTask(
+    "ledger", float(os.getenv("LEDGER_MATERIALIZE_INTERVAL", "5")),
+    lambda: ledger.materialize_all(engine, batch_size=LEDGER_BATCH_SIZE),
+)
+
+# ==============================
+# BROADCAST RUNNER
+# ==============================
+# broadcast_jobs এর running জব ব্যাকগ্রাউন্ডে পাঠায় (broadcast.py); রিস্টার্টের পরে checkpoint থেকে চলে।
+# BROADCAST_RATE outbox এর OUTBOX_GLOBAL_RATE এর চেয়ে কম রাখো — বাকিটা সাধারণ রিপ্লাইয়ের জন্য।
+broadcaster = broadcast.BroadcastRunner(
+    engine, outbox,
+    rate=float(os.getenv("BROADCAST_RATE", "15")),
+    checkpoint_every=int(os.getenv("BROADCAST_CHECKPOINT_EVERY", "200")),
+    on_done=lambda job_id, created_by, sent, blocked, failed: outbox.send_message(
+        created_by or ADMIN_ID,
+        f"📣 Broadcast #{job_id} শেষ ✅\n📨 পাঠানো: {sent}\n🚫 ব্লক: {blocked}\n⚠️ ব্যর্থ: {failed}"),
+)
+broadcast_task = PeriodicTask(
+    "broadcast", float(os.getenv("BROADCAST_POLL_INTERVAL", "30")), broadcaster.run_pending,
+)
+
+# ==============================
+# METRICS (/metrics, Prometheus)
+# ==============================
+metrics = Registry()
+handler_seconds = metrics.histogram(
+    "bot_handler_seconds", "Handler latency (route: command, flow/step or callback code)", ("handler", "route"))
+handler_errors = metrics.counter(
+    "bot_handler_errors_total", "Handlers that raised", ("handler", "route"))
+api_seconds = metrics.histogram(
+    "telegram_api_seconds", "Telegram Bot API call latency, per attempt", ("method",))
+api_calls = metrics.counter(
+    "telegram_api_calls_total", "Telegram Bot API calls by outcome (ok, error code, network, error)", ("method", "outcome"))
+update_seconds = metrics.histogram(
+    "bot_update_seconds", "Time to process one update (dedup + dispatch)", ("type",))
+updates_total = metrics.counter(
+    "bot_updates_total", "Updates received by outcome (processed, duplicate, failed)", ("type", "outcome"))
+updates_dropped = metrics.counter(
+    "bot_update_queue_dropped_total", "Queued updates dropped after all handler attempts failed", ("type",))
+metrics.gauge("telegram_outbox_pending", "Outgoing calls waiting in the outbox", lambda: outbox.stats()["pending"])
+metrics.gauge("bot_update_queue_depth", "Updates waiting in the ingest queue (queue or polling mode)",
+              lambda: update_queue.depth() if _queued() else None)
+metrics.gauge("bot_polling_lag_seconds", "Max message age in the last getUpdates batch (polling mode)",
+              lambda: poller.stats()["lag_last_s"] if RUN_MODE == "polling" else None)
+
+def _observe_handler(handler, route, seconds, ok):
+    handler_seconds.observe(seconds, handler, route)
+    query_profiler.set_label(f"{handler} {route}")
+    if not ok:
+        handler_errors.inc(handler, route)
+
+def _observe_api(method, seconds, outcome):
+    api_seconds.observe(seconds, method)
+    api_calls.inc(method, outcome)
+
+outbox.observe = _observe_api
+
+@contextmanager
+def api_call(method):
+    """outbox এর বাইরে সরাসরি bot.* কল মাপা"""
+    started, outcome = time.perf_counter(), "error"
+    try:
+        yield
+        outcome = "ok"
+    except ApiTelegramException as e:
+        outcome = str(e.error_code)
+        raise
+    finally:
+        _observe_api(method, time.perf_counter() - started, outcome)
+
+bot_identity.api_call = api_call
+
+# ==============================
+# TASK FILE INGEST
+# ==============================
+# জমা দেওয়া .xlsx নামিয়ে process pool এ পার্স করে tasks রো তে row_count/payout রাখে (task_ingest.py)।
+# handle_file commit এর পরে trigger করে; interval টা শুধু আটকে থাকা/বাকি থাকা ফাইলের জন্য।
+def _download_file(file_id: str) -> bytes:
+    with api_call("get_file"):
+        path = bot.get_file(file_id).file_path
+    with api_call("download_file"):
+        return bot.download_file(path)
+
+# আগে জমা পড়া Gmail ধরা (gmail_dedup.py) — Bloom filter প্রতি process এ, ~1.2MB / 10 লাখ ঠিকানা
+gmail_index = gmail_dedup.GmailIndex(capacity=int(os.getenv("GMAIL_BLOOM_CAPACITY", "1000000")))
+
+task_ingestor = task_ingest.TaskIngestor(
+    engine, _download_file, index=gmail_index,
+    workers=int(os.getenv("TASK_PARSE_WORKERS", "2")),
+    batch_size=int(os.getenv("TASK_PARSE_BATCH", "20")),
+)
+task_ingest_task = PeriodicTask(
+    "task_ingest", float(os.getenv("TASK_PARSE_INTERVAL", "60")), task_ingestor.run_pending,
+)
+
+# ==============================
+# REFERRAL LEADERBOARD
+# ==============================
+# referral_closure থেকে materialized view (referrals.py) — রিফ্রেশ এখানে, পড়া leaderboard_cache দিয়ে
+referral_task = PeriodicTask(
+    "referrals", float(os.getenv("REFERRAL_LEADERBOARD_INTERVAL", "600")),
+    lambda: referrals.refresh_leaderboard(engine),
+)
+leaderboard_cache = TTLCache(maxsize=1, ttl=float(os.getenv("REFERRAL_LEADERBOARD_TTL", "60")))
+
+def _load_leaderboard():
+    with db.begin() as conn:
+        return [tuple(r) for r in referrals.leaderboard(conn, limit=10)]
 
 # ==============================
 # SETTINGS HELPERS
 # ==============================
-def get_setting(key: str, default=None):
-    with engine.begin() as conn:
+# settings আর users রো বার বার পড়া হয়, লেখা হয় কম — তাই process-local cache.
+# প্রতিটা লেখার পথে invalidate করতে হবে (commit এর পরে)।
+settings_cache = TTLCache(maxsize=64, ttl=float(os.getenv("SETTINGS_CACHE_TTL", "300")))
+user_cache = TTLCache(maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+                      ttl=float(os.getenv("USER_CACHE_TTL", "30")))
+
+def _load_setting(key: str):
+    with db.begin() as conn:
         row = conn.execute(text("SELECT value FROM settings WHERE key=:k"), {"k": key}).fetchone()
-        return row[0] if row else default
+        return row[0] if row else None
+
+def get_setting(key: str, default=None):
+    value = settings_cache.get_or_load(key, lambda: _load_setting(key))
+    return value if value is not None else default
 
 def set_setting(key: str, value: str):
-    with engine.begin() as conn:
+    with db.begin() as conn:
         conn.execute(text("""
             INSERT INTO settings (key, value)
             VALUES (:k, :v)
             ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value
         """), {"k": key, "v": value})
+    db.after_commit(settings_cache.invalidate, key)
+
+# ==============================
+# USER ROW CACHE
+# ==============================
+def _load_user(uid: int):
+    with db.begin() as conn:
+        return ledger.summary(conn, uid)
+
+def get_user_summary(uid: int):
+    """(balance, ref_count, ref_earn) — ইউজার না থাকলে None"""
+    row = user_cache.get_or_load(uid, lambda: _load_user(uid))
+    return tuple(row) if row else None
+
+def invalidate_user(*uids):
+    db.after_commit(user_cache.invalidate, *[u for u in uids if u])
 
 # ==============================
 # HELPERS
 # ==============================
+# কিবোর্ডগুলো responses.py তে একবারই JSON করে রাখা আছে
 def send_main_menu(uid: int):
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    # প্রথম লাইন
-    kb.add(types.KeyboardButton("💰 Balance"), types.KeyboardButton("👥 Refer"))
-    # দ্বিতীয় লাইন
-    kb.add(types.KeyboardButton("💵 Withdraw"))
-    # তৃতীয় লাইন (নতুন)
-    kb.add(types.KeyboardButton("🎁 Create Gmail"), types.KeyboardButton("💌 Support group 🛑"))
-    bot.send_message(uid, "👋 মেনু থেকে একটি অপশন সিলেক্ট করুন:", reply_markup=kb)
+    outbox.send_message(uid, MAIN_MENU_TEXT, reply_markup=MAIN_MENU_KB)
 
 def send_admin_menu(uid: int):
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add(types.KeyboardButton("➕ Add Balance"), types.KeyboardButton("✏️ Set Balance"))
-    kb.add(types.KeyboardButton("➖ Reduce Balance"), types.KeyboardButton("📋 All Requests"))
-    kb.add(types.KeyboardButton("👥 User List"), types.KeyboardButton("📂 Task Requests"))
-    kb.add(types.KeyboardButton("⚙️ Set Task Price"))  # নতুন
-    kb.add(types.KeyboardButton("⬅️ Back"))
-    bot.send_message(uid, "🔐 Admin Panel:", reply_markup=kb)
+    outbox.send_message(uid, ADMIN_MENU_TEXT, reply_markup=ADMIN_MENU_KB)
 
 def send_withdraw_card_to_admin(row):
     """row: (id, user_id, method, number, amount, status)"""
     req_id, u_id, method, number, amount, status = row
-    text_msg = (f"🆔 {req_id} | 👤 {u_id}\n"
-                f"💳 {method} ({number})\n"
-                f"💵 {amount}৳ | 📌 {status}")
+    text_msg = WITHDRAW_CARD_TEXT.format(req_id=req_id, u_id=u_id, method=method,
+                                         number=number, amount=amount, status=status)
     if status == "Pending":
-        ikb = types.InlineKeyboardMarkup()
-        ikb.add(
-            types.InlineKeyboardButton("✅ Approve", callback_data=f"approve_{req_id}"),
-            types.InlineKeyboardButton("❌ Reject",  callback_data=f"reject_{req_id}")
-        )
-        bot.send_message(ADMIN_ID, text_msg, reply_markup=ikb)
+        outbox.send_message(ADMIN_ID, text_msg, reply_markup=inline_keyboard(WITHDRAW_DECISION_KB, req_id))
     else:
-        bot.send_message(ADMIN_ID, text_msg)
+        outbox.send_message(ADMIN_ID, text_msg)
 
-def apply_ref_bonus_if_increase(target_user_id: int, delta_increase: int):
-    """
-    টার্গেট ইউজারের ব্যালেন্স যদি পজিটিভ ডেল্টায় বাড়ে, তাহলে
-    তার রেফারারকে ৩% বোনাস দাও।
-    """
-    if delta_increase <= 0:
+def notify_ref_bonus(referrer, target_user_id: int, bonus: int):
+    """রেফারারের ৩% বোনাস balance_ops এ একই স্টেটমেন্টে যোগ হয়ে গেছে; এখানে শুধু ক্যাশ আর নোটিফিকেশন"""
+    if not referrer or bonus <= 0:
         return
-    with engine.begin() as conn:
-        row = conn.execute(text("SELECT refer_by FROM users WHERE user_id=:uid"), {"uid": target_user_id}).fetchone()
-        if not row:
-            return
-        referrer = row[0]
-        if not referrer:
-            return
-        bonus = int(delta_increase * 0.03)
-        if bonus > 0:
-            conn.execute(text("""
-                UPDATE users
-                SET balance = COALESCE(balance,0) + :b,
-                    ref_earn = COALESCE(ref_earn,0) + :b
-                WHERE user_id = :rid
-            """), {"b": bonus, "rid": referrer})
-    # নোটিফিকেশন আলাদা try ব্লকে
-    if delta_increase > 0:
-        try:
-            bot.send_message(referrer, f"🎉 আপনার রেফার্ড {target_user_id} এর ব্যালেন্স বৃদ্ধি পেয়েছে। আপনি পেলেন {bonus}৳ (3%)")
-        except Exception:
-            pass
+    invalidate_user(referrer)
+    outbox.send_message(referrer, f"🎉 আপনার রেফার্ড {target_user_id} এর ব্যালেন্স বৃদ্ধি পেয়েছে। আপনি পেলেন {bonus}৳ (3%)")
 
 # ==============================
 # START + REFER ATTACH
 # ==============================
-@bot.message_handler(commands=['start'])
+@router.command("start")
 def cmd_start(message: types.Message):
     user_id = message.chat.id
 
     # ensure user exists
-    with engine.begin() as conn:
-        conn.execute(text("""
+    with db.begin() as conn:
+        created = conn.execute(text("""
             INSERT INTO users (user_id)
             VALUES (:uid)
             ON CONFLICT (user_id) DO NOTHING
-        """), {"uid": user_id})
+            RETURNING user_id
+        """), {"uid": user_id}).fetchone()
+        if created:
+            stats.bump(conn, {"users": 1}, {"signups": 1})
+        else:
+            broadcast.unblock(conn, user_id)
+    invalidate_user(user_id)
 
     # refer attach: /start <referrer_id>
     parts = message.text.split()
@@ -180,32 +380,14 @@ def cmd_start(message: types.Message):
         try:
             referrer_id = int(parts[1])
             if referrer_id != user_id:
-                with engine.begin() as conn:
-                    # ensure referrer row exists
-                    conn.execute(text("""
-                        INSERT INTO users (user_id)
-                        VALUES (:rid)
-                        ON CONFLICT (user_id) DO NOTHING
-                    """), {"rid": referrer_id})
-
-                    # only attach if current user's refer_by is NULL
-                    ref = conn.execute(text("SELECT refer_by FROM users WHERE user_id=:uid"), {"uid": user_id}).fetchone()
-                    if ref and ref[0] is None:
-                        # attach refer_by
-                        conn.execute(text("UPDATE users SET refer_by=:rid WHERE user_id=:uid"),
-                                     {"rid": referrer_id, "uid": user_id})
-                        # increment ref_count, ref_earn and give +1৳ bonus to referrer
-                        conn.execute(text("""
-                            UPDATE users
-                            SET ref_count = COALESCE(ref_count,0) + 1,
-                                ref_earn  = COALESCE(ref_earn,0) + 1,
-                                balance   = COALESCE(balance,0) + 1
-                            WHERE user_id=:rid
-                        """), {"rid": referrer_id})
-                try:
-                    bot.send_message(referrer_id, f"🎉 আপনার রেফারে নতুন একজন জয়েন করেছে!\nআপনি বোনাস 1৳ পেয়েছেন।")
-                except Exception:
-                    pass
+                # এরর হলে শুধু attach বাদ — ইউজার তৈরি আর মেনু থাকে
+                with db.savepoint() as conn:
+                    attached = attach_referrer(conn, user_id, referrer_id)
+                    if attached:
+                        stats.bump(conn, daily={"referrals": 1})
+                if attached:
+                    invalidate_user(user_id, referrer_id)
+                    outbox.send_message(referrer_id, f"🎉 আপনার রেফারে নতুন একজন জয়েন করেছে!\nআপনি বোনাস 1৳ পেয়েছেন।")
         except Exception:
             pass
 
@@ -214,69 +396,69 @@ def cmd_start(message: types.Message):
 # ==============================
 # USER BUTTONS
 # ==============================
-@bot.message_handler(func=lambda m: m.text == "💰 Balance")
+@router.text("💰 Balance")
 def on_balance(message: types.Message):
     uid = message.chat.id
-    with engine.begin() as conn:
-        row = conn.execute(text("SELECT balance FROM users WHERE user_id=:uid"), {"uid": uid}).fetchone()
+    row = get_user_summary(uid)
     bal = row[0] if row else 0
-    bot.send_message(uid, f"💳 আপনার ব্যালেন্স: {bal}৳")
+    outbox.send_message(uid, f"💳 আপনার ব্যালেন্স: {bal}৳")
 
-@bot.message_handler(func=lambda m: m.text == "👥 Refer")
+@router.text("👥 Refer")
 def on_refer(message: types.Message):
     uid = message.chat.id
-    link = f"https://t.me/{bot.get_me().username}?start={uid}"
-    with engine.begin() as conn:
-        row = conn.execute(text("SELECT COALESCE(ref_count,0), COALESCE(ref_earn,0) FROM users WHERE user_id=:uid"),
-                           {"uid": uid}).fetchone()
-    ref_count = row[0] if row else 0
-    ref_earn = row[1] if row else 0
-    bot.send_message(
-        uid,
-        f"🔗 আপনার রেফার লিঙ্ক:\n{link}\n\n"
-        f"👥 মোট রেফার করেছে: {ref_count}\n"
-        f"💰 রেফার থেকে আয়: {ref_earn}৳\n\n"
-        f"✅ নিয়ম: আপনার রেফার্ড ইউজারের ব্যালেন্স যখনই বাড়বে,\n"
-        f"আপনি পাবেন সেই বৃদ্ধির 3%।\n\n"
-        f"🔔 চাইলে প্রত্যেক রেফারে সরাসরি 1৳ পান।"
-    )
-
-@bot.message_handler(func=lambda m: m.text == "💵 Withdraw")
+    link = bot_identity.refer_link(uid)
+    # ডাউনলাইন closure এর PK prefix থেকে, র‍্যাঙ্ক লিডারবোর্ড view থেকে — কোনো recursive কুয়েরি নেই।
+    # রেফার সংখ্যা/আয় user_cache ছাড়া সরাসরি snapshot + pending লেজার: নতুন জয়েন অন্য worker এ হলে
+    # এখানকার ক্যাশ invalidate হয় না, আর materializer এর অপেক্ষাও লাগে না
+    with db.begin() as conn:
+        row = ledger.summary(conn, uid)
+        levels = referrals.downline(conn, uid)
+        my_rank = referrals.rank(conn, uid) if levels else None
+    tree = "🌳 ডাউনলাইন: এখনো কেউ নেই"
+    if levels:
+        tree = (f"🌳 পুরো ডাউনলাইন: {sum(levels.values())} জন ("
+                + " · ".join(f"L{d} {n}" for d, n in sorted(levels.items())[:5]) + ")")
+        if my_rank:
+            tree += f"\n🏆 র‍্যাঙ্ক: #{my_rank}"
+    ref_count = row[1] if row else 0
+    ref_earn = row[2] if row else 0
+    outbox.send_message(uid, REFER_TEXT.format(link=link, ref_count=ref_count, ref_earn=ref_earn, tree=tree))
+
+@router.text("🏆 Top Referrers")
+def on_top_referrers(message: types.Message):
+    uid = message.chat.id
+    rows = leaderboard_cache.get_or_load("top", _load_leaderboard)
+    lines = []
+    for pos, ref_uid, direct, total, earn in rows:
+        # অন্যদের id পুরোটা দেখানো হয় না (এডমিন ছাড়া)
+        name = str(ref_uid) if uid == ADMIN_ID or ref_uid == uid else f"{str(ref_uid)[:3]}***{str(ref_uid)[-2:]}"
+        lines.append(f"{pos}. {name} — 👥 {direct} (🌳 {total}) · 💰 {earn}৳")
+    outbox.send_message(uid, TOP_REFERRERS_TEXT.format(rows="\n".join(lines) or "এখনো কেউ নেই"))
+
+@router.text("💵 Withdraw")
 def on_withdraw(message: types.Message):
     uid = message.chat.id
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add(types.KeyboardButton("📲 Bkash"), types.KeyboardButton("📲 Nagad"))
-    kb.add(types.KeyboardButton("⬅️ Back"))
-    withdraw_steps[uid] = {"step": "method"}
-    bot.send_message(uid, "💵 কোন পেমেন্ট মেথডে নিতে চান?", reply_markup=kb)
+    start_flow(uid, "withdraw", "method")
+    outbox.send_message(uid, WITHDRAW_METHOD_TEXT, reply_markup=WITHDRAW_METHOD_KB)
 
 # --- Support group ---
-@bot.message_handler(func=lambda m: m.text == "💌 Support group 🛑")
+@router.text("💌 Support group 🛑")
 def support_group(message: types.Message):
-    bot.send_message(
-        message.chat.id,
-        "ℹ️ যেকোনো সমস্যা হলে সাপোর্ট গ্রুপে জানাতে পারেন:\n"
-        "👉 https://t.me/+f9tOe5fPe0Q0NGZl"
-    )
+    outbox.send_message(message.chat.id, SUPPORT_TEXT)
 
 # --- Create Gmail task ---
-@bot.message_handler(func=lambda m: m.text == "🎁 Create Gmail")
+@router.text("🎁 Create Gmail")
 def create_gmail(message: types.Message):
     task_price_str = get_setting("task_price", "7")
     try:
         task_price = float(task_price_str)
     except Exception:
         task_price = 7
-    bot.send_message(
-        message.chat.id,
-        f"💰আপনি প্রতি জিমেইল এ পাবেন : {task_price} টাকা🎁\n"
-        "📍 [কিভাবে কাজ করবেন?](https://t.me/taskincometoday/16)",
-        parse_mode="Markdown"
-    )
-    bot.send_message(message.chat.id, "📂 এখন আপনার `.xlsx` ফাইলটি আপলোড করুন।")
+    outbox.send_message(message.chat.id, CREATE_GMAIL_TEXT.format(task_price=task_price), parse_mode="Markdown")
+    outbox.send_message(message.chat.id, UPLOAD_XLSX_TEXT)
 
 # --- Receive .xlsx file ---
-@bot.message_handler(content_types=['document'])
+@router.content("document")
 def handle_file(message: types.Message):
     doc = message.document
     uid = message.chat.id
@@ -290,456 +472,860 @@ def handle_file(message: types.Message):
         is_xlsx = True
 
     if not is_xlsx:
-        bot.send_message(uid, "❌ অনুগ্রহ করে শুধুমাত্র `.xlsx` ফাইল আপলোড করুন।")
+        outbox.send_message(uid, "❌ অনুগ্রহ করে শুধুমাত্র `.xlsx` ফাইল আপলোড করুন।")
         return
 
-    # DB তে টাস্ক সেভ
-    with engine.begin() as conn:
-        conn.execute(text("""
-            INSERT INTO tasks (user_id, username, file_id, status)
-            VALUES (:uid, :uname, :fid, 'Pending')
-        """), {"uid": uid, "uname": username, "fid": doc.file_id})
-
-    bot.send_message(uid, "✅ আপনার ফাইলটি সফলভাবে জমা হয়েছে, আমরা যাচাই করছি।")
+    # DB তে টাস্ক সেভ — একই ফাইল (file_unique_id) আগে জমা পড়ে থাকলে duplicate_of এ প্রথমটার id
+    with db.begin() as conn:
+        duplicate_of = conn.execute(text("""
+            INSERT INTO tasks (user_id, username, file_id, status, parse_status, file_unique_id, duplicate_of)
+            VALUES (:uid, :uname, :fid, 'Pending', :ps, :fu,
+                    (SELECT MIN(id) FROM tasks WHERE file_unique_id = :fu))
+            RETURNING duplicate_of
+        """), {"uid": uid, "uname": username, "fid": doc.file_id, "ps": task_ingest.STATUS_QUEUED,
+               "fu": doc.file_unique_id}).scalar()
+        stats.bump(conn, {"tasks:Pending": 1})
+    db.after_commit(task_ingest_task.trigger)
+
+    outbox.send_message(uid, "✅ আপনার ফাইলটি সফলভাবে জমা হয়েছে, আমরা যাচাই করছি।")
     # এডমিনকে অ্যালার্ট
-    try:
-        bot.send_message(ADMIN_ID, f"🆕 নতুন টাস্ক সাবমিশন\n👤 User: {uid} (@{username})\n📄 File: {doc.file_name}")
-    except Exception:
-        pass
+    alert = f"🆕 নতুন টাস্ক সাবমিশন\n👤 User: {uid} (@{username})\n📄 File: {doc.file_name}"
+    if duplicate_of:
+        alert += f"\n♻️ হুবহু একই ফাইল আগে জমা: Task #{duplicate_of}"
+    outbox.send_message(ADMIN_ID, alert)
 
 # ==============================
 # ADMIN PANEL + ITEMS
 # ==============================
-@bot.message_handler(commands=['admin'])
+@router.command("admin")
 def admin_panel(message: types.Message):
     if message.chat.id != ADMIN_ID:
-        bot.send_message(message.chat.id, "❌ আপনি এডমিন নন।")
+        outbox.send_message(message.chat.id, NOT_ADMIN_TEXT)
         return
     send_admin_menu(message.chat.id)
 
-@bot.message_handler(func=lambda msg: msg.text == "📋 All Requests" and msg.chat.id == ADMIN_ID)
+# --- লিস্টগুলো: এক পেজ = একটা মেসেজ, ◀️/▶️ এ edit (admin_pages.py) ---
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "10"))
+
+def send_page(flt: PageFilter, header=""):
+    with db.begin() as conn:
+        page = admin_pages.fetch(conn, flt, size=ADMIN_PAGE_SIZE)
+    text_msg, kb = admin_pages.render(flt, page, header)
+    outbox.send_message(ADMIN_ID, text_msg, reply_markup=kb)
+
+@router.text("📋 All Requests", admin=True)
 def all_requests_handler(message: types.Message):
-    with engine.begin() as conn:
-        rows = conn.execute(text("""
-            SELECT id, user_id, method, number, amount, status
-            FROM withdraws
-            ORDER BY id DESC
-            LIMIT 10
-        """)).fetchall()
-    if not rows:
-        bot.send_message(ADMIN_ID, "📭 কোনো রিকোয়েস্ট পাওয়া যায়নি।")
-    else:
-        for row in rows:
-            send_withdraw_card_to_admin(row)
+    send_page(PageFilter("w", None, None, None))
 
-@bot.message_handler(func=lambda msg: msg.text == "👥 User List" and msg.chat.id == ADMIN_ID)
+@router.text("👥 User List", admin=True)
 def user_list_handler(message: types.Message):
-    with engine.begin() as conn:
-        total_users, total_balance = conn.execute(text("""
-            SELECT COUNT(*), COALESCE(SUM(balance), 0) FROM users
-        """)).fetchone()
-        rows = conn.execute(text("""
-            SELECT user_id, balance
-            FROM users
-            ORDER BY user_id DESC
-            LIMIT 20
-        """)).fetchall()
-
-    text_msg = f"👥 মোট ইউজার: {total_users}\n💰 মোট ব্যালেন্স: {total_balance}৳\n\n"
-    if not rows:
-        text_msg += "📭 এখনো কোনো ইউজার নেই।"
-    else:
-        text_msg += "📌 সর্বশেষ ২০ জন ইউজার:\n"
-        for u in rows:
-            text_msg += f"🆔 {u[0]} | 💰 Balance: {u[1]}৳\n"
-    bot.send_message(ADMIN_ID, text_msg)
+    # মোট হিসাব stat কাউন্টার থেকে (stats.py) — ইউজার যত বাড়ুক খরচ একই
+    with db.begin() as conn:
+        total_users, total_balance = stats.totals(conn)
+    header = f"👥 মোট ইউজার: {total_users}\n💰 মোট ব্যালেন্স: {total_balance}৳"
+    send_page(PageFilter("u", None, None, None), header)
 
 # --- Task Requests (Admin) ---
-@bot.message_handler(func=lambda msg: msg.text == "📂 Task Requests" and msg.chat.id == ADMIN_ID)
+@router.text("📂 Task Requests", admin=True)
 def task_requests_handler(message: types.Message):
-    with engine.begin() as conn:
-        rows = conn.execute(text("""
-            SELECT t.id, t.user_id, t.username,
-                   COALESCE(u.balance,0) AS bal
-            FROM tasks t
-            LEFT JOIN users u ON u.user_id = t.user_id
-            WHERE t.status='Pending'
-            ORDER BY t.id DESC
-            LIMIT 15
-        """)).fetchall()
+    send_page(PageFilter("t", "P", None, None))
 
-    if not rows:
-        bot.send_message(ADMIN_ID, "📭 কোনো Pending Task নেই।")
-        return
+# /withdraws pending bkash 12345, /tasks approved, /users <referrer_id>
+ADMIN_LIST_COMMANDS = {"withdraws": "w", "tasks": "t", "users": "u"}
 
-    for tid, uid, uname, bal in rows:
-        text_msg = (f"🗂️ Task #{tid}\n"
-                    f"👤 User: {uid} @{uname if uname else '—'}\n"
-                    f"💰 Balance: {bal}৳")
-        ikb = types.InlineKeyboardMarkup()
-        ikb.add(
-            types.InlineKeyboardButton("📥 Open File", callback_data=f"topen_{tid}"),
-            types.InlineKeyboardButton("✅ Approve",  callback_data=f"tapprove_{tid}"),
-            types.InlineKeyboardButton("❌ Reject",   callback_data=f"treject_{tid}")
-        )
-        bot.send_message(ADMIN_ID, text_msg, reply_markup=ikb)
+@router.command(*ADMIN_LIST_COMMANDS, admin=True)
+def admin_list_command(message: types.Message):
+    name, *args = message.text.split()
+    view = ADMIN_LIST_COMMANDS[name.lstrip("/").split("@", 1)[0]]
+    try:
+        flt = admin_pages.parse_command(view, args)
+    except ValueError:
+        outbox.send_message(ADMIN_ID, admin_pages.COMMAND_USAGE)
+        return
+    send_page(flt)
+
+@router.callback(admin_pages.PAGE_CODE, admin=True)
+def on_page(call: types.CallbackQuery, payload: str):
+    flt, direction, cursor = admin_pages.decode(payload)
+    with db.begin() as conn:
+        page = admin_pages.fetch(conn, flt, cursor, direction, size=ADMIN_PAGE_SIZE)
+    text_msg, kb = admin_pages.render(flt, page)
+    outbox.edit_message_text(text_msg, chat_id=call.message.chat.id, message_id=call.message.message_id,
+                             reply_markup=kb)
+    outbox.answer_callback_query(call.id)
+
+@router.callback("wc", admin=True)
+def on_withdraw_card(call: types.CallbackQuery, payload: str):
+    with db.begin() as conn:
+        row = conn.execute(text("""
+            SELECT id, user_id, method, number, amount, status FROM withdraws WHERE id=:id
+        """), {"id": int(payload)}).fetchone()
+    if row:
+        send_withdraw_card_to_admin(row)
+    outbox.answer_callback_query(call.id)
+
+@router.callback("tc", admin=True)
+def on_task_card(call: types.CallbackQuery, payload: str):
+    with db.begin() as conn:
+        row = conn.execute(text(f"""
+            SELECT t.id, t.user_id, t.username, COALESCE(u.balance,0) + {ledger.pending_delta_sql("t.user_id")},
+                   {task_ingest.SUMMARY_COLUMNS}
+            FROM tasks t
+            LEFT JOIN users u ON u.user_id = t.user_id
+            WHERE t.id = :id
+        """), {"id": int(payload)}).fetchone()
+    if row:
+        tid, uid, uname, bal = row[:4]
+        text_msg = TASK_CARD_TEXT.format(tid=tid, uid=uid, uname=uname if uname else '—', bal=bal,
+                                         summary=task_ingest.describe(*row[4:]))
+        outbox.send_message(ADMIN_ID, text_msg, reply_markup=inline_keyboard(TASK_DECISION_KB, tid))
+    outbox.answer_callback_query(call.id)
 
 # ==============================
 # BACK BUTTON (GLOBAL)
 # ==============================
-@bot.message_handler(func=lambda m: m.text == "⬅️ Back")
+@router.text("⬅️ Back")
 def on_back(message: types.Message):
     uid = message.chat.id
-    withdraw_steps.pop(uid, None)
-    admin_steps.pop(uid, None)
+    end_flow(uid)
     if uid == ADMIN_ID:
         send_admin_menu(uid)
     else:
         send_main_menu(uid)
 
 # ==============================
-# WITHDRAW FLOW + ADMIN FLOW (catch-all)
+# WITHDRAW FLOW
 # ==============================
-@bot.message_handler(func=lambda m: True)
-def catch_all(message: types.Message):
+@router.step("withdraw", "method")
+def withdraw_method_step(message: types.Message, state: dict):
     uid = message.chat.id
     text_msg = message.text
+    if text_msg in ["📲 Bkash", "📲 Nagad"]:
+        state["method"] = text_msg
+        state["step"] = "number"
+        save_flow(uid, state)
+        outbox.send_message(uid, f"📱 আপনার {text_msg} নম্বর লিখুন:")
+    else:
+        outbox.send_message(uid, "❌ Bkash/Nagad সিলেক্ট করুন বা ⬅️ Back চাপুন।")
 
-    # ---------- Withdraw flow ----------
-    if uid in withdraw_steps:
-        step = withdraw_steps[uid]["step"]
+@router.step("withdraw", "number")
+def withdraw_number_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    state["number"] = message.text
+    state["step"] = "amount"
+    save_flow(uid, state)
+    outbox.send_message(uid, "💵 কত টাকা Withdraw করবেন? (সর্বনিম্ন 50৳)")
 
-        if step == "method":
-            if text_msg in ["📲 Bkash", "📲 Nagad"]:
-                withdraw_steps[uid]["method"] = text_msg
-                withdraw_steps[uid]["step"] = "number"
-                bot.send_message(uid, f"📱 আপনার {text_msg} নম্বর লিখুন:")
-            else:
-                bot.send_message(uid, "❌ Bkash/Nagad সিলেক্ট করুন বা ⬅️ Back চাপুন।")
-            return
-
-        if step == "number":
-            withdraw_steps[uid]["number"] = text_msg
-            withdraw_steps[uid]["step"] = "amount"
-            bot.send_message(uid, "💵 কত টাকা Withdraw করবেন? (সর্বনিম্ন 50৳)")
-            return
-
-        if step == "amount":
-            try:
-                amount = int(text_msg)
-            except Exception:
-                bot.send_message(uid, "❌ পরিমাণ সংখ্যায় দিন।")
-                return
-
-            with engine.begin() as conn:
-                row = conn.execute(text("SELECT COALESCE(balance,0) FROM users WHERE user_id=:uid"),
-                                   {"uid": uid}).fetchone()
-                balance = row[0] if row else 0
-
-                if amount < 50:
-                    bot.send_message(uid, "⚠️ সর্বনিম্ন withdraw 50৳")
-                elif amount > balance:
-                    bot.send_message(uid, f"❌ আপনার ব্যালেন্সে যথেষ্ট টাকা নেই (বর্তমান: {balance}৳)")
-                else:
-                    method = withdraw_steps[uid]["method"]
-                    number = withdraw_steps[uid]["number"]
-
-                    # Create request & deduct now
-                    conn.execute(text("""
-                        INSERT INTO withdraws (user_id, method, number, amount, status)
-                        VALUES (:uid, :m, :n, :a, 'Pending')
-                    """), {"uid": uid, "m": method, "n": number, "a": amount})
-
-                    conn.execute(text("""
-                        UPDATE users SET balance = COALESCE(balance,0) - :a WHERE user_id=:uid
-                    """), {"a": amount, "uid": uid})
-
-                    bot.send_message(uid, f"✅ Withdraw Request সাবমিট হয়েছে!\n💳 {method}\n☎️ {number}\n💵 {amount}৳")
-                    try:
-                        bot.send_message(ADMIN_ID, f"🔔 নতুন Withdraw Request:\n👤 {uid}\n💳 {method} ({number})\n💵 {amount}৳")
-                    except Exception:
-                        pass
-
-            withdraw_steps.pop(uid, None)
-            return
-
-    # ---------- Admin flow ----------
-    if uid == ADMIN_ID:
-        # Add
-        if text_msg == "➕ Add Balance":
-            admin_steps[uid] = {"action": "add", "step": "userid"}
-            bot.send_message(uid, "🎯 ইউজারের ID দিন:")
-            return
-
-        if admin_steps.get(uid, {}).get("action") == "add":
-            if admin_steps[uid]["step"] == "userid":
-                try:
-                    target = int(text_msg)
-                    admin_steps[uid]["target_id"] = target
-                    admin_steps[uid]["step"] = "amount"
-                    bot.send_message(uid, "💵 কত টাকা যোগ করবেন?")
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
-                return
-            elif admin_steps[uid]["step"] == "amount":
-                try:
-                    amount = int(text_msg)
-                    target = admin_steps[uid]["target_id"]
-                    with engine.begin() as conn:
-                        conn.execute(text("""
-                            UPDATE users SET balance = COALESCE(balance,0) + :a WHERE user_id=:uid
-                        """), {"a": amount, "uid": target})
-                    apply_ref_bonus_if_increase(target, amount)
-                    bot.send_message(uid, f"✅ {target} এর ব্যালেন্সে {amount}৳ যোগ হয়েছে।")
-                    try:
-                        bot.send_message(target, f"🎉 আপনার ব্যালেন্সে {amount}৳ যোগ হয়েছে।")
-                    except Exception:
-                        pass
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
-                admin_steps.pop(uid, None)
-                return
-
-        # Set
-        if text_msg == "✏️ Set Balance":
-            admin_steps[uid] = {"action": "set", "step": "userid"}
-            bot.send_message(uid, "🎯 ইউজারের ID দিন:")
-            return
-
-        if admin_steps.get(uid, {}).get("action") == "set":
-            if admin_steps[uid]["step"] == "userid":
-                try:
-                    target = int(text_msg)
-                    admin_steps[uid]["target_id"] = target
-                    with engine.begin() as conn:
-                        row = conn.execute(text("SELECT COALESCE(balance,0) FROM users WHERE user_id=:uid"),
-                                           {"uid": target}).fetchone()
-                        old_balance = row[0] if row else 0
-                    admin_steps[uid]["old_balance"] = old_balance
-                    admin_steps[uid]["step"] = "amount"
-                    bot.send_message(uid, f"💵 নতুন ব্যালেন্স কত হবে? (বর্তমান {old_balance}৳)")
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
-                return
-            elif admin_steps[uid]["step"] == "amount":
-                try:
-                    new_amount = int(text_msg)
-                    target = admin_steps[uid]["target_id"]
-                    old_balance = admin_steps[uid]["old_balance"]
-                    with engine.begin() as conn:
-                        conn.execute(text("UPDATE users SET balance=:b WHERE user_id=:uid"),
-                                     {"b": new_amount, "uid": target})
-                    delta = new_amount - old_balance
-                    apply_ref_bonus_if_increase(target, delta)
-                    bot.send_message(uid, f"✅ {target} এর ব্যালেন্স {new_amount}৳ এ সেট হয়েছে।")
-                    try:
-                        bot.send_message(target, f"⚠️ অ্যাডমিন আপনার ব্যালেন্স সেট করেছে: {new_amount}৳")
-                    except Exception:
-                        pass
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
-                admin_steps.pop(uid, None)
-                return
-
-        # Reduce
-        if text_msg == "➖ Reduce Balance":
-            admin_steps[uid] = {"action": "reduce", "step": "userid"}
-            bot.send_message(uid, "🎯 ইউজারের ID দিন:")
-            return
-
-        if admin_steps.get(uid, {}).get("action") == "reduce":
-            if admin_steps[uid]["step"] == "userid":
-                try:
-                    target = int(text_msg)
-                    admin_steps[uid]["target_id"] = target
-                    admin_steps[uid]["step"] = "amount"
-                    bot.send_message(uid, "💵 কত টাকা কমাবেন?")
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
-                return
-            elif admin_steps[uid]["step"] == "amount":
-                try:
-                    amount = int(text_msg)
-                    target = admin_steps[uid]["target_id"]
-                    with engine.begin() as conn:
-                        conn.execute(text("""
-                            UPDATE users SET balance = COALESCE(balance,0) - :a WHERE user_id=:uid
-                        """), {"a": amount, "uid": target})
-                    bot.send_message(uid, f"✅ {target} এর ব্যালেন্স থেকে {amount}৳ কেটে নেওয়া হয়েছে।")
-                    try:
-                        bot.send_message(target, f"⚠️ আপনার ব্যালেন্স থেকে {amount}৳ কমানো হয়েছে।")
-                    except Exception:
-                        pass
-                except Exception:
-                    bot.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
-                admin_steps.pop(uid, None)
-                return
-
-        # --- NEW: Set Task Price via Admin Panel ---
-        if text_msg == "⚙️ Set Task Price":
-            admin_steps[uid] = {"action": "set_task_price", "step": "ask"}
-            current = get_setting("task_price", "7")
-            bot.send_message(uid, f"🛠️ বর্তমান টাস্ক প্রাইস {current}৳\nনতুন প্রাইস লিখুন:")
-            return
-
-        if admin_steps.get(uid, {}).get("action") == "set_task_price":
-            try:
-                new_price = float(text_msg)
-                if new_price < 0:
-                    raise ValueError("negative")
-                set_setting("task_price", str(new_price))
-                bot.send_message(uid, f"✅ টাস্ক প্রাইস এখন {new_price}৳ করা হয়েছে।")
-            except Exception:
-                bot.send_message(uid, "❌ সঠিক সংখ্যা লিখুন। (উদাহরণ: 7)")
-            admin_steps.pop(uid, None)
-            return
+@router.step("withdraw", "amount")
+def withdraw_amount_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        amount = int(message.text)
+    except Exception:
+        outbox.send_message(uid, "❌ পরিমাণ সংখ্যায় দিন।")
+        return
+
+    if amount < 50:
+        outbox.send_message(uid, "⚠️ সর্বনিম্ন withdraw 50৳")
+        end_flow(uid)
+        return
+
+    method = state["method"]
+    number = state["number"]
+    # ব্যালেন্স চেক + কাটা + রিকোয়েস্ট একটাই স্টেটমেন্টে — পরপর দুইবার চাপলেও ডাবল ডেবিট হয় না
+    with db.begin() as conn:
+        withdraw_id, balance = create_withdraw(conn, uid, method, number, amount)
+        if withdraw_id is not None:
+            stats.bump(conn, stats.withdraw_counters("Pending", method, amount))
+
+    if withdraw_id is None:
+        outbox.send_message(uid, f"❌ আপনার ব্যালেন্সে যথেষ্ট টাকা নেই (বর্তমান: {balance}৳)")
+    else:
+        invalidate_user(uid)
+        outbox.send_message(uid, f"✅ Withdraw Request সাবমিট হয়েছে!\n💳 {method}\n☎️ {number}\n💵 {amount}৳")
+        outbox.send_message(ADMIN_ID, f"🔔 নতুন Withdraw Request:\n👤 {uid}\n💳 {method} ({number})\n💵 {amount}৳")
+
+    end_flow(uid)
 
 # ==============================
-# WITHDRAW APPROVE / REJECT (INLINE)
+# ADMIN FLOW (add / set / reduce / task price)
 # ==============================
-@bot.callback_query_handler(func=lambda c: c.data.startswith("approve_") or c.data.startswith("reject_") or
-                                      c.data.startswith("tapprove_") or c.data.startswith("treject_") or
-                                      c.data.startswith("topen_"))
-def on_inline_decision(call: types.CallbackQuery):
-    # শুধু এডমিন
-    if call.from_user.id != ADMIN_ID:
-        bot.answer_callback_query(call.id, "অনুমতি নেই")
+ADMIN_FLOW_BUTTONS = {
+    "➕ Add Balance": "add",
+    "✏️ Set Balance": "set",
+    "➖ Reduce Balance": "reduce",
+}
+
+@router.text(*ADMIN_FLOW_BUTTONS, admin=True)
+def admin_start_flow(message: types.Message):
+    uid = message.chat.id
+    start_flow(uid, ADMIN_FLOW_BUTTONS[message.text], "userid")
+    outbox.send_message(uid, "🎯 ইউজারের ID দিন:")
+
+@router.step("add", "userid", admin=True)
+def admin_add_userid_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        target = int(message.text)
+        state["target_id"] = target
+        state["step"] = "amount"
+        save_flow(uid, state)
+        outbox.send_message(uid, "💵 কত টাকা যোগ করবেন?")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
+
+@router.step("add", "amount", admin=True)
+def admin_add_amount_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        amount = int(message.text)
+        target = state["target_id"]
+        with db.savepoint() as conn:
+            res = credit_with_ref_bonus(conn, target, amount)
+        invalidate_user(target)
+        if res:
+            notify_ref_bonus(res[0], target, res[1])
+        outbox.send_message(uid, f"✅ {target} এর ব্যালেন্সে {amount}৳ যোগ হয়েছে।")
+        outbox.send_message(target, f"🎉 আপনার ব্যালেন্সে {amount}৳ যোগ হয়েছে।")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
+    end_flow(uid)
+
+@router.step("set", "userid", admin=True)
+def admin_set_userid_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        target = int(message.text)
+        state["target_id"] = target
+        with db.savepoint() as conn:
+            old_balance = ledger.balance_of(conn, target)
+        state["old_balance"] = old_balance
+        state["step"] = "amount"
+        save_flow(uid, state)
+        outbox.send_message(uid, f"💵 নতুন ব্যালেন্স কত হবে? (বর্তমান {old_balance}৳)")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
+
+@router.step("set", "amount", admin=True)
+def admin_set_amount_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        new_amount = int(message.text)
+        target = state["target_id"]
+        # পুরনো ব্যালেন্স আপডেটের সময়েই (row lock নিয়ে) পড়া হয় — userid স্টেপের পরে বদলালেও ডেল্টা ঠিক থাকে
+        with db.savepoint() as conn:
+            res = set_balance_with_ref_bonus(conn, target, new_amount)
+        invalidate_user(target)
+        if res:
+            notify_ref_bonus(res[1], target, res[2])
+        outbox.send_message(uid, f"✅ {target} এর ব্যালেন্স {new_amount}৳ এ সেট হয়েছে।")
+        outbox.send_message(target, f"⚠️ অ্যাডমিন আপনার ব্যালেন্স সেট করেছে: {new_amount}৳")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
+    end_flow(uid)
+
+@router.step("reduce", "userid", admin=True)
+def admin_reduce_userid_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        target = int(message.text)
+        state["target_id"] = target
+        state["step"] = "amount"
+        save_flow(uid, state)
+        outbox.send_message(uid, "💵 কত টাকা কমাবেন?")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক ইউজার ID দিন।")
+
+@router.step("reduce", "amount", admin=True)
+def admin_reduce_amount_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        amount = int(message.text)
+        target = state["target_id"]
+        with db.savepoint() as conn:
+            debit(conn, target, amount)
+        invalidate_user(target)
+        outbox.send_message(uid, f"✅ {target} এর ব্যালেন্স থেকে {amount}৳ কেটে নেওয়া হয়েছে।")
+        outbox.send_message(target, f"⚠️ আপনার ব্যালেন্স থেকে {amount}৳ কমানো হয়েছে।")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক সংখ্যা দিন।")
+    end_flow(uid)
+
+# --- Bulk Credit (CSV/XLSX: user_id, amount) ---
+@router.text("📥 Bulk Credit", admin=True)
+def admin_bulk_credit(message: types.Message):
+    uid = message.chat.id
+    start_flow(uid, "bulk_credit", "file")
+    outbox.send_message(uid, BULK_CREDIT_TEXT, parse_mode="Markdown")
+
+@router.step("bulk_credit", "file", admin=True, content_types=("document", "text"))
+def admin_bulk_credit_file(message: types.Message, state: dict):
+    uid = message.chat.id
+    doc = message.document
+    if doc is None or not (doc.file_name or "").lower().endswith((".csv", ".xlsx")):
+        outbox.send_message(uid, "❌ `.csv` বা `.xlsx` ফাইল পাঠান, অথবা ⬅️ Back চাপুন।", parse_mode="Markdown")
         return
 
-    data = call.data
+    try:
+        data = _download_file(doc.file_id)
+        credits, errors = parse_credit_file(doc.file_name, data)
+    except Exception as e:
+        outbox.send_message(uid, f"❌ ফাইল পড়া যায়নি: {e}")
+        end_flow(uid)
+        return
 
-    # ---- Withdraw decisions ----
-    if data.startswith("approve_") or data.startswith("reject_"):
-        action, req_id_str = data.split("_", 1)
-        try:
-            req_id = int(req_id_str)
-        except Exception:
-            bot.answer_callback_query(call.id, "ভুল ID")
-            return
-
-        with engine.begin() as conn:
-            row = conn.execute(text("""
-                SELECT user_id, amount, status FROM withdraws WHERE id=:id
-            """), {"id": req_id}).fetchone()
-
-        if not row:
-            bot.answer_callback_query(call.id, "রিকোয়েস্ট পাওয়া যায়নি")
-            return
-
-        u_id, amount, status = row
-        if status != "Pending":
-            bot.answer_callback_query(call.id, "ইতিমধ্যে প্রসেস হয়েছে")
-            return
-
-        if action == "approve":
-            with engine.begin() as conn:
-                conn.execute(text("UPDATE withdraws SET status='Approved' WHERE id=:id"), {"id": req_id})
-            try:
-                bot.send_message(u_id, f"✅ আপনার Withdraw Request {amount}৳ Approved হয়েছে!")
-            except Exception:
-                pass
-            try:
-                bot.edit_message_text(f"🆔 {req_id} Withdraw Approved ✅",
-                                      chat_id=call.message.chat.id, message_id=call.message.message_id)
-            except Exception:
-                pass
-            bot.answer_callback_query(call.id, "Approved ✅")
-
-        elif action == "reject":
-            with engine.begin() as conn:
-                conn.execute(text("UPDATE withdraws SET status='Rejected' WHERE id=:id"), {"id": req_id})
-                conn.execute(text("""
-                    UPDATE users SET balance = COALESCE(balance,0) + :a WHERE user_id=:uid
-                """), {"a": amount, "uid": u_id})
-            try:
-                bot.send_message(u_id, f"❌ আপনার Withdraw Request {amount}৳ Rejected হয়েছে। টাকা ফেরত দেওয়া হয়েছে।")
-            except Exception:
-                pass
-            try:
-                bot.edit_message_text(f"🆔 {req_id} Withdraw Rejected ❌",
-                                      chat_id=call.message.chat.id, message_id=call.message.message_id)
-            except Exception:
-                pass
-            bot.answer_callback_query(call.id, "Rejected ❌")
+    # সব ক্রেডিট + রেফার বোনাস একটাই স্টেটমেন্ট
+    try:
+        with db.savepoint() as conn:
+            credited, bonuses, missing = apply_bulk_credit(conn, credits)
+    except Exception as e:
+        outbox.send_message(uid, f"❌ Bulk credit হয়নি, কারো ব্যালেন্স বদলায়নি: {str(getattr(e, 'orig', None) or e)[:300]}")
+        end_flow(uid)
+        return
+    end_flow(uid)
+
+    invalidate_user(*[u for u, _ in credited])
+    for u_id, amount in credited:
+        outbox.send_message(u_id, f"🎉 আপনার ব্যালেন্সে {amount}৳ যোগ হয়েছে।")
+    for referrer, bonus, from_uid in bonuses:
+        notify_ref_bonus(referrer, from_uid, bonus)
+
+    report = (f"✅ Bulk credit: {len(credited)} জন, মোট {sum(a for _, a in credited)}৳\n"
+              f"🎁 রেফার বোনাস: {len(bonuses)} জন, মোট {sum(b for _, b, _ in bonuses)}৳")
+    if missing:
+        report += f"\n⚠️ পাওয়া যায়নি ({len(missing)}): " + ", ".join(map(str, missing[:20]))
+    if errors:
+        report += f"\n❌ বাদ পড়া লাইন ({len(errors)}):\n" + "\n".join(errors[:20])
+    outbox.send_message(uid, report)
+
+# --- Payout: Pending withdraw এর CSV → এডমিন decision কলামে A/R লিখে ফেরত পাঠায় (payouts.py) ---
+@router.text("💸 Payout CSV", admin=True)
+def admin_payout_export(message: types.Message):
+    uid = message.chat.id
+    with db.begin() as conn:
+        rows = payouts.pending_withdraws(conn)
+    if not rows:
+        outbox.send_message(uid, "📭 কোনো Pending withdraw নেই।")
+        return
+    # CSV লেখা transaction এর বাইরে
+    csv_file, summary = payouts.export_csv(rows)
+    lines = [f"💸 Pending withdraw — {time.strftime('%d-%m-%Y')}"]
+    for method, (count, total) in summary.items():
+        lines.append(f"{method}: {count} টা, মোট {total}৳")
+    try:
+        sent = outbox.send_document(uid, types.InputFile(csv_file, file_name=f"payout-{time.strftime('%Y%m%d-%H%M')}.csv"),
+                                    caption="\n".join(lines))
+    except Exception:
+        csv_file.close()
+        raise
+    # outbox ফাইলটা পরে (commit এর পরে, অন্য thread এ) আপলোড করে — তাই বন্ধ পাঠানো শেষ/বাতিল হলে
+    sent.add_done_callback(lambda _: csv_file.close())
+    start_flow(uid, "payout", "file")
+    outbox.send_message(uid, "✍️ পেমেন্ট শেষে decision কলামে A (Approved) বা R (Rejected) লিখে ফাইলটা এখানে পাঠান।\n"
+                             "খালি রাখা রিকোয়েস্ট Pending থাকবে। Reject হলে টাকা ফেরত যাবে।")
+
+@router.step("payout", "file", admin=True, content_types=("document", "text"))
+def admin_payout_file(message: types.Message, state: dict):
+    uid = message.chat.id
+    doc = message.document
+    if doc is None or not (doc.file_name or "").lower().endswith((".csv", ".xlsx")):
+        outbox.send_message(uid, "❌ `.csv` বা `.xlsx` ফাইল পাঠান, অথবা ⬅️ Back চাপুন।", parse_mode="Markdown")
         return
 
-    # ---- Task requests (open / approve / reject) ----
-    if data.startswith("topen_"):
-        tid = int(data.split("_", 1)[1])
-        with engine.begin() as conn:
-            r = conn.execute(text("SELECT file_id FROM tasks WHERE id=:id"), {"id": tid}).fetchone()
-        if not r:
-            bot.answer_callback_query(call.id, "ফাইল পাওয়া যায়নি")
-            return
-        file_id = r[0]
-        try:
-            bot.send_document(ADMIN_ID, file_id, caption=f"🗂️ Task #{tid} file")
-        except Exception:
-            pass
-        bot.answer_callback_query(call.id, "ফাইল পাঠানো হলো")
+    try:
+        decisions, errors = payouts.parse_decisions(doc.file_name, _download_file(doc.file_id))
+    except Exception as e:
+        outbox.send_message(uid, f"❌ ফাইল পড়া যায়নি: {e}")
+        end_flow(uid)
         return
 
-    if data.startswith("tapprove_") or data.startswith("treject_"):
-        is_approve = data.startswith("tapprove_")
-        tid = int(data.split("_", 1)[1])
+    # সব status বদল + রিফান্ড একটাই স্টেটমেন্ট
+    with db.begin() as conn:
+        done, skipped = payouts.apply_decisions(conn, decisions)
+    end_flow(uid)
+
+    for _, u_id, amount, _, approve in done:
+        notify_withdraw_decision(u_id, amount, approve)
+
+    approved = [r for r in done if r[4]]
+    rejected = [r for r in done if not r[4]]
+    report = (f"✅ Approved: {len(approved)} টা, মোট {sum(r[2] for r in approved)}৳\n"
+              f"❌ Rejected (রিফান্ড): {len(rejected)} টা, মোট {sum(r[2] for r in rejected)}৳")
+    if skipped:
+        report += f"\n⚠️ আগেই প্রসেস হয়েছে/পাওয়া যায়নি ({len(skipped)}): " + ", ".join(map(str, skipped[:20]))
+    if errors:
+        report += f"\n❌ বাদ পড়া লাইন ({len(errors)}):\n" + "\n".join(errors[:20])
+    outbox.send_message(uid, report)
+
+# --- Stats dashboard (stats.py কাউন্টার থেকে, কোনো টেবিল স্ক্যান নেই) ---
+@router.text("📊 Stats", admin=True)
+def admin_stats(message: types.Message):
+    with db.begin() as conn:
+        report = stats.dashboard(conn)
+    outbox.send_message(message.chat.id, report)
+
+# --- SQL প্রোফাইল: /sqlprofile [on|off|reset] — settings এ রাখা, তাই সব worker এ (ক্যাশ TTL এর মধ্যে) চালু/বন্ধ ---
+def _sync_profiler():
+    query_profiler.enabled = get_setting("sql_profile", SQL_PROFILE) == "1"
+
+def _sql_profile_text(rep: dict) -> str:
+    lines = [f"🧮 SQL profile: {'চালু ✅' if rep['enabled'] else 'বন্ধ ⛔'} (slow ≥ {rep['slow_ms']:g}ms, এই worker)",
+             f"updates {rep['updates']} · statements {rep['statements']} · tx {rep['transactions']} · "
+             f"slow {rep['slow']} · heavy {rep['heavy_updates']}"]
+    if rep["top_statements"]:
+        lines.append("\n⏱ মোট সময়ে শীর্ষ:")
+        lines += [f"{s['total_ms']:g}ms {s['count']}× (avg {s['avg_ms']:g}) {s['sql'][:90]}"
+                  for s in rep["top_statements"][:5]]
+    if rep["worst_updates"]:
+        lines.append("\n🐢 বেশি স্টেটমেন্টের আপডেট:")
+        lines += [f"{w['label']}: {w['statements']} stmt, {w['db_ms']:g}ms" for w in rep["worst_updates"][:5]]
+    return "\n".join(lines)
+
+@router.command("sqlprofile", admin=True)
+def admin_sql_profile(message: types.Message):
+    arg = (message.text.split()[1:] or [""])[0].lower()
+    if arg in ("on", "off"):
+        set_setting("sql_profile", "1" if arg == "on" else "0")
+        query_profiler.enabled = arg == "on"
+        if arg == "off":
+            query_profiler.log_report()
+    elif arg == "reset":
+        query_profiler.reset()
+    elif arg:
+        outbox.send_message(message.chat.id, "ব্যবহার: /sqlprofile [on|off|reset]")
+        return
+    outbox.send_message(message.chat.id, _sql_profile_text(query_profiler.report()))
 
-        with engine.begin() as conn:
-            row = conn.execute(text("SELECT user_id, status FROM tasks WHERE id=:id"), {"id": tid}).fetchone()
+# --- Broadcast: সব ইউজারকে মেসেজ (broadcast.py, ব্যাকগ্রাউন্ডে throttled) ---
+@router.text("📣 Broadcast", admin=True)
+def admin_broadcast(message: types.Message):
+    uid = message.chat.id
+    start_flow(uid, "broadcast", "ask")
+    outbox.send_message(uid, BROADCAST_TEXT)
 
-        if not row:
-            bot.answer_callback_query(call.id, "টাস্ক পাওয়া যায়নি")
-            return
+@router.step("broadcast", "ask", admin=True)
+def admin_broadcast_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    end_flow(uid)
+    if not (message.text or "").strip():
+        outbox.send_message(uid, "❌ খালি মেসেজ পাঠানো যাবে না।")
+        return
+    with db.begin() as conn:
+        job_id = broadcast.create_job(conn, message.text, uid)
+    db.after_commit(broadcast_task.trigger)
+    outbox.send_message(uid, f"📣 Broadcast #{job_id} শুরু হয়েছে। শেষ হলে রিপোর্ট পাবেন।\n/broadcasts — অগ্রগতি",
+                        reply_markup=inline_keyboard(BROADCAST_KB, job_id))
+
+@router.command("broadcasts", admin=True)
+def admin_broadcasts(message: types.Message):
+    with db.begin() as conn:
+        jobs = broadcast.recent_jobs(conn)
+    if not jobs:
+        outbox.send_message(message.chat.id, "📭 কোনো Broadcast নেই।")
+        return
+    lines = ["📣 সাম্প্রতিক Broadcast:"]
+    for job_id, status, sent, blocked, failed, last_uid in jobs:
+        lines.append(f"#{job_id} {status} | 📨 {sent} | 🚫 {blocked} | ⚠️ {failed} | শেষ ID {last_uid}")
+    outbox.send_message(message.chat.id, "\n".join(lines))
+
+@router.callback("bc", admin=True)
+def on_broadcast_cancel(call: types.CallbackQuery, payload: str):
+    job_id = int(payload)
+    with db.begin() as conn:
+        cancelled = broadcast.cancel_job(conn, job_id)
+    if not cancelled:
+        outbox.answer_callback_query(call.id, "ইতিমধ্যে শেষ হয়েছে")
+        return
+    outbox.edit_message_text(f"📣 Broadcast #{job_id} → cancelled ⛔",
+                             chat_id=call.message.chat.id, message_id=call.message.message_id)
+    outbox.answer_callback_query(call.id, "Cancelled ⛔")
 
-        u_id, status = row
-        if status != "Pending":
-            bot.answer_callback_query(call.id, "ইতিমধ্যে প্রসেস হয়েছে")
-            return
+# --- Set Task Price via Admin Panel ---
+@router.text("⚙️ Set Task Price", admin=True)
+def admin_task_price(message: types.Message):
+    uid = message.chat.id
+    start_flow(uid, "set_task_price", "ask")
+    current = get_setting("task_price", "7")
+    outbox.send_message(uid, f"🛠️ বর্তমান টাস্ক প্রাইস {current}৳\nনতুন প্রাইস লিখুন:")
 
-        new_status = "Approved" if is_approve else "Rejected"
-        with engine.begin() as conn:
-            conn.execute(text("UPDATE tasks SET status=:st WHERE id=:id"), {"st": new_status, "id": tid})
+@router.step("set_task_price", "ask", admin=True)
+def admin_task_price_step(message: types.Message, state: dict):
+    uid = message.chat.id
+    try:
+        new_price = float(message.text)
+        if new_price < 0:
+            raise ValueError("negative")
+        with db.savepoint():
+            set_setting("task_price", str(new_price))
+        outbox.send_message(uid, f"✅ টাস্ক প্রাইস এখন {new_price}৳ করা হয়েছে।")
+    except Exception:
+        outbox.send_message(uid, "❌ সঠিক সংখ্যা লিখুন। (উদাহরণ: 7)")
+    end_flow(uid)
 
-        try:
+# ==============================
+# WITHDRAW APPROVE / REJECT (INLINE)
+# ==============================
+def notify_withdraw_decision(u_id: int, amount: int, approve: bool):
+    if approve:
+        outbox.send_message(u_id, f"✅ আপনার Withdraw Request {amount}৳ Approved হয়েছে!")
+    else:
+        invalidate_user(u_id)
+        outbox.send_message(u_id, f"❌ আপনার Withdraw Request {amount}৳ Rejected হয়েছে। টাকা ফেরত দেওয়া হয়েছে।")
+
+def _withdraw_decision(call: types.CallbackQuery, payload: str, approve: bool):
+    try:
+        req_id = int(payload)
+    except Exception:
+        outbox.answer_callback_query(call.id, "ভুল ID")
+        return
+
+    # status চেক + আপডেট (+ reject হলে রিফান্ড) একটাই স্টেটমেন্ট — দুইবার ট্যাপে ডাবল রিফান্ড হয় না
+    with db.begin() as conn:
+        res = decide_withdraw(conn, req_id, approve)
+        if res is None:
+            exists = conn.execute(text("SELECT 1 FROM withdraws WHERE id=:id"), {"id": req_id}).fetchone()
+        else:
+            _, amount, method = res
+            stats.bump(conn, {**stats.withdraw_counters("Pending", method, amount, sign=-1),
+                              **stats.withdraw_counters("Approved" if approve else "Rejected", method, amount)})
+
+    if res is None:
+        if not exists:
+            outbox.answer_callback_query(call.id, "রিকোয়েস্ট পাওয়া যায়নি")
+        else:
+            outbox.answer_callback_query(call.id, "ইতিমধ্যে প্রসেস হয়েছে")
+        return
+
+    u_id, amount, _ = res
+    notify_withdraw_decision(u_id, amount, approve)
+    if approve:
+        outbox.edit_message_text(f"🆔 {req_id} Withdraw Approved ✅",
+                                 chat_id=call.message.chat.id, message_id=call.message.message_id)
+        outbox.answer_callback_query(call.id, "Approved ✅")
+    else:
+        outbox.edit_message_text(f"🆔 {req_id} Withdraw Rejected ❌",
+                                 chat_id=call.message.chat.id, message_id=call.message.message_id)
+        outbox.answer_callback_query(call.id, "Rejected ❌")
+
+@router.callback("wa", legacy="approve", admin=True)
+def on_withdraw_approve(call: types.CallbackQuery, payload: str):
+    _withdraw_decision(call, payload, approve=True)
+
+@router.callback("wr", legacy="reject", admin=True)
+def on_withdraw_reject(call: types.CallbackQuery, payload: str):
+    _withdraw_decision(call, payload, approve=False)
+
+# ==============================
+# TASK REQUESTS (open / approve / reject)
+# ==============================
+@router.callback("to", legacy="topen", admin=True)
+def on_task_open(call: types.CallbackQuery, payload: str):
+    tid = int(payload)
+    with db.begin() as conn:
+        r = conn.execute(text("SELECT file_id FROM tasks WHERE id=:id"), {"id": tid}).fetchone()
+    if not r:
+        outbox.answer_callback_query(call.id, "ফাইল পাওয়া যায়নি")
+        return
+    file_id = r[0]
+    outbox.send_document(ADMIN_ID, file_id, caption=f"🗂️ Task #{tid} file")
+    outbox.answer_callback_query(call.id, "ফাইল পাঠানো হলো")
+
+def notify_task_decisions(by_user: dict, is_approve: bool):
+    """ইউজার প্রতি একটাই মেসেজ — একটা টাস্ক হলে আগের মতো, অনেকগুলো হলে একসাথে"""
+    for u_id, tids in by_user.items():
+        if len(tids) > 1:
+            ids = ", ".join(f"#{t}" for t in tids[:10]) + (" ..." if len(tids) > 10 else "")
             if is_approve:
-                bot.send_message(u_id, "✅ আপনার Gmail অ্যাপ্রুভ হয়েছে। আপনার Report কাউন্ট করে আপনার ব্যালান্স যুক্ত হয়ে যাবে ধন্যবাদ!")
+                outbox.send_message(u_id, f"✅ আপনার {len(tids)}টি Gmail টাস্ক ({ids}) অ্যাপ্রুভ হয়েছে। "
+                                          "আপনার Report কাউন্ট করে ব্যালান্স যুক্ত হয়ে যাবে, ধন্যবাদ!")
             else:
-                bot.send_message(u_id, "❌ দুঃখিত, আপনার Gmail রিজেক্ট করা হয়েছে।")
-        except Exception:
-            pass
+                outbox.send_message(u_id, f"❌ দুঃখিত, আপনার {len(tids)}টি Gmail টাস্ক ({ids}) রিজেক্ট করা হয়েছে।")
+        elif is_approve:
+            outbox.send_message(u_id, "✅ আপনার Gmail অ্যাপ্রুভ হয়েছে। আপনার Report কাউন্ট করে আপনার ব্যালান্স যুক্ত হয়ে যাবে ধন্যবাদ!")
+        else:
+            outbox.send_message(u_id, "❌ দুঃখিত, আপনার Gmail রিজেক্ট করা হয়েছে।")
+
+def _task_decision(call: types.CallbackQuery, payload: str, is_approve: bool):
+    tid = int(payload)
+
+    new_status = "Approved" if is_approve else "Rejected"
+    # শর্তসাপেক্ষ UPDATE — দুইবার ট্যাপে কাউন্টার দুইবার সরে না
+    with db.begin() as conn:
+        by_user = task_moderation.decide(conn, task_moderation.Selection(ids=[tid]), is_approve)
+        if not by_user:
+            exists = conn.execute(text("SELECT 1 FROM tasks WHERE id=:id"), {"id": tid}).fetchone()
+
+    if not by_user:
+        if not exists:
+            outbox.answer_callback_query(call.id, "টাস্ক পাওয়া যায়নি")
+        else:
+            outbox.answer_callback_query(call.id, "ইতিমধ্যে প্রসেস হয়েছে")
+        return
 
-        try:
-            bot.edit_message_text(f"🗂️ Task #{tid} → {new_status}",
-                                  chat_id=call.message.chat.id, message_id=call.message.message_id)
-        except Exception:
-            pass
+    notify_task_decisions(by_user, is_approve)
 
-        bot.answer_callback_query(call.id, f"{new_status} ✅" if is_approve else f"{new_status} ❌")
+    outbox.edit_message_text(f"🗂️ Task #{tid} → {new_status}",
+                             chat_id=call.message.chat.id, message_id=call.message.message_id)
+
+    outbox.answer_callback_query(call.id, f"{new_status} ✅" if is_approve else f"{new_status} ❌")
+
+# --- একসাথে অনেক টাস্ক: /approve_tasks, /reject_tasks আর টাস্ক লিস্টের পেজ বাটন ---
+@router.command("approve_tasks", "reject_tasks", admin=True)
+def admin_bulk_tasks(message: types.Message):
+    name, *args = message.text.split()
+    is_approve = name.lstrip("/").split("@", 1)[0] == "approve_tasks"
+    try:
+        sel = task_moderation.parse_selection(args)
+    except ValueError:
+        outbox.send_message(ADMIN_ID, task_moderation.USAGE)
+        return
+    _bulk_task_decision(message.chat.id, sel, is_approve)
+
+def _bulk_task_decision(chat_id, sel, is_approve: bool, edit_message_id=None):
+    with db.begin() as conn:
+        by_user = task_moderation.decide(conn, sel, is_approve)
+    notify_task_decisions(by_user, is_approve)
+    count = sum(len(t) for t in by_user.values())
+    report = (f"{'✅ Approved' if is_approve else '❌ Rejected'}: {count} টা টাস্ক, {len(by_user)} জন ইউজার"
+              if count else "📭 মিলেছে এমন কোনো Pending টাস্ক নেই।")
+    if edit_message_id:
+        outbox.edit_message_text(report, chat_id=chat_id, message_id=edit_message_id)
+    else:
+        outbox.send_message(chat_id, report)
+
+def _page_selection(payload: str):
+    """admin_pages এর বাটন: "<a|r>:<lo>:<hi>:<user|->" — পেজে যা দেখা যাচ্ছিল সেই রেঞ্জ + ফিল্টার"""
+    action, lo, hi, user = payload.split(":")
+    sel = task_moderation.Selection(user=int(user) if user != "-" else None, lo=int(lo), hi=int(hi))
+    return action == "a", sel
+
+@router.callback(admin_pages.BULK_CODE, admin=True)
+def on_task_bulk_prompt(call: types.CallbackQuery, payload: str):
+    # এক ট্যাপে পুরো পেজ বদলে না যায় — আলাদা মেসেজে নিশ্চিত করা
+    is_approve, sel = _page_selection(payload)
+    who = f" | 👤 {sel.user}" if sel.user is not None else ""
+    ikb = types.InlineKeyboardMarkup()
+    ikb.add(types.InlineKeyboardButton("✅ হ্যাঁ, Approve" if is_approve else "❌ হ্যাঁ, Reject",
+                                       callback_data=callback_data("tk", payload)))
+    outbox.send_message(ADMIN_ID, f"⚠️ Task #{sel.lo} – #{sel.hi}{who}: এই পেজের সব Pending টাস্ক "
+                                  f"{'Approve' if is_approve else 'Reject'} করবেন?", reply_markup=ikb.to_json())
+    outbox.answer_callback_query(call.id)
+
+@router.callback("tk", admin=True)
+def on_task_bulk_confirm(call: types.CallbackQuery, payload: str):
+    is_approve, sel = _page_selection(payload)
+    _bulk_task_decision(call.message.chat.id, sel, is_approve, edit_message_id=call.message.message_id)
+    outbox.answer_callback_query(call.id)
+
+@router.callback("ta", legacy="tapprove", admin=True)
+def on_task_approve(call: types.CallbackQuery, payload: str):
+    _task_decision(call, payload, is_approve=True)
+
+@router.callback("tr", legacy="treject", admin=True)
+def on_task_reject(call: types.CallbackQuery, payload: str):
+    _task_decision(call, payload, is_approve=False)
+
+# ==============================
+# TELEGRAM ENTRY POINTS (সব কিছু router দিয়ে)
+# ==============================
+router.observe = _observe_handler
+router.on_denied_callback = lambda call: outbox.answer_callback_query(call.id, "অনুমতি নেই")
+
+# _make_bot() এগুলো রেজিস্টার করে
+def on_message(message: types.Message):
+    _sync_profiler()
+    with query_profiler.track(), db.unit_of_work():
+        router.dispatch_message(message)
+
+def on_callback(call: types.CallbackQuery):
+    _sync_profiler()
+    with query_profiler.track(), db.unit_of_work():
+        router.dispatch_callback(call)
+
+# ==============================
+# UPDATE DEDUP
+# ==============================
+# Telegram উত্তর দেরিতে পেলে একই update আবার পাঠায় — হ্যান্ডলার চলার আগেই বাদ (idempotency.py)
+update_dedup = UpdateDedup(
+    maxsize=int(os.getenv("UPDATE_DEDUP_LRU", "10000")),
+    ttl=int(os.getenv("UPDATE_DEDUP_TTL", "86400")),
+)
+
+def _update_type(update) -> str:
+    for kind in ("message", "edited_message", "callback_query"):
+        if getattr(update, kind) is not None:
+            return kind
+    return "other"
+
+def process_update(update):
+    kind = _update_type(update)
+    if update_dedup.recently_seen(update.update_id):
+        updates_total.inc(kind, "duplicate")
         return
+    started, outcome = time.perf_counter(), "failed"
+    try:
+        # queue মোডে bot non-threaded: on_message/on_callback এর unit of work এটার সাথেই মিশে যায়,
+        # তাই claim আর হ্যান্ডলারের লেখা একসাথে commit/rollback। threaded মোডে claim আগে commit হয়।
+        with db.unit_of_work():
+            with db.begin() as conn:
+                if not update_dedup.claim(conn, update.update_id):
+                    outcome = "duplicate"
+                    return
+            db.after_commit(update_dedup.remember, update.update_id)
+            bot.process_new_updates([update])
+        outcome = "processed"
+    finally:
+        updates_total.inc(kind, outcome)
+        if outcome != "duplicate":
+            update_seconds.observe(time.perf_counter() - started, kind)
 
 # ==============================
 # RUN (Flask + Webhook)
 # ==============================
-app = Flask(__name__)
+update_queue = UpdateQueue(process_update,
+                           workers=INGEST_WORKERS, maxsize=INGEST_QUEUE_SIZE, overflow=INGEST_OVERFLOW,
+                           retries=int(os.getenv("INGEST_RETRIES", "1")))
+update_queue.on_failure = lambda update, exc: updates_dropped.inc(_update_type(update))
+
+# ---- long polling (`python bot.py polling`): getUpdates ব্যাচে, offset DB তে (polling.py)
+# ব্যাচ queue এর worker গুলোতে ভাগ হয় (চ্যাট প্রতি ক্রম ঠিক), poller queue খালি হওয়া পর্যন্ত অপেক্ষা করে
+# তারপর offset সেভ — crash হলে অর্ধেক হওয়া ব্যাচ আবার আসে, প্রসেস হওয়াগুলো processed_updates বাদ দেয়
+def _poll_handle(update):
+    # polling এ 503 ফেরত দেওয়ার কেউ নেই — queue তে জায়গা হওয়া পর্যন্ত অপেক্ষা (পরের getUpdates ও থামে)
+    while not update_queue.submit(update):
+        time.sleep(0.5)
+
+poller = LongPoller(
+    bot, engine, _poll_handle, key=TOKEN.split(":", 1)[0], drain=update_queue.join, api_call=api_call,
+    batch_size=int(os.getenv("POLL_BATCH", "100")),
+    timeout=int(os.getenv("POLL_TIMEOUT", "30")),
+)
 
-@app.route('/' + TOKEN, methods=['POST'])
 def getMessage():
+    ledger_materializer.ensure_started()
+    broadcast_task.ensure_started()
+    task_ingest_task.ensure_started()
+    referral_task.ensure_started()
     json_str = request.get_data().decode('UTF-8')
     update = telebot.types.Update.de_json(json_str)
-    bot.process_new_updates([update])
+    if INGEST_MODE == "queue":
+        if update_dedup.recently_seen(update.update_id):
+            updates_total.inc(_update_type(update), "duplicate")
+            return "!", 200
+        if not update_queue.submit(update) and update_queue.overflow == "503":
+            # Telegram 503 পেলে একটু পরে আবার পাঠাবে
+            return "busy", 503
+        return "!", 200
+    process_update(update)
     return "!", 200
 
-@app.route('/')
+def health():
+    body = {
+        "ingest_mode": INGEST_MODE,
+        "outbox": outbox.stats(),
+        "cache": {"settings": settings_cache.stats(), "users": user_cache.stats()},
+        "ledger": ledger_materializer.stats(),
+        "broadcast": {**broadcast_task.stats(), **broadcaster.stats()},
+        "task_ingest": {**task_ingest_task.stats(), **task_ingestor.stats()},
+        "referrals": {**referral_task.stats(), "cache": leaderboard_cache.stats()},
+        "update_dedup": update_dedup.stats(),
+        "run_mode": RUN_MODE,
+        "db": db.stats(),
+        "sql_profile": {k: v for k, v in query_profiler.report().items() if not isinstance(v, list)},
+        "startup": startup_report(),
+    }
+    if _queued():
+        body["queue"] = update_queue.stats()
+    if RUN_MODE == "polling":
+        body["polling"] = poller.stats()
+    return jsonify(body)
+
+def metrics_endpoint():
+    return metrics.render(), 200, {"Content-Type": Registry.CONTENT_TYPE}
+
 def webhook():
     # তোমার Render host বসাও
     public_base = os.getenv("PUBLIC_BASE_URL", "https://YOUR-RENDER-HOST.onrender.com")
     # পুরনো webhook থাকলে সরাও এবং নতুন সেট করো
-    bot.remove_webhook()
-    bot.set_webhook(url=f"{public_base}/{TOKEN}")
+    with api_call("remove_webhook"):
+        bot.remove_webhook()
+    with api_call("set_webhook"):
+        bot.set_webhook(url=f"{public_base}/{TOKEN}")
+    bot_identity.warm()
     return "Webhook set!", 200
 
-if __name__ == "__main__":
-    print("🤖 Bot is running...")
-    # লোকাল টেস্টের সময় এটা চলবে; Render এ gunicorn দিয়ে চালানো উত্তম
+# ==============================
+# APP FACTORY
+# ==============================
+# import এ কোনো network/DB কাজ হয় না; create_app() ও শুধু Flask বানায় (AUTO_MIGRATE ছাড়া)।
+# তাই gunicorn --preload নিরাপদ: engine/bot প্রতি worker এ প্রথম ব্যবহারে তৈরি হয়
+# (স্কিমা ভার্সনের চেকও তখন — _make_engine)।
+#   gunicorn 'bot:create_app()'   অথবা আগের মতো   gunicorn bot:app
+STARTUP_PHASES = {"import": time.perf_counter() - _IMPORT_STARTED}
+
+def _phase(name, started):
+    STARTUP_PHASES[name] = time.perf_counter() - started
+
+# python bot.py এ argv থেকে; gunicorn এ সবসময় webhook
+RUN_MODE = "webhook"
+
+def create_app():
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.add_url_rule('/health', 'health', health)
+    app.add_url_rule('/metrics', 'metrics', metrics_endpoint)
+    if RUN_MODE == "webhook":
+        # polling মোডে '/' হিট হলে webhook সেট হয়ে getUpdates বন্ধ হয়ে যেত
+        app.add_url_rule('/' + TOKEN, 'getMessage', getMessage, methods=['POST'])
+        app.add_url_rule('/', 'webhook', webhook)
+    _phase("flask", started)
+
+    if AUTO_MIGRATE:
+        started = time.perf_counter()
+        migrations.upgrade(engine)
+        _phase("migrate", started)
+
+    print("🚀 startup " + ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in STARTUP_PHASES.items()))
+    return app
+
+def startup_report() -> dict:
+    """প্রতিটা ধাপ কত ms; engine/bot এই process এ প্রথম ব্যবহারে কত নিল (এখনো না হলে None)"""
+    report = {k: round(v * 1000, 2) for k, v in STARTUP_PHASES.items()}
+    for lazy in (engine, bot):
+        report[f"lazy_{lazy.label}"] = round(lazy.init_seconds * 1000, 2) if lazy.initialized else None
+    return report
+
+_app = None
+
+def __getattr__(name):
+    # `bot:app` — প্রথমবার চাইলে তবেই বানানো হয়
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(name)
+
+def main(argv):
+    """
+    python bot.py            # webhook (Flask) — লোকাল টেস্টের সময় এটা চলবে; Render এ gunicorn দিয়ে চালানো উত্তম
+    python bot.py polling    # long polling (polling.py); Flask শুধু /health এর জন্য
+    """
+    global RUN_MODE
+    mode = argv[1] if len(argv) > 1 else os.getenv("RUN_MODE", "webhook")
+    if mode not in ("webhook", "polling"):
+        raise SystemExit("usage: python bot.py [webhook|polling]")
+    RUN_MODE = mode
+    app = create_app()
+    bot_identity.warm()
+    ledger_materializer.ensure_started()
+    broadcast_task.ensure_started()
+    task_ingest_task.ensure_started()
+    referral_task.ensure_started()
+    if mode == "polling":
+        threading.Thread(target=poller.run, name="long-poller", daemon=True).start()
+    print(f"🤖 Bot is running ({mode})...")
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
 
-
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,196 @@
+"""
+এডমিন ব্রডকাস্ট — সব ইউজারকে একটা মেসেজ, রিস্টার্ট হলে যেখানে থেমেছিল সেখান থেকে আবার।
+  broadcast_jobs      প্রতিটা ব্রডকাস্ট একটা রো; last_user_id পর্যন্ত পাঠানো শেষ (checkpoint)
+  users.blocked_at    বট ব্লক করা (403) ইউজার — পরের ব্রডকাস্টগুলো এদের বাদ দেয়
+প্রাপকরা user_id ক্রমে fetch_size করে ব্যাচে আসে (keyset: user_id > শেষজন), প্রতি ব্যাচ আলাদা ছোট transaction —
+পুরো লিস্ট কখনো মেমোরিতে থাকে না, আর ঘণ্টাব্যাপী ব্রডকাস্টেও কোনো snapshot/connection খোলা থাকে না।
+একাধিক worker চললেও একটা জব একবারে একজনই চালায় (lease; মেয়াদ শেষ হলে অন্য কেউ ধরে নেয়)।
+checkpoint এর মাঝে crash হলে শেষ checkpoint এর পরের কয়েকজন মেসেজটা দুইবার পেতে পারে।
+"""
+import logging
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy import text
+from telebot.apihelper import ApiTelegramException
+
+log = logging.getLogger(__name__)
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_CANCELLED = "cancelled"
+
+
+def create_job(conn, message: str, created_by: int) -> int:
+    return conn.execute(text("""
+        INSERT INTO broadcast_jobs (message, created_by) VALUES (:m, :by) RETURNING id
+    """), {"m": message, "by": created_by}).scalar()
+
+
+def cancel_job(conn, job_id: int) -> bool:
+    """চলমান জব থামায় — চালানো worker পরের checkpoint এ দেখে বেরিয়ে যায়"""
+    row = conn.execute(text("""
+        UPDATE broadcast_jobs SET status = :c, finished_at = CURRENT_TIMESTAMP
+        WHERE id = :id AND status = :r
+        RETURNING id
+    """), {"id": job_id, "c": STATUS_CANCELLED, "r": STATUS_RUNNING}).fetchone()
+    return row is not None
+
+
+def recent_jobs(conn, limit=5):
+    """(id, status, sent, blocked, failed, last_user_id) — নতুনগুলো আগে"""
+    return conn.execute(text("""
+        SELECT id, status, sent, blocked, failed, last_user_id
+        FROM broadcast_jobs ORDER BY id DESC LIMIT :n
+    """), {"n": limit}).fetchall()
+
+
+def unblock(conn, uid: int):
+    """ব্লক করা ইউজার আবার /start দিলে"""
+    conn.execute(text("UPDATE users SET blocked_at = NULL WHERE user_id = :uid AND blocked_at IS NOT NULL"),
+                 {"uid": uid})
+
+
+class BroadcastRunner:
+    """
+    run_pending(): lease নেওয়া যায় এমন সব running জব একটা একটা করে শেষ করে (PeriodicTask এর fn)।
+    rate: প্রতি সেকেন্ডে কতজন — outbox এর global limit এর নিচে রাখো, যাতে সাধারণ রিপ্লাই আটকে না যায়।
+    checkpoint_every: এতজনের ফলাফল এলে DB তে progress লেখা; outbox এ এর বেশি মেসেজ একসাথে থাকে না।
+    on_done(job_id, created_by, sent, blocked, failed): জব শেষ হলে (যেমন এডমিনকে রিপোর্ট)।
+    """
+
+    def __init__(self, engine, outbox, rate=15.0, checkpoint_every=200, fetch_size=1000,
+                 lease_seconds=120, on_done=None):
+        self.engine = engine
+        self.outbox = outbox
+        self.rate = float(rate)
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self.fetch_size = fetch_size
+        self.lease_seconds = lease_seconds
+        self.on_done = on_done
+        self._lock = threading.Lock()
+        self._counts = {"jobs": 0, "sent": 0, "blocked": 0, "failed": 0}
+        self.current_job = None
+
+    def _owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def run_pending(self) -> int:
+        owner = self._owner()
+        done = 0
+        while True:
+            with self.engine.begin() as conn:
+                job = conn.execute(text("""
+                    UPDATE broadcast_jobs
+                    SET lease_owner = :o, lease_until = CURRENT_TIMESTAMP + :s * interval '1 second'
+                    WHERE id = (
+                        SELECT id FROM broadcast_jobs
+                        WHERE status = :r AND (lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP)
+                        ORDER BY id LIMIT 1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, message, last_user_id, created_by
+                """), {"o": owner, "s": self.lease_seconds, "r": STATUS_RUNNING}).fetchone()
+            if job is None:
+                return done
+            self._run(job, owner)
+            done += 1
+
+    def _run(self, job, owner):
+        job_id, message, last_user_id, created_by = job
+        self.current_job = job_id
+        log.info("broadcast %s starting after user %s", job_id, last_user_id)
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_at = time.monotonic()
+        window = []  # (user_id, future) — শেষ checkpoint এর পরে পাঠানো
+        status = STATUS_RUNNING
+        cursor = last_user_id
+        try:
+            while status == STATUS_RUNNING:
+                batch = self._next_batch(cursor)
+                if not batch:
+                    break
+                for uid in batch:
+                    now = time.monotonic()
+                    if next_at > now:
+                        time.sleep(next_at - now)
+                    next_at = max(next_at, now) + interval
+                    window.append((uid, self.outbox.send_message(uid, message)))
+                    if len(window) >= self.checkpoint_every:
+                        status = self._checkpoint(job_id, owner, window)
+                        window = []
+                        if status != STATUS_RUNNING:
+                            break
+                cursor = batch[-1]
+            if window and status == STATUS_RUNNING:
+                status = self._checkpoint(job_id, owner, window)
+            if status == STATUS_RUNNING:
+                self._finish(job_id, owner, created_by)
+            else:
+                log.info("broadcast %s stopped (%s)", job_id, status or "lease lost")
+        finally:
+            self.current_job = None
+
+    def _next_batch(self, after) -> list:
+        """after এর পরের fetch_size জন — PK (user_id) ইনডেক্সে range scan, নিজস্ব ছোট transaction"""
+        with self.engine.connect() as conn:
+            return [r[0] for r in conn.execute(text("""
+                SELECT user_id FROM users
+                WHERE user_id > :last AND blocked_at IS NULL
+                ORDER BY user_id
+                LIMIT :n
+            """), {"last": after, "n": self.fetch_size})]
+
+    def _checkpoint(self, job_id, owner, window):
+        """
+        window এর সব ফলাফলের অপেক্ষা, তারপর একটা transaction এ progress + blocked ইউজার।
+        return জবের বর্তমান status — lease অন্য কারো হয়ে গেলে None
+        """
+        sent, failed, blocked_ids = 0, 0, []
+        for uid, future in window:
+            exc = future.exception()
+            if exc is None:
+                sent += 1
+            elif isinstance(exc, ApiTelegramException) and exc.error_code == 403:
+                blocked_ids.append(uid)
+            else:
+                failed += 1
+        with self.engine.begin() as conn:
+            if blocked_ids:
+                conn.execute(text("UPDATE users SET blocked_at = CURRENT_TIMESTAMP WHERE user_id = ANY(:ids)"),
+                             {"ids": blocked_ids})
+            row = conn.execute(text("""
+                UPDATE broadcast_jobs
+                SET last_user_id = :last, sent = sent + :s, blocked = blocked + :b, failed = failed + :f,
+                    lease_until = CURRENT_TIMESTAMP + :ls * interval '1 second'
+                WHERE id = :id AND lease_owner = :o
+                RETURNING status
+            """), {"id": job_id, "o": owner, "last": window[-1][0], "s": sent, "b": len(blocked_ids),
+                   "f": failed, "ls": self.lease_seconds}).fetchone()
+        with self._lock:
+            self._counts["sent"] += sent
+            self._counts["blocked"] += len(blocked_ids)
+            self._counts["failed"] += failed
+        return row[0] if row else None
+
+    def _finish(self, job_id, owner, created_by):
+        with self.engine.begin() as conn:
+            row = conn.execute(text("""
+                UPDATE broadcast_jobs
+                SET status = :d, finished_at = CURRENT_TIMESTAMP, lease_owner = NULL, lease_until = NULL
+                WHERE id = :id AND lease_owner = :o AND status = :r
+                RETURNING sent, blocked, failed
+            """), {"id": job_id, "o": owner, "d": STATUS_DONE, "r": STATUS_RUNNING}).fetchone()
+        if row is None:
+            return
+        with self._lock:
+            self._counts["jobs"] += 1
+        log.info("broadcast %s done: sent=%s blocked=%s failed=%s", job_id, *row)
+        if self.on_done:
+            self.on_done(job_id, created_by, *row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "current_job": self.current_job, "rate": self.rate}
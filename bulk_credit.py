@@ -0,0 +1,136 @@
+"""
+এডমিনের bulk credit: (user_id, amount) এর CSV/XLSX ফাইল থেকে একবারে সবাইকে ব্যালেন্স।
+সব ক্রেডিট আর রেফারারদের 3% একটাই set-based স্টেটমেন্টে লেজারে যায় (ইউজার প্রতি round trip নেই)।
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+
+import ledger
+from balance_ops import REF_BONUS_RATE
+
+MAX_ROWS = 20000
+# কলামের সীমা: users.user_id BIGINT, balance_ledger.delta INTEGER
+MAX_USER_ID = 2 ** 63 - 1
+MAX_AMOUNT = 2 ** 31 - 1
+
+
+def _int_cell(cell) -> int:
+    """
+    সেল → পূর্ণসংখ্যা (XLSX এর 100.0 চলে, 10.7 না — টাকা কখনো চুপচাপ কাটা হয় না)।
+    সংখ্যা না হলে InvalidOperation, ভগ্নাংশ হলে ValueError।
+    """
+    value = Decimal(str(cell).strip())
+    if not value.is_finite():
+        raise InvalidOperation(cell)
+    if value != value.to_integral_value():
+        raise ValueError(cell)
+    return int(value)
+
+
+def _rows_from_csv(data: bytes):
+    # Excel থেকে সেভ করা CSV তে BOM থাকে; ; বা , যেকোনোটা দিয়ে আলাদা হতে পারে
+    body = data.decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(body[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return list(csv.reader(io.StringIO(body), dialect))
+
+
+def _rows_from_xlsx(data: bytes):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RuntimeError("❌ XLSX পড়তে `pip install openpyxl` লাগবে")
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        return [list(r) for r in wb.worksheets[0].iter_rows(values_only=True)]
+    finally:
+        wb.close()
+
+
+def read_rows(file_name: str, data: bytes):
+    """.xlsx হলে প্রথম শিট, নাহলে CSV — প্রতিটা রো সেলের list (payouts.py ও ব্যবহার করে)"""
+    name = (file_name or "").lower()
+    return _rows_from_xlsx(data) if name.endswith(".xlsx") else _rows_from_csv(data)
+
+
+def parse_credit_file(file_name: str, data: bytes):
+    """
+    প্রথম দুই কলাম = user_id, amount। হেডার রো (সংখ্যা নয়) আর খালি রো বাদ।
+    একই ইউজার একাধিকবার থাকলে যোগ হয়।
+    return (credits: {user_id: amount}, errors: ["line N: ..."])
+    """
+    rows = read_rows(file_name, data)
+    credits, errors = {}, []
+    for line_no, row in enumerate(rows, start=1):
+        cells = list(row[:2]) if row else []
+        if not cells or all(c is None or str(c).strip() == "" for c in cells):
+            continue
+        if len(cells) < 2:
+            errors.append(f"line {line_no}: দুইটা কলাম লাগবে")
+            continue
+        try:
+            uid = _int_cell(cells[0])
+            amount = _int_cell(cells[1])
+        except InvalidOperation:
+            if line_no == 1:
+                continue  # হেডার
+            errors.append(f"line {line_no}: সংখ্যা নয় ({cells[0]}, {cells[1]})")
+            continue
+        except ValueError:
+            errors.append(f"line {line_no}: পূর্ণসংখ্যা নয় ({cells[0]}, {cells[1]})")
+            continue
+        if not 0 < uid <= MAX_USER_ID:
+            errors.append(f"line {line_no}: user_id সঠিক নয় ({uid})")
+            continue
+        if amount <= 0:
+            errors.append(f"line {line_no}: amount পজিটিভ হতে হবে ({amount})")
+            continue
+        if credits.get(uid, 0) + amount > MAX_AMOUNT:
+            errors.append(f"line {line_no}: amount অনেক বড় ({cells[1]}; ইউজার প্রতি সর্বোচ্চ {MAX_AMOUNT})")
+            continue
+        credits[uid] = credits.get(uid, 0) + amount
+        if len(credits) > MAX_ROWS:
+            raise ValueError(f"❌ সর্বোচ্চ {MAX_ROWS} জন ইউজার একবারে")
+    return credits, errors
+
+
+def apply_bulk_credit(conn, credits: dict):
+    """
+    একটা স্টেটমেন্ট: ইনপুট unnest করে users এর সাথে join, ক্রেডিট এন্ট্রি + রেফারার বোনাস এন্ট্রি।
+    users এ নেই এমন ID বাদ পড়ে।
+    return (credited: [(user_id, amount)], bonuses: [(referrer_id, bonus, from_user_id)], missing: [user_id])
+    """
+    if not credits:
+        return [], [], []
+    uids = list(credits)
+    rows = conn.execute(text("""
+        WITH input AS (
+            SELECT * FROM unnest(CAST(:uids AS BIGINT[]), CAST(:amounts AS INTEGER[])) AS i(user_id, amount)
+        ), t AS (
+            SELECT i.user_id, i.amount, u.refer_by
+            FROM input i JOIN users u ON u.user_id = i.user_id
+        ), credit AS (
+            INSERT INTO balance_ledger (user_id, delta, kind)
+            SELECT user_id, amount, :k FROM t
+        ), bonus AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT refer_by, FLOOR(amount * :rate)::int, :rk, user_id FROM t
+            WHERE refer_by IS NOT NULL AND FLOOR(amount * :rate) > 0
+            RETURNING user_id, delta, ref_id
+        )
+        SELECT 'c', user_id, amount, NULL FROM t
+        UNION ALL
+        SELECT 'b', user_id, delta, ref_id FROM bonus
+    """), {"uids": uids, "amounts": [credits[u] for u in uids], "rate": REF_BONUS_RATE,
+           "k": ledger.KIND_BULK_CREDIT, "rk": ledger.KIND_REF_BONUS}).fetchall()
+
+    credited = [(r[1], r[2]) for r in rows if r[0] == "c"]
+    bonuses = [(r[1], r[2], r[3]) for r in rows if r[0] == "b"]
+    found = {u for u, _ in credited}
+    missing = [u for u in uids if u not in found]
+    return credited, bonuses, missing
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+log = logging.getLogger(__name__)
+
+
+def make_engine(url, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, pre_ping=True):
+    """
+    pre_ping=True: প্রতি checkout এ একটা ছোট ping — unit of work এ প্রতি আপডেটে একবার।
+    বন্ধ করলে pool_recycle এর চেয়ে পুরনো connection ফেলে দেওয়াই একমাত্র সুরক্ষা।
+    """
+    kwargs = {"pool_pre_ping": pre_ping}
+    if not url.startswith("sqlite"):
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow,
+                      pool_timeout=pool_timeout, pool_recycle=pool_recycle)
+    return create_engine(url, **kwargs)
+
+
+class Database:
+    """
+    আপডেট প্রতি একটা unit of work: প্রথম কুয়েরিতে একটা connection নেয়, হ্যান্ডলারের সব
+    db.begin() সেই একই transaction এ চলে, শেষে একবার commit (exception হলে rollback)।
+    db.begin() ব্লক থেকে exception বের হলে পুরো unit rollback — হ্যান্ডলার সেটা গিলে ফেললেও
+    (except: pass) commit এর বদলে rollback, after_commit বাদ। যে জায়গা DB এরর ধরে এগিয়ে যায়
+    (যেমন /start এর রেফার attach) সেখানে db.savepoint(): শুধু সেই ব্লক rollback, বাকিটা commit।
+    after_commit() দিয়ে রাখা কাজ (ক্যাশ invalidate, মেসেজ পাঠানো) commit এর পরেই চলে —
+    rollback হলে বাদ পড়ে, তাই ইউজার কখনো এমন কিছুর খবর পায় না যা সেভ হয়নি।
+    unit of work এর বাইরে db.begin() আগের মতোই নিজস্ব transaction।
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counts = {"units": 0, "commits": 0, "rollbacks": 0, "checkouts": 0, "checkout_timeouts": 0,
+                        "savepoint_rollbacks": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---- unit of work
+    @contextmanager
+    def unit_of_work(self):
+        if getattr(self._local, "active", False):
+            yield  # ভেতরের unit of work বাইরেরটার সাথেই মিশে যায়
+            return
+        self._local.active = True
+        self._local.conn = None
+        self._local.tx = None
+        self._local.after = []
+        self._local.failed = False
+        with self._lock:
+            self._counts["units"] += 1
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            conn, tx, after = self._local.conn, self._local.tx, self._local.after
+            if ok and self._local.failed:
+                log.warning("unit of work rolled back: a db.begin() block failed and the handler went on")
+                ok = False
+            self._local.active = False
+            self._local.conn = self._local.tx = self._local.after = None
+            try:
+                if conn is not None:
+                    try:
+                        if ok:
+                            tx.commit()
+                        else:
+                            tx.rollback()
+                    except Exception:
+                        ok = False
+                        raise
+                    finally:
+                        conn.close()
+                        with self._lock:
+                            self._counts["commits" if ok else "rollbacks"] += 1
+            finally:
+                self._finish(after, ok)
+
+    def _finish(self, after, ok):
+        for fn, args, on_discard in after:
+            try:
+                if ok:
+                    fn(*args)
+                elif on_discard is not None:
+                    on_discard()
+            except Exception:
+                log.exception("after_commit callback failed")
+
+    @contextmanager
+    def begin(self):
+        if not getattr(self._local, "active", False):
+            with self.engine.begin() as conn:
+                yield conn
+            return
+        try:
+            yield self._conn()
+        except BaseException:
+            self._local.failed = True  # Postgres এ transaction এখন aborted
+            raise
+
+    @contextmanager
+    def savepoint(self):
+        """
+        db.begin() এর মতো, কিন্তু unit of work এর ভেতরে SAVEPOINT — exception হলে শুধু এই ব্লক
+        (আর এর ভেতরে রাখা after_commit) বাদ, caller এরর ধরে এগোতে পারে। প্রতি ব্যবহারে দুটো বাড়তি round trip।
+        """
+        if not getattr(self._local, "active", False):
+            with self.engine.begin() as conn:
+                yield conn
+            return
+        conn = self._conn()
+        failed, after_len = self._local.failed, len(self._local.after)
+        savepoint = conn.begin_nested()
+        try:
+            yield conn
+        except BaseException:
+            savepoint.rollback()
+            self._local.failed = failed
+            discarded = self._local.after[after_len:]
+            del self._local.after[after_len:]
+            self._finish(discarded, False)
+            with self._lock:
+                self._counts["savepoint_rollbacks"] += 1
+            raise
+        else:
+            savepoint.commit()
+
+    def _conn(self):
+        if self._local.conn is None:
+            self._local.conn = self._checkout()
+            self._local.tx = self._local.conn.begin()
+        return self._local.conn
+
+    def after_commit(self, fn, *args, on_discard=None):
+        """unit of work চললে commit এর পরে, না চললে এখনই"""
+        if getattr(self._local, "active", False):
+            self._local.after.append((fn, args, on_discard))
+        else:
+            fn(*args)
+
+    # ---- pool metrics
+    def _checkout(self):
+        started = time.perf_counter()
+        try:
+            return self.engine.connect()
+        except PoolTimeout:
+            with self._lock:
+                self._counts["checkout_timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._counts["checkouts"] += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+    def stats(self) -> dict:
+        pool = self.engine.pool
+        with self._lock:
+            body = dict(self._counts)
+            n = body["checkouts"]
+            body["checkout_wait_avg_ms"] = round(self._wait_total / n * 1000, 3) if n else 0.0
+            body["checkout_wait_max_ms"] = round(self._wait_max * 1000, 3)
+        body["pool"] = {"status": pool.status()}
+        for gauge in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, gauge, None)
+            if callable(fn):
+                body["pool"][gauge] = fn()
+        return body
@@ -0,0 +1,138 @@
+"""
+আগের টাস্কে জমা দেওয়া Gmail আবার জমা পড়লে ধরা।
+  gmail_addresses(addr_hash UNIQUE)  প্রতিটা ঠিকানা একবার — প্রথম যে টাস্কে এসেছিল তার id সহ।
+  ঠিকানা নিজে রাখা হয় না, শুধু normalize করা ঠিকানার 64-bit hash।
+সামনে process-local Bloom filter: "নিশ্চিত নতুন" ঠিকানার জন্য DB lookup লাগে না, শুধু সম্ভাব্য
+duplicate গুলো খোঁজা হয়। চূড়ান্ত সিদ্ধান্ত INSERT ... ON CONFLICT এর — তাই filter পিছিয়ে থাকলেও
+গণনা ভুল হয় না, বড়জোর কোন টাস্কের সাথে মিলেছে সেটা অজানা থাকে।
+"""
+import hashlib
+import logging
+import math
+import threading
+
+from sqlalchemy import text
+
+log = logging.getLogger(__name__)
+
+
+def normalize(email: str) -> str:
+    """Gmail এ local অংশের . আর +tag বাদ, googlemail.com = gmail.com — সব একই ইনবক্স"""
+    local, _, domain = email.strip().lower().partition("@")
+    local = local.split("+", 1)[0].replace(".", "")
+    if domain == "googlemail.com":
+        domain = "gmail.com"
+    return f"{local}@{domain}"
+
+
+def addr_hash(email: str) -> int:
+    """BIGINT কলামে বসে এমন signed 64-bit"""
+    return int.from_bytes(hashlib.sha256(normalize(email).encode()).digest()[:8], "big", signed=True)
+
+
+class BloomFilter:
+    """
+    bytearray এর উপর সাধারণ Bloom filter; key আগেই 64-bit hash, তাই k টা index double hashing এ।
+    false positive হতে পারে (error_rate), false negative কখনো না।
+    """
+
+    def __init__(self, capacity: int, error_rate=0.01):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.bits = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / self.capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _indexes(self, h: int):
+        h &= 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, h: int):
+        for i in self._indexes(h):
+            self._array[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def __contains__(self, h: int) -> bool:
+        return all(self._array[i >> 3] & (1 << (i & 7)) for i in self._indexes(h))
+
+
+class GmailIndex:
+    """
+    record(conn, task_id, user_id, hashes) -> {hash: আগের task_id বা None}
+    filter প্রথম ব্যবহারে টেবিল থেকে ভরে, তারপর প্রতিবার শুধু নতুন id গুলো (অন্য worker এর লেখা) টেনে নেয়।
+    ভরাট capacity ছাড়ালে দ্বিগুণ আকারে আবার বানায়।
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.01, fetch_size=10000):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.fetch_size = fetch_size
+        self._bloom = None
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._counts = {"checked": 0, "bloom_hits": 0, "duplicates": 0}
+
+    def _sync(self, conn):
+        if self._bloom is None or self._bloom.count > self._bloom.capacity:
+            capacity = self.capacity
+            if self._bloom is not None:
+                capacity = self._bloom.capacity * 2
+                log.info("gmail bloom filter full (%d), rebuilding with capacity %d", self._bloom.count, capacity)
+            self._bloom, self._last_id = BloomFilter(capacity, self.error_rate), 0
+        # শুধু এই স্টেটমেন্টে server-side cursor — conn.execution_options() পুরো connection বদলে দিত,
+        # তখন একই transaction এর পরের INSERT ... RETURNING ও named cursor এ চলে (Postgres নেয় না)
+        rows = conn.execute(text("""
+            SELECT id, addr_hash FROM gmail_addresses WHERE id > :last ORDER BY id
+        """), {"last": self._last_id}, execution_options={"yield_per": self.fetch_size})
+        for row_id, h in rows:
+            self._bloom.add(h)
+            self._last_id = row_id
+
+    def record(self, conn, task_id: int, user_id: int, hashes) -> dict:
+        hashes = list(set(hashes))
+        if not hashes:
+            return {}
+        with self._lock:
+            self._sync(conn)
+            candidates = [h for h in hashes if h in self._bloom]
+        owners = {}
+        if candidates:
+            owners = dict(conn.execute(text("""
+                SELECT addr_hash, task_id FROM gmail_addresses WHERE addr_hash = ANY(:h)
+            """), {"h": candidates}).fetchall())
+        fresh = [h for h in hashes if h not in owners]
+        inserted = set()
+        if fresh:
+            inserted = set(conn.execute(text("""
+                INSERT INTO gmail_addresses (addr_hash, task_id, user_id)
+                SELECT h, :t, :u FROM unnest(CAST(:h AS BIGINT[])) AS h
+                ON CONFLICT (addr_hash) DO NOTHING
+                RETURNING addr_hash
+            """), {"h": fresh, "t": task_id, "u": user_id}).scalars())
+        # filter এ আগে যোগ হলেও ক্ষতি নেই — rollback হলে শুধু একটা false positive
+        with self._lock:
+            for h in inserted:
+                self._bloom.add(h)
+        # filter এ ছিল না কিন্তু এর মধ্যে অন্য কেউ লিখেছে: duplicate, কার সাথে জানা নেই
+        for h in fresh:
+            if h not in inserted:
+                owners[h] = None
+        # একই টাস্ক আবার পার্স হলে (stale claim) নিজের ঠিকানা duplicate না
+        dups = {h: t for h, t in owners.items() if t != task_id}
+        with self._lock:
+            self._counts["checked"] += len(hashes)
+            self._counts["bloom_hits"] += len(candidates)
+            self._counts["duplicates"] += len(dups)
+        return dups
+
+    def stats(self) -> dict:
+        with self._lock:
+            bloom = self._bloom
+            return {
+                **self._counts,
+                "bloom_size": bloom.count if bloom else 0,
+                "bloom_capacity": bloom.capacity if bloom else self.capacity,
+                "bloom_kb": len(bloom._array) // 1024 if bloom else 0,
+            }
@@ -0,0 +1,65 @@
+"""
+Telegram একই update আবার পাঠালে (webhook ধীর হলে) দ্বিতীয়বার হ্যান্ডলার চালানো হয় না।
+  - process-local LRU: সম্প্রতি দেখা update_id — DB ছাড়াই বাদ
+  - processed_updates টেবিল (expires_at সহ): সব worker মিলে একবারই (INSERT ... ON CONFLICT DO NOTHING)
+claim() আপডেটের unit of work এর ভেতরে ডাকলে হ্যান্ডলারের লেখার সাথেই commit হয় — হ্যান্ডলার
+ব্যর্থ হলে claim ও rollback, তাই পরের redelivery আবার চেষ্টা পায়। একই আপডেট দুই worker এ
+একসাথে এলে দ্বিতীয়টা প্রথমটার commit পর্যন্ত অপেক্ষা করে, তারপর বাদ পড়ে।
+ttl: Telegram ২৪ ঘণ্টা পর্যন্ত আপডেট রাখে, তার বেশি মনে রাখার দরকার নেই।
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+
+class UpdateDedup:
+    """recently_seen(): শুধু LRU (DB ছাড়া);  claim(conn, update_id): LRU তে না থাকলে টেবিলে"""
+
+    def __init__(self, maxsize=10000, ttl=86400, purge_interval=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._recent = OrderedDict()  # update_id -> None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._counts = {"claimed": 0, "dropped_lru": 0, "dropped_db": 0}
+
+    def recently_seen(self, update_id) -> bool:
+        with self._lock:
+            if update_id in self._recent:
+                self._recent.move_to_end(update_id)
+                self._counts["dropped_lru"] += 1
+                return True
+        return False
+
+    def remember(self, update_id):
+        with self._lock:
+            self._recent[update_id] = None
+            self._recent.move_to_end(update_id)
+            while len(self._recent) > self.maxsize:
+                self._recent.popitem(last=False)
+
+    def claim(self, conn, update_id) -> bool:
+        """True = প্রথমবার, প্রসেস করো; False = আগেই হয়েছে (বা অন্য worker এ চলছে)"""
+        row = conn.execute(text("""
+            INSERT INTO processed_updates (update_id, expires_at)
+            VALUES (:id, CURRENT_TIMESTAMP + :ttl * interval '1 second')
+            ON CONFLICT (update_id) DO NOTHING
+            RETURNING update_id
+        """), {"id": update_id, "ttl": self.ttl}).fetchone()
+        now = time.monotonic()
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            conn.execute(text("DELETE FROM processed_updates WHERE expires_at <= CURRENT_TIMESTAMP"))
+        with self._lock:
+            self._counts["claimed" if row else "dropped_db"] += 1
+        if row is None:
+            self.remember(update_id)
+            return False
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, "lru_size": len(self._recent), "lru_maxsize": self.maxsize}
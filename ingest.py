@@ -0,0 +1,145 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+def update_chat_key(update):
+    """যে চ্যাটের আপডেট — একই চ্যাটের আপডেট একই worker এ যাবে (order ঠিক থাকে)"""
+    msg = update.message or update.edited_message
+    if msg is not None:
+        return msg.chat.id
+    cq = update.callback_query
+    if cq is not None:
+        if cq.message is not None:
+            return cq.message.chat.id
+        return cq.from_user.id
+    return update.update_id
+
+
+class UpdateQueue:
+    """
+    Bounded update queue + worker pool.
+    প্রতিটা worker এর নিজস্ব shard আছে; chat_id % workers দিয়ে shard ঠিক হয়,
+    তাই একই ইউজারের withdraw/admin স্টেপ কখনো উল্টাপাল্টা হয় না।
+    """
+
+    FULL_LOG_INTERVAL = 10.0  # ভর্তি queue এর সতর্কবার্তা এর চেয়ে ঘন ঘন না (polling এ submit বারবার চেষ্টা করে)
+
+    def __init__(self, handler, workers=4, maxsize=1000, overflow="503", retries=1, retry_delay=1.0):
+        if overflow not in ("503", "shed"):
+            raise ValueError(f"unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.maxsize = max(self.workers, int(maxsize))
+        self.overflow = overflow
+        # handler exception দিলে আরও retries বার (একই worker এ, তাই চ্যাটের ক্রম ঠিক থাকে)
+        self.retries = max(0, int(retries))
+        self.retry_delay = retry_delay
+        # on_failure(update, exc): সব চেষ্টা ব্যর্থ হয়ে আপডেট বাদ পড়লে (metrics)
+        self.on_failure = None
+        self._shards = []
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._counts = {"accepted": 0, "processed": 0, "retried": 0, "failed": 0, "shed": 0, "rejected": 0}
+        self._full_logged_at = 0.0
+        self._full_suppressed = 0
+
+    # ---- lifecycle (fork-safe: worker thread শুধু যে process এ submit হয় সেখানেই চালু হয়)
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            per_shard = self.maxsize // self.workers
+            self._shards = [queue.Queue(maxsize=per_shard) for _ in range(self.workers)]
+            self._threads = []
+            for i, q in enumerate(self._shards):
+                t = threading.Thread(target=self._run, args=(q,), name=f"update-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            self._pid = os.getpid()
+
+    def _run(self, q):
+        while True:
+            update, enqueued_at = q.get()
+            try:
+                self._handle(update, enqueued_at)
+            finally:
+                q.task_done()
+
+    def _handle(self, update, enqueued_at):
+        for attempt in range(1, self.retries + 2):
+            try:
+                self.handler(update)
+                self._bump("processed")
+                return
+            except Exception as e:
+                if attempt <= self.retries:
+                    self._bump("retried")
+                    log.warning("update %s failed (attempt %d), retrying", update.update_id, attempt, exc_info=True)
+                    time.sleep(self.retry_delay * attempt)
+                    continue
+                self._bump("failed")
+                log.exception("update %s dropped after %d attempts, %.3fs since enqueue",
+                              update.update_id, attempt, time.monotonic() - enqueued_at)
+                if self.on_failure is not None:
+                    try:
+                        self.on_failure(update, e)
+                    except Exception:
+                        log.exception("on_failure hook failed")
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._counts[key] += n
+
+    # ---- API
+    def submit(self, update) -> bool:
+        """False ফেরত দিলে queue ভর্তি — caller overflow policy অনুযায়ী উত্তর দেবে"""
+        self._ensure_started()
+        shard = self._shards[hash(update_chat_key(update)) % self.workers]
+        try:
+            shard.put_nowait((update, time.monotonic()))
+        except queue.Full:
+            self._bump("shed" if self.overflow == "shed" else "rejected")
+            self._log_full(update)
+            return False
+        self._bump("accepted")
+        return True
+
+    def _log_full(self, update):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._full_logged_at < self.FULL_LOG_INTERVAL:
+                self._full_suppressed += 1
+                return
+            suppressed, self._full_suppressed = self._full_suppressed, 0
+            self._full_logged_at = now
+        log.warning("update queue full (depth=%d), %s update %s (%d more since last warning)",
+                    self.depth(), "shedding" if self.overflow == "shed" else "rejecting",
+                    update.update_id, suppressed)
+
+    def join(self):
+        """submit হওয়া সব আপডেট handle হওয়া পর্যন্ত ব্লক (polling এ offset সেভের আগে)"""
+        for q in list(self._shards):
+            q.join()
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._shards)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        counts.update({
+            "depth": self.depth(),
+            "shard_depths": [q.qsize() for q in self._shards],
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "overflow": self.overflow,
+        })
+        return counts
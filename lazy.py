@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+
+class ForkSafeLazy:
+    """
+    প্রথম ব্যবহারে factory() চালিয়ে অবজেক্ট বানায় — প্রতি process এ আলাদা।
+    gunicorn --preload এ master এ বানানো engine/bot worker এ শেয়ার হয় না:
+    fork এর পরে worker প্রথমবার ছুঁলে নতুন করে বানায়, আর পুরনোটা on_fork(old) দিয়ে ছেড়ে দেয়
+    (যেমন engine.dispose(close=False) — parent এর socket বন্ধ না করে)।
+    """
+
+    def __init__(self, name, factory, on_fork=None):
+        self.label = name
+        self._factory = factory
+        self._on_fork = on_fork
+        self._obj = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.init_seconds = None
+        # fork এর সময় অন্য thread লক ধরে রাখলে child এ চিরকাল আটকে যেত
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._pid == os.getpid():
+            return self._obj
+        with self._lock:
+            if self._pid != os.getpid():
+                if self._obj is not None and self._on_fork is not None:
+                    self._on_fork(self._obj)
+                started = time.perf_counter()
+                self._obj = self._factory()
+                self.init_seconds = time.perf_counter() - started
+                self._pid = os.getpid()
+        return self._obj
+
+    @property
+    def initialized(self) -> bool:
+        return self._pid == os.getpid()
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __repr__(self):
+        state = "ready" if self.initialized else "lazy"
+        return f"<ForkSafeLazy {self.label} ({state})>"
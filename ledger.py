@@ -0,0 +1,130 @@
+"""
+ব্যালেন্স লেজার — প্রতিটা পরিবর্তন balance_ledger এ একটা নতুন রো (শুধু INSERT)।
+users.balance / ref_count / ref_earn হলো snapshot; materialize() ব্যাচে ব্যাচে
+applied=FALSE রোগুলো snapshot এ ভাঁজ করে। আসল ব্যালেন্স = snapshot + pending।
+
+জনপ্রিয় রেফারারের রো তে প্রতিটা /start আর 3% বোনাসে UPDATE এর লাইন পড়ে যেত;
+এখন সেগুলো আলাদা রো INSERT, আর রো লক শুধু materializer নেয় — প্রতি ব্যাচে একবার।
+"""
+from sqlalchemy import text
+
+import stats
+
+# kind -> কোন কলামে যোগ হবে: balance সবসময়; ref_earn/ref_count শুধু রেফারেল আয়ে
+KIND_REF_JOIN = "ref_join"          # নতুন রেফার জয়েন: +1৳, ref_count +1
+KIND_REF_BONUS = "ref_bonus"        # রেফার্ড ইউজারের আয়ের 3%
+KIND_ADMIN_ADD = "admin_add"
+KIND_ADMIN_SET = "admin_set"        # সেট = (নতুন - বর্তমান) ডেল্টা
+KIND_ADMIN_REDUCE = "admin_reduce"
+KIND_WITHDRAW = "withdraw"          # ref_id = withdraws.id
+KIND_WITHDRAW_REFUND = "withdraw_refund"
+KIND_BULK_CREDIT = "bulk_credit"    # এডমিনের ফাইল থেকে একসাথে অনেকজনকে
+
+# প্রতি ইউজারের এখনো snapshot এ না ভাঁজ হওয়া অংশ; লিস্ট কুয়েরিতে LEFT JOIN করে ব্যবহার
+PENDING_SQL = """
+    SELECT user_id,
+           SUM(delta) AS delta,
+           COUNT(*) FILTER (WHERE kind = 'ref_join') AS ref_count,
+           COALESCE(SUM(delta) FILTER (WHERE kind IN ('ref_join', 'ref_bonus')), 0) AS ref_earn
+    FROM balance_ledger
+    WHERE NOT applied
+    GROUP BY user_id
+"""
+
+
+def pending_delta_sql(user_col: str) -> str:
+    """এক ইউজারের pending যোগফল — correlated subquery, partial index দিয়ে; পেজের প্রতিটা রো তে সস্তা"""
+    return (f"(SELECT COALESCE(SUM(l.delta), 0) FROM balance_ledger l "
+            f"WHERE l.user_id = {user_col} AND NOT l.applied)")
+
+
+def post(conn, uid: int, delta: int, kind: str, ref_id=None):
+    """শুধু INSERT — কোনো users রো লক হয় না"""
+    conn.execute(text("""
+        INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+        VALUES (:uid, :d, :k, :r)
+    """), {"uid": uid, "d": delta, "k": kind, "r": ref_id})
+
+
+def lock_user(conn, uid: int) -> bool:
+    """
+    ব্যালেন্স চেক করে কাটার আগে users রো লক — materializer তখন এই ইউজারকে ভাঁজ করতে পারে না।
+    লকের পরে আলাদা স্টেটমেন্টে ব্যালেন্স পড়তে হবে (নতুন snapshot), নাহলে materializer এর
+    সদ্য commit হওয়া ব্যাচ দুইবার গোনা হতে পারে।
+    """
+    return conn.execute(text("SELECT 1 FROM users WHERE user_id=:uid FOR UPDATE"),
+                        {"uid": uid}).fetchone() is not None
+
+
+def summary(conn, uid: int):
+    """(balance, ref_count, ref_earn) = snapshot + pending; ইউজার না থাকলে None"""
+    return conn.execute(text(f"""
+        SELECT COALESCE(u.balance,0) + COALESCE(p.delta,0),
+               COALESCE(u.ref_count,0) + COALESCE(p.ref_count,0),
+               COALESCE(u.ref_earn,0) + COALESCE(p.ref_earn,0)
+        FROM users u
+        LEFT JOIN ({PENDING_SQL}) p ON p.user_id = u.user_id
+        WHERE u.user_id = :uid
+    """), {"uid": uid}).fetchone()
+
+
+def balance_of(conn, uid: int) -> int:
+    row = summary(conn, uid)
+    return row[0] if row else 0
+
+
+def materialize(conn, batch_size=5000) -> int:
+    """
+    সবচেয়ে পুরনো batch_size টা pending রো applied করে users এ যোগ করে — একটা স্টেটমেন্ট।
+    SKIP LOCKED: একাধিক worker একসাথে চালালেও একই রো দুইবার ভাঁজ হয় না।
+    users রো user_id ক্রমে আপডেট হয়, তাই দুই materializer এর মধ্যে deadlock হয় না।
+    ইউজারের রো না থাকলে (যেমন রেফারার কখনো /start দেয়নি) বানিয়ে নেয়।
+    """
+    row = conn.execute(text("""
+        WITH batch AS (
+            SELECT id FROM balance_ledger
+            WHERE NOT applied
+            ORDER BY id
+            LIMIT :n
+            FOR UPDATE SKIP LOCKED
+        ), marked AS (
+            UPDATE balance_ledger l SET applied = TRUE
+            FROM batch WHERE l.id = batch.id
+            RETURNING l.user_id, l.delta, l.kind
+        ), agg AS (
+            SELECT user_id,
+                   SUM(delta) AS delta,
+                   COUNT(*) FILTER (WHERE kind = 'ref_join') AS ref_count,
+                   COALESCE(SUM(delta) FILTER (WHERE kind IN ('ref_join', 'ref_bonus')), 0) AS ref_earn
+            FROM marked
+            GROUP BY user_id
+        ), folded AS (
+            INSERT INTO users (user_id, balance, ref_count, ref_earn)
+            SELECT user_id, delta, ref_count, ref_earn FROM agg ORDER BY user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET balance   = COALESCE(users.balance,0)   + EXCLUDED.balance,
+                ref_count = COALESCE(users.ref_count,0) + EXCLUDED.ref_count,
+                ref_earn  = COALESCE(users.ref_earn,0)  + EXCLUDED.ref_earn
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT (SELECT count(*) FROM marked),
+               (SELECT COALESCE(SUM(delta), 0) FROM marked),
+               (SELECT count(*) FROM folded WHERE inserted)
+    """), {"n": batch_size}).fetchone()
+    applied, delta, new_users = row
+    if applied:
+        # users.balance এর একমাত্র লেখক এটা, তাই মোট ব্যালেন্স কাউন্টারও এখানেই
+        stats.bump(conn, {"balance": delta, "users": new_users})
+    return applied
+
+
+def materialize_all(engine, batch_size=5000, max_batches=20) -> int:
+    """ব্যাচ খালি না হওয়া পর্যন্ত (সর্বোচ্চ max_batches) — প্রতিটা ব্যাচ আলাদা transaction"""
+    total = 0
+    for _ in range(max_batches):
+        with engine.begin() as conn:
+            n = materialize(conn, batch_size)
+        total += n
+        if n < batch_size:
+            break
+    return total
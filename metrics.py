@@ -0,0 +1,159 @@
+"""
+Prometheus text format (/metrics) — prometheus_client ছাড়া, শুধু যা লাগে:
+  Counter     শুধু বাড়ে (labels সহ)
+  Histogram   latency বাকেট + _sum/_count (labels সহ)
+  gauge()     স্ক্র্যাপের সময় fn() ডেকে মান — যেমন outbox/queue এর stats() থেকে
+মান process-local: gunicorn এ কয়েকটা worker থাকলে প্রতিটা স্ক্র্যাপ একটা worker এর মান দেখায়।
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# সেকেন্ড — 5ms থেকে 10s (Telegram কল আর DB সহ হ্যান্ডলার দুটোই ধরে)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name}: expected labels {self.label_names}, got {labels}")
+        return tuple(str(v) for v in labels)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, n=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, seconds, *labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += seconds
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(b), s, c)) for k, (b, s, c) in self._values.items())
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', _num(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class _Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn, labels=()):
+        super().__init__(name, help_text, labels)
+        self.fn = fn
+
+    def render(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        lines = self.header()
+        for key, v in sorted(value.items()):
+            if v is not None:
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {_num(v)}")
+        return lines
+
+
+class Registry:
+    """metrics = Registry(); metrics.counter(...) ইত্যাদি; render() = /metrics এর body"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()) -> Counter:
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, fn, labels=()):
+        """fn() -> সংখ্যা, অথবা labels থাকলে {label মান(গুলো): সংখ্যা}"""
+        return self._add(_Gauge(name, help_text, fn, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # একটা gauge এর fn (যেমন DB) ব্যর্থ হলে বাকিগুলো তবু দেখাও
+                log.exception("metric %s failed to render", metric.name)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,372 @@
+"""
+ভার্সন করা স্কিমা মাইগ্রেশন।
+প্রতিটা worker এর import এ CREATE TABLE না চালিয়ে ডিপ্লয়ের সময় একবার:
+
+    python migrations.py            # বাকি সব মাইগ্রেশন চালাও
+    python migrations.py status     # কোনটা হয়েছে, কোনটা বাকি
+
+schema_migrations টেবিলে কোন ভার্সন পর্যন্ত হয়েছে রাখা হয়। একটা মাইগ্রেশন একবার
+রিলিজ হলে আর বদলাবে না — পরিবর্তন লাগলে নতুন ভার্সন যোগ করো।
+"""
+import logging
+import os
+import sys
+from collections import namedtuple
+
+from sqlalchemy import create_engine, inspect, text
+
+log = logging.getLogger(__name__)
+
+# concurrent=True: CREATE INDEX CONCURRENTLY — টেবিল লক না করে বানায়, কিন্তু transaction এর
+# ভেতরে চলে না, তাই প্রতিটা স্টেটমেন্ট autocommit এ চলে। মাঝপথে ব্যর্থ হলে INVALID ইনডেক্স
+# থেকে যেতে পারে; সেটা DROP করে আবার চালাতে হবে।
+Migration = namedtuple("Migration", "version name statements concurrent")
+
+MIGRATIONS = [
+    Migration(1, "baseline", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            refer_by BIGINT,
+            ref_count INTEGER DEFAULT 0,
+            ref_earn INTEGER DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS withdraws (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT,
+            method  TEXT,
+            number  TEXT,
+            amount  INTEGER,
+            status  TEXT DEFAULT 'Pending'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id SERIAL PRIMARY KEY,
+            user_id  BIGINT,
+            username TEXT,
+            file_id  TEXT,
+            status   TEXT DEFAULT 'Pending'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS conversation_state (
+            ns   TEXT,
+            key  TEXT,
+            data TEXT,
+            expires_at TIMESTAMPTZ,
+            PRIMARY KEY (ns, key)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """,
+        # ডিফল্ট task_price (যদি না থাকে)
+        """
+        INSERT INTO settings (key, value)
+        VALUES ('task_price', '7')
+        ON CONFLICT (key) DO NOTHING
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            delta   INTEGER NOT NULL,
+            kind    TEXT NOT NULL,
+            ref_id  BIGINT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            applied BOOLEAN NOT NULL DEFAULT FALSE
+        )
+        """,
+        # pending খোঁজা (ইউজার ধরে আর materializer এর ব্যাচ) — applied রো ইনডেক্সে থাকে না, তাই ছোট থাকে
+        "CREATE INDEX IF NOT EXISTS balance_ledger_pending_user ON balance_ledger (user_id) WHERE NOT applied",
+        "CREATE INDEX IF NOT EXISTS balance_ledger_pending_id ON balance_ledger (id) WHERE NOT applied",
+        # অডিট/বিরোধ মেটানো: এক ইউজারের পুরো ইতিহাস
+        "CREATE INDEX IF NOT EXISTS balance_ledger_user_history ON balance_ledger (user_id, id)",
+    ], concurrent=False),
+
+    Migration(2, "hot_query_indexes", [
+        # task_requests_handler: WHERE status='Pending' ORDER BY id DESC LIMIT 15
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS tasks_pending_id ON tasks (id) WHERE status = 'Pending'",
+        # এক ইউজারের টাস্ক/withdraw ইতিহাস
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS tasks_user_id ON tasks (user_id, id)",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS withdraws_user_id ON withdraws (user_id, id)",
+        # স্ট্যাটাস ধরে withdraw লিস্ট (Pending/Approved/Rejected), নতুনগুলো আগে
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS withdraws_status_id ON withdraws (status, id)",
+        # রেফারাল: কে কাকে রেফার করেছে — বেশিরভাগ ইউজারের refer_by NULL, তাই partial
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS users_refer_by ON users (refer_by) WHERE refer_by IS NOT NULL",
+        # SqlStateStore এর মেয়াদোত্তীর্ণ রো মোছা
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS conversation_state_expires ON conversation_state (expires_at)",
+    ], concurrent=True),
+
+    Migration(3, "stats_counters", [
+        """
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name  TEXT NOT NULL,
+            shard SMALLINT NOT NULL,
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, shard)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stat_daily (
+            day   DATE NOT NULL,
+            name  TEXT NOT NULL,
+            shard SMALLINT NOT NULL,
+            value BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, name, shard)
+        )
+        """,
+        # বিদ্যমান ডেটা থেকে শুরুর মান (shard 0); দিনভিত্তিক ইতিহাস নেই, তাই stat_daily খালি শুরু
+        """
+        INSERT INTO stat_counters (name, shard, value)
+        SELECT 'users', 0, COUNT(*) FROM users
+        UNION ALL
+        SELECT 'balance', 0, COALESCE(SUM(balance), 0) FROM users
+        ON CONFLICT (name, shard) DO NOTHING
+        """,
+        """
+        INSERT INTO stat_counters (name, shard, value)
+        SELECT k || ':' || COALESCE(status, 'Pending') || ':' ||
+               CASE method WHEN '📲 Bkash' THEN 'bkash' WHEN '📲 Nagad' THEN 'nagad' ELSE 'other' END,
+               0, SUM(v)
+        FROM withdraws,
+             LATERAL (VALUES ('withdraw_count', 1), ('withdraw_amount', COALESCE(amount, 0))) AS x(k, v)
+        GROUP BY 1
+        ON CONFLICT (name, shard) DO NOTHING
+        """,
+        """
+        INSERT INTO stat_counters (name, shard, value)
+        SELECT 'tasks:' || COALESCE(status, 'Pending'), 0, COUNT(*) FROM tasks GROUP BY 1
+        ON CONFLICT (name, shard) DO NOTHING
+        """,
+    ], concurrent=False),
+
+    Migration(4, "broadcast_jobs", [
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS blocked_at TIMESTAMPTZ",
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id SERIAL PRIMARY KEY,
+            message      TEXT NOT NULL,
+            created_by   BIGINT,
+            status       TEXT NOT NULL DEFAULT 'running',
+            last_user_id BIGINT NOT NULL DEFAULT 0,
+            sent         INTEGER NOT NULL DEFAULT 0,
+            blocked      INTEGER NOT NULL DEFAULT 0,
+            failed       INTEGER NOT NULL DEFAULT 0,
+            lease_owner  TEXT,
+            lease_until  TIMESTAMPTZ,
+            created_at   TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            finished_at  TIMESTAMPTZ
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS broadcast_jobs_running ON broadcast_jobs (id) WHERE status = 'running'",
+    ], concurrent=False),
+
+    Migration(5, "task_ingest", [
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS parse_status TEXT",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS row_count INTEGER",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS invalid_rows INTEGER",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS payout NUMERIC(12, 2)",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS parse_error TEXT",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS parsed_at TIMESTAMPTZ",
+        # পাইপলাইনের কাজের লিস্ট — প্রায় সব রো parsed, তাই partial ইনডেক্স ছোট থাকে
+        "CREATE INDEX IF NOT EXISTS tasks_parse_queue ON tasks (id) WHERE parse_status IN ('queued', 'parsing')",
+        # যেগুলো এখনো রিভিউ হয়নি সেগুলোও পার্স হোক
+        "UPDATE tasks SET parse_status = 'queued' WHERE status = 'Pending' AND parse_status IS NULL",
+    ], concurrent=False),
+
+    Migration(6, "gmail_dedup", [
+        """
+        CREATE TABLE IF NOT EXISTS gmail_addresses (
+            id BIGSERIAL PRIMARY KEY,
+            addr_hash BIGINT NOT NULL UNIQUE,
+            task_id   INTEGER NOT NULL,
+            user_id   BIGINT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS file_unique_id TEXT",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS duplicate_of INTEGER",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS dup_rows INTEGER",
+        "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS dup_tasks TEXT",
+        "CREATE INDEX IF NOT EXISTS tasks_file_unique_id ON tasks (file_unique_id) WHERE file_unique_id IS NOT NULL",
+        # আগে পার্স হওয়া টাস্কের ঠিকানা এখানে নেই — আবার পার্স করিয়ে ভরে নাও
+        "UPDATE tasks SET parse_status = 'queued' WHERE parse_status = 'parsed'",
+    ], concurrent=False),
+
+    Migration(7, "processed_updates", [
+        """
+        CREATE TABLE IF NOT EXISTS processed_updates (
+            update_id  BIGINT PRIMARY KEY,
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS processed_updates_expires ON processed_updates (expires_at)",
+    ], concurrent=False),
+
+    Migration(8, "poll_offsets", [
+        """
+        CREATE TABLE IF NOT EXISTS poll_offsets (
+            bot_id      TEXT PRIMARY KEY,
+            next_offset BIGINT NOT NULL,
+            updated_at  TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ], concurrent=False),
+
+    Migration(9, "referral_closure", [
+        """
+        CREATE TABLE IF NOT EXISTS referral_closure (
+            ancestor   BIGINT NOT NULL,
+            descendant BIGINT NOT NULL,
+            depth      INTEGER NOT NULL,
+            PRIMARY KEY (ancestor, descendant)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS referral_closure_descendant ON referral_closure (descendant)",
+        # বিদ্যমান refer_by থেকে একবার পুরো ট্রি (depth সীমা — পুরনো ডেটায় চক্র থাকলেও শেষ হয়)
+        """
+        WITH RECURSIVE up AS (
+            SELECT user_id AS descendant, refer_by AS ancestor, 1 AS depth
+            FROM users WHERE refer_by IS NOT NULL AND refer_by <> user_id
+            UNION ALL
+            SELECT up.descendant, u.refer_by, up.depth + 1
+            FROM up JOIN users u ON u.user_id = up.ancestor
+            WHERE u.refer_by IS NOT NULL AND up.depth < 50
+        )
+        INSERT INTO referral_closure (ancestor, descendant, depth)
+        SELECT ancestor, descendant, MIN(depth) FROM up
+        WHERE ancestor <> descendant
+        GROUP BY ancestor, descendant
+        ON CONFLICT DO NOTHING
+        """,
+        """
+        CREATE MATERIALIZED VIEW IF NOT EXISTS referral_leaderboard AS
+        SELECT ancestor AS user_id,
+               COUNT(*) FILTER (WHERE depth = 1) AS direct,
+               COUNT(*) AS downline
+        FROM referral_closure
+        GROUP BY ancestor
+        """,
+        # CONCURRENTLY রিফ্রেশের জন্য unique index লাগে
+        "CREATE UNIQUE INDEX IF NOT EXISTS referral_leaderboard_user ON referral_leaderboard (user_id)",
+        "CREATE INDEX IF NOT EXISTS referral_leaderboard_rank ON referral_leaderboard (direct DESC, downline DESC)",
+    ], concurrent=False),
+    # র‍্যাঙ্ক রিফ্রেশের সময় একবার হিসাব — ইউজারের র‍্যাঙ্ক দেখা তখন শুধু user_id ইনডেক্সে একটা রো
+    Migration(10, "referral_leaderboard_rank", [
+        "DROP MATERIALIZED VIEW IF EXISTS referral_leaderboard",
+        """
+        CREATE MATERIALIZED VIEW referral_leaderboard AS
+        SELECT user_id, direct, downline,
+               rank() OVER (ORDER BY direct DESC, downline DESC) AS rank
+        FROM (
+            SELECT ancestor AS user_id,
+                   COUNT(*) FILTER (WHERE depth = 1) AS direct,
+                   COUNT(*) AS downline
+            FROM referral_closure
+            GROUP BY ancestor
+        ) t
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS referral_leaderboard_user ON referral_leaderboard (user_id)",
+        "CREATE INDEX IF NOT EXISTS referral_leaderboard_rank ON referral_leaderboard (rank)",
+    ], concurrent=False),
+]
+
+LATEST = MIGRATIONS[-1].version
+
+# একই সময়ে দুইটা ডিপ্লয় মাইগ্রেট করতে গেলে একজন অপেক্ষা করবে
+_ADVISORY_LOCK_KEY = 0x7461736b  # "task"
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def current_version(engine) -> int:
+    """
+    টেবিল না থাকলে 0 — কিছু তৈরি করে না (worker স্টার্টআপের চেকের জন্য)।
+    DB তে পৌঁছানো না গেলে exception caller পর্যন্ত যায় ("স্কিমা পুরনো" বলে ভুল রিপোর্ট না হয়)।
+    """
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("schema_migrations"):
+            return 0
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def _apply(engine, m: Migration):
+    if m.concurrent:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for stmt in m.statements:
+                conn.execute(text(stmt))
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                         {"v": m.version, "n": m.name})
+    else:
+        with engine.begin() as conn:
+            for stmt in m.statements:
+                conn.execute(text(stmt))
+            conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                         {"v": m.version, "n": m.name})
+
+
+def upgrade(engine, target=None) -> list:
+    """বাকি মাইগ্রেশনগুলো ক্রমানুসারে; return যেগুলো চালানো হলো তাদের version"""
+    target = LATEST if target is None else target
+    done = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        postgres = engine.dialect.name == "postgresql"
+        if postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+        try:
+            applied = applied_versions(engine)
+            for m in MIGRATIONS:
+                if m.version in applied or m.version > target:
+                    continue
+                log.info("applying migration %s %s", m.version, m.name)
+                _apply(engine, m)
+                done.append(m.version)
+        finally:
+            if postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+    return done
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise SystemExit("❌ DATABASE_URL not set in Environment Variables!")
+    engine = create_engine(url)
+    cmd = argv[1] if len(argv) > 1 else "upgrade"
+    if cmd == "upgrade":
+        done = upgrade(engine)
+        print(f"✅ applied: {done}" if done else "✅ already up to date")
+    elif cmd == "status":
+        applied = applied_versions(engine)
+        for m in MIGRATIONS:
+            print(f"{'✅' if m.version in applied else '⏳'} {m.version:>3} {m.name}")
+    else:
+        raise SystemExit("usage: python migrations.py [upgrade|status]")
+
+
+if __name__ == "__main__":
+    main(sys.argv)
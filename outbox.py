@@ -0,0 +1,283 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import requests
+from telebot.apihelper import ApiTelegramException
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 429 retry_after
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now) -> float:
+        """কত সেকেন্ড পরে একটা token পাওয়া যাবে (0 = এখনই)"""
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def idle(self, now) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class _Lane(deque):
+    in_flight = False
+
+
+class _Job:
+    __slots__ = ("method", "args", "kwargs", "future", "attempts")
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+
+
+class Outbox:
+    """
+    সব আউটগোয়িং Telegram কল এখান দিয়ে যায়।
+    - global + per-chat token bucket (flood limit এর নিচে থাকা)
+    - 429 এলে retry_after মেনে আবার চেষ্টা, network/5xx এ bounded backoff
+    - একই চ্যাটের মেসেজ FIFO, এক চ্যাটে একসাথে একটাই কল
+    প্রতিটা কল একটা Future ফেরত দেয়; ফলাফল লাগলে .result() নাও।
+    """
+
+    def __init__(self, bot, global_rate=25.0, chat_rate=1.0, chat_burst=3,
+                 senders=4, max_retries=5, backoff_base=0.5, backoff_max=30.0, max_pending=20000,
+                 gate=None):
+        self.bot = bot
+        # gate(fn, *args, on_discard=): যেমন Database.after_commit — DB commit না হওয়া পর্যন্ত
+        # মেসেজ আটকে রাখে; rollback হলে on_discard (Future cancel) ডাকে
+        self.gate = gate
+        # observe(method, seconds, outcome): প্রতিটা চেষ্টার পরে (metrics) — outcome: "ok", error_code, "network", "error"
+        self.observe = None
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.senders = max(1, int(senders))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_pending = max_pending
+
+        self._cond = threading.Condition()
+        self._lanes = {}    # chat_id -> deque[_Job]
+        self._buckets = {}  # chat_id -> TokenBucket
+        self._heap = []     # (ready_at, seq, chat_id) — যে lane গুলো পাঠানোর জন্য তৈরি
+        self._seq = itertools.count()
+        self._pending = 0
+        self._pid = None
+        self._counts = {"queued": 0, "sent": 0, "retried": 0, "rate_limited": 0, "dropped": 0, "failed": 0}
+
+    # ---- public helpers (bot.* এর মতোই নাম)
+    def send_message(self, chat_id, text, **kwargs) -> Future:
+        return self.submit("send_message", chat_id, chat_id, text, **kwargs)
+
+    def send_document(self, chat_id, document, **kwargs) -> Future:
+        return self.submit("send_document", chat_id, chat_id, document, **kwargs)
+
+    def edit_message_text(self, text, chat_id, message_id, **kwargs) -> Future:
+        return self.submit("edit_message_text", chat_id, text, chat_id=chat_id, message_id=message_id, **kwargs)
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs) -> Future:
+        # কোনো চ্যাটের lane এ না, শুধু global bucket
+        return self.submit("answer_callback_query", None, callback_query_id, text, **kwargs)
+
+    def submit(self, method, lane, *args, **kwargs) -> Future:
+        job = _Job(method, args, kwargs)
+        if self.gate is not None:
+            self.gate(self._enqueue, lane, job, on_discard=job.future.cancel)
+        else:
+            self._enqueue(lane, job)
+        return job.future
+
+    def _enqueue(self, lane, job):
+        self._ensure_started()
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self._counts["dropped"] += 1
+                log.error("outbox full (%d pending), dropping %s to %s", self._pending, job.method, lane)
+                job.future.set_exception(RuntimeError("outbox full"))
+                return
+            q = self._lanes.get(lane)
+            if q is None:
+                q = self._lanes[lane] = _Lane()
+            q.append(job)
+            self._pending += 1
+            self._counts["queued"] += 1
+            if len(q) == 1 and not q.in_flight:
+                self._schedule(lane, time.monotonic())
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            counts = dict(self._counts)
+            counts["pending"] = self._pending
+            counts["lanes"] = len(self._lanes)
+        return counts
+
+    # ---- scheduler internals (সব _cond ধরে রেখে ডাকতে হবে)
+    def _bucket(self, lane):
+        if lane is None:
+            return None
+        b = self._buckets.get(lane)
+        if b is None:
+            b = self._buckets[lane] = TokenBucket(self.chat_rate, self.chat_burst)
+        return b
+
+    def _schedule(self, lane, now):
+        b = self._bucket(lane)
+        ready = now + (b.delay(now) if b else 0.0)
+        heapq.heappush(self._heap, (ready, next(self._seq), lane))
+
+    def _release_lane(self, lane, now):
+        q = self._lanes.get(lane)
+        q.in_flight = False
+        if q:
+            self._schedule(lane, now)
+            self._cond.notify()
+            return
+        del self._lanes[lane]
+        b = self._buckets.get(lane)
+        if b is not None and b.idle(now):
+            del self._buckets[lane]
+        if len(self._buckets) > 10000:
+            # অনেক দিন আগের চ্যাটের bucket ঝেড়ে ফেলো
+            for key in [k for k, v in self._buckets.items() if k not in self._lanes and v.idle(now)]:
+                del self._buckets[key]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                ready, _, lane = self._heap[0]
+                if ready > now:
+                    self._cond.wait(ready - now)
+                    continue
+                heapq.heappop(self._heap)
+                b = self._bucket(lane)
+                wait = max(self.global_bucket.delay(now), b.delay(now) if b else 0.0)
+                if wait > 0:
+                    heapq.heappush(self._heap, (now + wait, next(self._seq), lane))
+                    continue
+                self.global_bucket.take(now)
+                if b:
+                    b.take(now)
+                q = self._lanes[lane]
+                q.in_flight = True
+                return lane, q.popleft()
+
+    # ---- sender threads
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._cond:
+            if self._pid == os.getpid():
+                return
+            for i in range(self.senders):
+                threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            lane, job = self._next_job()
+            retry_in = self._call(lane, job)
+            with self._cond:
+                now = time.monotonic()
+                if retry_in is None:
+                    self._pending -= 1
+                else:
+                    self._lanes[lane].appendleft(job)
+                    b = self._bucket(lane) or self.global_bucket
+                    b.blocked_until = max(b.blocked_until, now + retry_in)
+                self._release_lane(lane, now)
+
+    def _call(self, lane, job):
+        """None = শেষ (সফল বা বাদ), নাহলে কত সেকেন্ড পরে আবার চেষ্টা"""
+        job.attempts += 1
+        # ফাইল আপলোড (InputFile বা file object) retry হলে আবার শুরু থেকে পড়তে হবে
+        for arg in (*job.args, *job.kwargs.values()):
+            fobj = getattr(arg, "file", arg)
+            if hasattr(fobj, "read") and hasattr(fobj, "seek"):
+                fobj.seek(0)
+        started, outcome = time.perf_counter(), "error"
+        try:
+            result = getattr(self.bot, job.method)(*job.args, **job.kwargs)
+            outcome = "ok"
+        except ApiTelegramException as e:
+            outcome = str(e.error_code)
+            if e.error_code == 429:
+                retry_after = (e.result_json.get("parameters") or {}).get("retry_after", 1)
+                with self._cond:
+                    self._counts["rate_limited"] += 1
+                return self._retry_or_drop(lane, job, e, float(retry_after))
+            if e.error_code >= 500:
+                return self._retry_or_drop(lane, job, e, self._backoff(job.attempts))
+            # 400/403 (ভুল রিকোয়েস্ট, ইউজার ব্লক করেছে) — আবার চেষ্টা করে লাভ নেই
+            with self._cond:
+                self._counts["failed"] += 1
+            log.info("telegram %s to %s failed: %s", job.method, lane, e.description)
+            job.future.set_exception(e)
+            return None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            outcome = "network"
+            return self._retry_or_drop(lane, job, e, self._backoff(job.attempts))
+        except Exception as e:
+            with self._cond:
+                self._counts["failed"] += 1
+            log.exception("telegram %s to %s failed", job.method, lane)
+            job.future.set_exception(e)
+            return None
+        finally:
+            if self.observe is not None:
+                self.observe(job.method, time.perf_counter() - started, outcome)
+        with self._cond:
+            self._counts["sent"] += 1
+        job.future.set_result(result)
+        return None
+
+    def _retry_or_drop(self, lane, job, exc, delay):
+        with self._cond:
+            if job.attempts > self.max_retries:
+                self._counts["dropped"] += 1
+                drop = True
+            else:
+                self._counts["retried"] += 1
+                drop = False
+        if drop:
+            log.error("telegram %s to %s dropped after %d attempts: %s", job.method, lane, job.attempts, exc)
+            job.future.set_exception(exc)
+            return None
+        return delay
+
+    def _backoff(self, attempt):
+        return min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))) * random.uniform(0.5, 1.0)
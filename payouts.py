@@ -0,0 +1,124 @@
+"""
+দৈনিক পেআউট দুইটা ফাইলে:
+  pending_withdraws() + export_csv()  সব Pending withdraw এর CSV, method ধরে সাজানো — রো পড়া transaction এ,
+                    CSV লেখা তার বাইরে (বড় হলে ডিস্কে যায়)
+  parse_decisions() এডমিনের ফেরত পাঠানো ফাইলের decision কলাম (A/R) পড়া
+  apply_decisions() সব সিদ্ধান্ত একটাই স্টেটমেন্টে: status বদল + reject এর রিফান্ড লেজারে
+"""
+import csv
+import io
+import tempfile
+
+from sqlalchemy import text
+
+import ledger
+import stats
+from bulk_credit import read_rows
+
+CSV_COLUMNS = ["id", "method", "number", "amount", "user_id", "decision"]
+SPOOL_MAX = 1024 * 1024  # এর বেশি হলে temp ফাইলে
+MAX_DECISIONS = 20000
+
+APPROVE_WORDS = {"a", "approve", "approved", "paid", "ok", "y", "yes", "✅"}
+REJECT_WORDS = {"r", "reject", "rejected", "n", "no", "❌"}
+
+
+def pending_withdraws(conn):
+    """[(id, method, number, amount, user_id)] — method, তারপর id ক্রমে"""
+    return conn.execute(text("""
+        SELECT id, method, number, amount, user_id FROM withdraws
+        WHERE status = 'Pending'
+        ORDER BY method, id
+    """)).fetchall()
+
+
+def export_csv(rows):
+    """
+    return (file, summary) — file: শুরুতে seek করা binary file object (UTF-8 BOM, Excel এ ঠিক খোলে),
+    বন্ধ করা caller এর দায়িত্ব; summary: {method: (count, total_amount)}
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    out = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    summary = {}
+    for wid, method, number, amount, uid in rows:
+        writer.writerow([wid, method, number, amount, uid, ""])
+        count, total = summary.get(method, (0, 0))
+        summary[method] = (count + 1, total + (amount or 0))
+    out.flush()
+    out.detach()
+    spool.seek(0)
+    return spool, summary
+
+
+def parse_decisions(file_name: str, data: bytes):
+    """
+    হেডার থেকে id আর decision কলাম খোঁজে (না পেলে প্রথম আর শেষ কলাম)। decision খালি হলে সেই রো বাদ।
+    return (decisions: {withdraw_id: approve_bool}, errors: ["line N: ..."])
+    """
+    rows = read_rows(file_name, data)
+    id_col, dec_col = 0, len(CSV_COLUMNS) - 1
+    decisions, errors = {}, []
+    for line_no, row in enumerate(rows, start=1):
+        cells = ["" if c is None else str(c).strip() for c in (row or [])]
+        if line_no == 1:
+            header = [c.lower() for c in cells]
+            if "id" in header:
+                id_col = header.index("id")
+                dec_col = header.index("decision") if "decision" in header else len(header) - 1
+                continue
+        if not any(cells):
+            continue
+        decision = cells[dec_col].lower() if dec_col < len(cells) else ""
+        if not decision:
+            continue
+        try:
+            wid = int(float(cells[id_col]))
+        except (ValueError, IndexError):
+            errors.append(f"line {line_no}: id সংখ্যা নয়")
+            continue
+        if decision in APPROVE_WORDS:
+            decisions[wid] = True
+        elif decision in REJECT_WORDS:
+            decisions[wid] = False
+        else:
+            errors.append(f"line {line_no}: decision বুঝিনি ({cells[dec_col]}) — A বা R লিখুন")
+        if len(decisions) > MAX_DECISIONS:
+            raise ValueError(f"❌ সর্বোচ্চ {MAX_DECISIONS} টা রিকোয়েস্ট একবারে")
+    return decisions, errors
+
+
+def apply_decisions(conn, decisions: dict):
+    """
+    একটা স্টেটমেন্ট: ইনপুট unnest → শুধু Pending রো আপডেট → Rejected গুলোর রিফান্ড এন্ট্রি।
+    আগেই প্রসেস হওয়া বা না থাকা id বাদ পড়ে (skipped)।
+    return (done: [(id, user_id, amount, method, approved)], skipped: [id])
+    """
+    if not decisions:
+        return [], []
+    ids = list(decisions)
+    rows = conn.execute(text("""
+        WITH d AS (
+            SELECT * FROM unnest(CAST(:ids AS INTEGER[]), CAST(:ok AS BOOLEAN[])) AS d(id, approve)
+        ), w AS (
+            UPDATE withdraws SET status = CASE WHEN d.approve THEN 'Approved' ELSE 'Rejected' END
+            FROM d
+            WHERE withdraws.id = d.id AND withdraws.status = 'Pending'
+            RETURNING withdraws.id, withdraws.user_id, withdraws.amount, withdraws.method, d.approve
+        ), refund AS (
+            INSERT INTO balance_ledger (user_id, delta, kind, ref_id)
+            SELECT user_id, amount, :k, id FROM w WHERE NOT approve
+        )
+        SELECT id, user_id, amount, method, approve FROM w ORDER BY id
+    """), {"ids": ids, "ok": [decisions[i] for i in ids], "k": ledger.KIND_WITHDRAW_REFUND}).fetchall()
+
+    counters = {}
+    for _, _, amount, method, approve in rows:
+        for key, delta in (*stats.withdraw_counters("Pending", method, amount, sign=-1).items(),
+                           *stats.withdraw_counters("Approved" if approve else "Rejected", method, amount).items()):
+            counters[key] = counters.get(key, 0) + delta
+    stats.bump(conn, counters)
+
+    found = {r[0] for r in rows}
+    return [tuple(r) for r in rows], [i for i in ids if i not in found]
@@ -0,0 +1,132 @@
+"""
+Webhook ছাড়া চালানোর জন্য long polling (লোকাল রান, বা যেখানে ইনকামিং HTTPS ধীর):
+getUpdates বড় ব্যাচে (limit=100; আপডেট না থাকলে Telegram timeout পর্যন্ত ধরে রাখে) →
+প্রতিটা আপডেট webhook এর মতো একই handler এ → পরের offset DB তে।
+  poll_offsets(bot_id)  পরের offset — restart এ সেখান থেকেই শুরু, কিছু বাদ পড়ে না
+offset লেখা হয় ব্যাচ handle হওয়ার পরে (handler অন্য thread এ দিলে drain() শেষ হওয়ার পরে)। মাঝপথে মারা গেলে ব্যাচটা আবার আসে;
+আগেই প্রসেস হওয়াগুলো processed_updates (idempotency.py) বাদ দেয়।
+একটা bot এ একসাথে একটাই poller চলতে পারে (Telegram 409 দেয়), তাই এটা শুধু `python bot.py polling` এ।
+"""
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from sqlalchemy import text
+
+log = logging.getLogger(__name__)
+
+
+def update_date(update):
+    """Telegram কখন পেয়েছিল (unix সেকেন্ড) — শুধু মেসেজে থাকে, callback এ নেই"""
+    msg = update.message or update.edited_message
+    return msg.date if msg is not None else None
+
+
+class LongPoller:
+    """
+    run(): ব্লক করে চলে (stop event set না হওয়া পর্যন্ত)। poll_once(): একটা ব্যাচ, return কতগুলো আপডেট।
+    bot: TeleBot (বা ForkSafeLazy); handler(update): bot.py দেয় (webhook এর process_update এর মতো)।
+    drain(): handler আপডেট অন্য কোথাও পাঠালে (queue) সেগুলো শেষ হওয়া পর্যন্ত ব্লক — offset সেভ তার পরে।
+    api_call(method): Bot API কল মাপার context manager (bot.py এর metrics)।
+    key: offset এর সারি — bot এর numeric id, যাতে টোকেন বদলালে পুরনো offset না লাগে।
+    lag = handle শুরু হওয়ার সময় - Telegram এ মেসেজ আসার সময়।
+    """
+
+    def __init__(self, bot, engine, handler, key, batch_size=100, timeout=30, retry_delay=5,
+                 allowed_updates=("message", "edited_message", "callback_query"), drain=None,
+                 api_call=nullcontext):
+        self.bot = bot
+        self.engine = engine
+        self.handler = handler
+        self.drain = drain
+        self.api_call = api_call
+        self.key = str(key)
+        self.batch_size = min(100, max(1, int(batch_size)))  # Telegram এর সর্বোচ্চ 100
+        self.timeout = int(timeout)
+        self.retry_delay = retry_delay
+        self.allowed_updates = list(allowed_updates)
+        self.offset = None
+        self._lock = threading.Lock()
+        self._counts = {"batches": 0, "empty_polls": 0, "updates": 0, "failed": 0, "poll_errors": 0}
+        self._max_batch = 0
+        self._last_batch = 0
+        self._lag_last = None
+        self._lag_max = 0.0
+
+    # ---- offset
+    def _load_offset(self):
+        with self.engine.connect() as conn:
+            return conn.execute(text("SELECT next_offset FROM poll_offsets WHERE bot_id = :k"),
+                                {"k": self.key}).scalar()
+
+    def _save_offset(self, offset):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO poll_offsets (bot_id, next_offset, updated_at)
+                VALUES (:k, :o, CURRENT_TIMESTAMP)
+                ON CONFLICT (bot_id) DO UPDATE SET next_offset = EXCLUDED.next_offset, updated_at = EXCLUDED.updated_at
+            """), {"k": self.key, "o": offset})
+
+    # ---- loop
+    def poll_once(self) -> int:
+        if self.offset is None:
+            self.offset = self._load_offset()
+            log.info("long polling from offset %s", self.offset)
+        with self.api_call("get_updates"):
+            updates = self.bot.get_updates(offset=self.offset, limit=self.batch_size,
+                                           timeout=self.timeout + 10, long_polling_timeout=self.timeout,
+                                           allowed_updates=self.allowed_updates)
+        now = time.time()
+        lags = [now - d for d in map(update_date, updates) if d]
+        failed = 0
+        for update in updates:
+            try:
+                self.handler(update)
+            except Exception:
+                failed += 1
+                log.exception("update %s failed", update.update_id)
+        if updates and self.drain is not None:
+            self.drain()
+        if updates:
+            self.offset = max(u.update_id for u in updates) + 1
+            self._save_offset(self.offset)
+
+        with self._lock:
+            self._counts["batches"] += 1
+            self._counts["empty_polls"] += not updates
+            self._counts["updates"] += len(updates)
+            self._counts["failed"] += failed
+            self._last_batch = len(updates)
+            self._max_batch = max(self._max_batch, len(updates))
+            if lags:
+                self._lag_last = max(lags)
+                self._lag_max = max(self._lag_max, self._lag_last)
+        return len(updates)
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        # webhook সেট থাকলে getUpdates 409 দেয়
+        with self.api_call("remove_webhook"):
+            self.bot.remove_webhook()
+        while not stop.is_set():
+            try:
+                self.poll_once()
+            except Exception:
+                with self._lock:
+                    self._counts["poll_errors"] += 1
+                log.exception("getUpdates failed, retrying in %ss", self.retry_delay)
+                stop.wait(self.retry_delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            polled = self._counts["batches"] - self._counts["empty_polls"]
+            return {
+                **self._counts,
+                "offset": self.offset,
+                "last_batch": self._last_batch,
+                "max_batch": self._max_batch,
+                "avg_batch": round(self._counts["updates"] / polled, 2) if polled else 0,
+                "lag_last_s": round(self._lag_last, 3) if self._lag_last is not None else None,
+                "lag_max_s": round(self._lag_max, 3),
+            }
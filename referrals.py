@@ -0,0 +1,96 @@
+"""
+রেফারাল ট্রি — পুরো ডাউনলাইন/লিডারবোর্ডের জন্য recursive কুয়েরি লাগে না:
+  referral_closure(ancestor, descendant, depth)  প্রতিটা উপরের-নিচের জোড়া একটা রো (depth 1 = সরাসরি রেফার)।
+      attach_referrer (balance_ops.py) refer_by সেট করার একই স্টেটমেন্টে রো যোগ করে (CLOSURE_INSERT)।
+  referral_leaderboard  closure থেকে materialized view (ancestor প্রতি direct/downline);
+      refresh_leaderboard() PeriodicTask এ চলে, এক worker রিফ্রেশ করলে বাকিরা বাদ (advisory lock)।
+ডাউনলাইন = closure এ ancestor = uid (PK এর prefix), র‍্যাঙ্ক = view এ রিফ্রেশের সময় হিসাব করা rank কলাম।
+view এর সংখ্যাগুলো শেষ রিফ্রেশ পর্যন্ত; লিডারবোর্ডের আয় = users.ref_earn + এখনো materialize না হওয়া লেজার রো।
+"""
+from sqlalchemy import text
+
+import ledger
+
+LEADERBOARD_LOCK = 0x5EF1EAD  # pg_try_advisory_xact_lock key
+# lock_chain() এর (namespace, id) advisory lock — দুই-int রূপ, এক-bigint key গুলোর সাথে মেশে না
+ATTACH_LOCK = 0x5EF1A77
+
+# attach_referrer এর CTE তে: att (সদ্য attach হওয়া uid) থাকলে rid আর তার সব উপরের × uid আর তার সব নিচের
+CLOSURE_INSERT = """
+    INSERT INTO referral_closure (ancestor, descendant, depth)
+    SELECT a.ancestor, d.descendant, a.depth + d.depth + 1
+    FROM att,
+         (SELECT CAST(:rid AS BIGINT) AS ancestor, 0 AS depth
+          UNION ALL SELECT ancestor, depth FROM referral_closure WHERE descendant = :rid) a,
+         (SELECT CAST(:uid AS BIGINT) AS descendant, 0 AS depth
+          UNION ALL SELECT descendant, depth FROM referral_closure WHERE ancestor = :uid) d
+    ON CONFLICT (ancestor, descendant) DO NOTHING
+"""
+
+# uid ইতিমধ্যে rid এর উপরে থাকলে attach করলে চক্র হতো (A→B→A)
+NO_CYCLE = "NOT EXISTS (SELECT 1 FROM referral_closure WHERE ancestor = :uid AND descendant = :rid)"
+
+
+def _root(conn, uid: int) -> int:
+    """uid এর চেইনের সবচেয়ে উপরের জন (কেউ না থাকলে uid নিজে)"""
+    return conn.execute(text("""
+        SELECT COALESCE((SELECT ancestor FROM referral_closure WHERE descendant = :uid
+                         ORDER BY depth DESC LIMIT 1), :uid)
+    """), {"uid": uid}).scalar()
+
+
+def lock_chain(conn, uid: int, rid: int):
+    """
+    attach_referrer এর আগে: uid আর rid এর চেইনের root লক (transaction শেষ পর্যন্ত)।
+    একসাথে A→B আর B→C হলে দুটোর snapshot এই অন্যটা নেই, A→C জোড়া হারিয়ে যেত — তখন দুটোই B লক করে।
+    আলাদা চেইনের attach একে অপরকে আটকায় না। লক পাওয়ার মাঝে root বদলালে (root নিজেই attach হলো) নতুনটাও লক।
+    """
+    locked = set()
+    while True:
+        want = {uid, _root(conn, rid)} - locked
+        if not want:
+            return
+        for k in sorted(want):
+            conn.execute(text("SELECT pg_advisory_xact_lock(:ns, :k)"),
+                         {"ns": ATTACH_LOCK, "k": k % 2147483647})
+        locked |= want
+
+
+def downline(conn, uid: int) -> dict:
+    """{depth: কতজন} — depth 1 = সরাসরি রেফার"""
+    return dict(conn.execute(text("""
+        SELECT depth, COUNT(*) FROM referral_closure WHERE ancestor = :uid GROUP BY depth ORDER BY depth
+    """), {"uid": uid}).fetchall())
+
+
+def rank(conn, uid: int):
+    """লিডারবোর্ডে অবস্থান (সরাসরি রেফার, তারপর ডাউনলাইন; শেষ রিফ্রেশ অনুযায়ী) — না থাকলে None"""
+    return conn.execute(text("SELECT rank FROM referral_leaderboard WHERE user_id = :uid"),
+                        {"uid": uid}).scalar()
+
+
+def leaderboard(conn, limit=10):
+    """
+    [(rank, user_id, direct, downline, ref_earn)] — rank ক্রমে (সমান হলে একই rank)। ref_earn = snapshot + pending
+    (শুধু এই কয়েকজনের pending রো, balance_ledger_pending_user ইনডেক্সে)
+    """
+    return conn.execute(text("""
+        SELECT l.rank, l.user_id, l.direct, l.downline,
+               COALESCE(u.ref_earn, 0) + COALESCE((
+                   SELECT SUM(b.delta) FROM balance_ledger b
+                   WHERE b.user_id = l.user_id AND NOT b.applied AND b.kind IN (:rj, :rb)
+               ), 0)
+        FROM referral_leaderboard l
+        LEFT JOIN users u ON u.user_id = l.user_id
+        ORDER BY l.rank, l.user_id
+        LIMIT :n
+    """), {"n": limit, "rj": ledger.KIND_REF_JOIN, "rb": ledger.KIND_REF_BONUS}).fetchall()
+
+
+def refresh_leaderboard(engine) -> bool:
+    """CONCURRENTLY: রিফ্রেশের সময়ও পড়া চলে। return False যদি অন্য worker এখন রিফ্রেশ করছে"""
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": LEADERBOARD_LOCK}).scalar():
+            return False
+        conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY referral_leaderboard"))
+    return True
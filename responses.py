@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextlib import nullcontext
+
+from telebot import types
+
+from router import callback_data
+
+log = logging.getLogger(__name__)
+
+
+# ==============================
+# BOT IDENTITY (get_me একবারই)
+# ==============================
+class BotIdentity:
+    """get_me() এর ফলাফল ক্যাশ — TTL শেষ হলে পরের ব্যবহারে রিফ্রেশ, ব্যর্থ হলে পুরনোটাই চলবে"""
+
+    def __init__(self, bot, ttl=6 * 3600):
+        self.bot = bot
+        self.ttl = ttl
+        self._user = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self.api_call = nullcontext  # api_call(method): get_me মাপার context manager — bot.py metrics এ দেয়
+
+    def warm(self):
+        try:
+            self._refresh()
+        except Exception:
+            log.warning("could not resolve bot identity at startup", exc_info=True)
+
+    def _refresh(self):
+        with self.api_call("get_me"):
+            user = self.bot.get_me()
+        with self._lock:
+            self._user = user
+            self._fetched_at = time.monotonic()
+        return user
+
+    def get(self):
+        if self._user is not None and time.monotonic() - self._fetched_at < self.ttl:
+            return self._user
+        try:
+            return self._refresh()
+        except Exception:
+            if self._user is None:
+                raise
+            log.warning("bot identity refresh failed, using cached value", exc_info=True)
+            return self._user
+
+    @property
+    def username(self) -> str:
+        return self.get().username
+
+    def refer_link(self, uid: int) -> str:
+        return f"https://t.me/{self.username}?start={uid}"
+
+
+# ==============================
+# PREBUILT KEYBOARDS (একবার JSON করে রাখা)
+# ==============================
+def _reply_keyboard(*rows) -> str:
+    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    for row in rows:
+        kb.add(*[types.KeyboardButton(t) for t in row])
+    return kb.to_json()
+
+
+def _inline_keyboard_template(*buttons) -> str:
+    """buttons: (label, code) — callback_data তে id এর জায়গায় {id}, পরে inline_keyboard() বসিয়ে দেবে"""
+    ikb = types.InlineKeyboardMarkup()
+    ikb.add(*[types.InlineKeyboardButton(label, callback_data=callback_data(code, "{id}")) for label, code in buttons])
+    return ikb.to_json()
+
+
+def inline_keyboard(template: str, item_id) -> str:
+    return template.replace("{id}", str(item_id))
+
+
+MAIN_MENU_KB = _reply_keyboard(
+    ["💰 Balance", "👥 Refer"],
+    ["💵 Withdraw", "🏆 Top Referrers"],
+    ["🎁 Create Gmail", "💌 Support group 🛑"],
+)
+
+ADMIN_MENU_KB = _reply_keyboard(
+    ["➕ Add Balance", "✏️ Set Balance"],
+    ["➖ Reduce Balance", "📋 All Requests"],
+    ["👥 User List", "📂 Task Requests"],
+    ["⚙️ Set Task Price", "📥 Bulk Credit"],
+    ["📊 Stats", "📣 Broadcast"],
+    ["💸 Payout CSV", "⬅️ Back"],
+)
+
+WITHDRAW_METHOD_KB = _reply_keyboard(
+    ["📲 Bkash", "📲 Nagad"],
+    ["⬅️ Back"],
+)
+
+WITHDRAW_DECISION_KB = _inline_keyboard_template(
+    ("✅ Approve", "wa"),
+    ("❌ Reject", "wr"),
+)
+
+TASK_DECISION_KB = _inline_keyboard_template(
+    ("📥 Open File", "to"),
+    ("✅ Approve", "ta"),
+    ("❌ Reject", "tr"),
+)
+
+BROADCAST_KB = _inline_keyboard_template(
+    ("⛔ Cancel", "bc"),
+)
+
+# ==============================
+# MESSAGE TEMPLATES
+# ==============================
+MAIN_MENU_TEXT = "👋 মেনু থেকে একটি অপশন সিলেক্ট করুন:"
+ADMIN_MENU_TEXT = "🔐 Admin Panel:"
+WITHDRAW_METHOD_TEXT = "💵 কোন পেমেন্ট মেথডে নিতে চান?"
+NOT_ADMIN_TEXT = "❌ আপনি এডমিন নন।"
+
+SUPPORT_TEXT = (
+    "ℹ️ যেকোনো সমস্যা হলে সাপোর্ট গ্রুপে জানাতে পারেন:\n"
+    "👉 https://t.me/+f9tOe5fPe0Q0NGZl"
+)
+
+CREATE_GMAIL_TEXT = (
+    "💰আপনি প্রতি জিমেইল এ পাবেন : {task_price} টাকা🎁\n"
+    "📍 [কিভাবে কাজ করবেন?](https://t.me/taskincometoday/16)"
+)
+BULK_CREDIT_TEXT = (
+    "📥 `.csv` বা `.xlsx` ফাইল পাঠান — প্রথম কলাম User ID, দ্বিতীয় কলাম টাকা।\n"
+    "একই ইউজার একাধিকবার থাকলে যোগ হবে। রেফারাররা স্বয়ংক্রিয়ভাবে 3% পাবে।"
+)
+BROADCAST_TEXT = (
+    "📣 সব ইউজারকে যে মেসেজ পাঠাতে চান লিখুন।\n"
+    "যারা বট ব্লক করেছে তাদের বাদ দেওয়া হবে।"
+)
+UPLOAD_XLSX_TEXT = "📂 এখন আপনার `.xlsx` ফাইলটি আপলোড করুন।"
+
+REFER_TEXT = (
+    "🔗 আপনার রেফার লিঙ্ক:\n{link}\n\n"
+    "👥 মোট রেফার করেছে: {ref_count}\n"
+    "💰 রেফার থেকে আয়: {ref_earn}৳\n"
+    "{tree}\n\n"
+    "✅ নিয়ম: আপনার রেফার্ড ইউজারের ব্যালেন্স যখনই বাড়বে,\n"
+    "আপনি পাবেন সেই বৃদ্ধির 3%।\n\n"
+    "🔔 চাইলে প্রত্যেক রেফারে সরাসরি 1৳ পান।"
+)
+
+TOP_REFERRERS_TEXT = "🏆 Top Referrers (সরাসরি রেফার ধরে)\n\n{rows}"
+
+WITHDRAW_CARD_TEXT = (
+    "🆔 {req_id} | 👤 {u_id}\n"
+    "💳 {method} ({number})\n"
+    "💵 {amount}৳ | 📌 {status}"
+)
+
+TASK_CARD_TEXT = (
+    "🗂️ Task #{tid}\n"
+    "👤 User: {uid} @{uname}\n"
+    "💰 Balance: {bal}৳\n"
+    "{summary}"
+)
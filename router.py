@@ -0,0 +1,164 @@
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# callback_data ফরম্যাট: "<version><code>:<payload>"  যেমন "1wa:42"
+# ফরম্যাট বদলালে version বাড়াও — পুরনো বাটনগুলো legacy টেবিল দিয়ে চলতে থাকবে।
+CALLBACK_VERSION = "1"
+
+
+def callback_data(code: str, *payload) -> str:
+    data = f"{CALLBACK_VERSION}{code}:" + ":".join(str(p) for p in payload)
+    if len(data.encode()) > 64:
+        raise ValueError(f"callback_data too long: {data}")
+    return data
+
+
+class _Route:
+    __slots__ = ("handler", "admin", "content_types")
+
+    def __init__(self, handler, admin, content_types=("text",)):
+        self.handler = handler
+        self.admin = admin
+        self.content_types = content_types
+
+
+class Router:
+    """
+    একবার hash table বানিয়ে রাখা router — বাটন বা admin action যত বাড়ুক, dispatch একটা lookup:
+      - commands:  "/start" -> handler(message)
+      - texts:     বাটনের হুবহু টেক্সট -> handler(message)
+      - steps:     (flow, step) -> handler(message, state)
+      - callbacks: versioned prefix -> handler(call, payload)
+    state_of(uid) -> (flow, step, state) বা None; কথোপকথনের অবস্থা কোথায় আছে router জানে না।
+    observe(handler, route, seconds, ok): প্রতিটা হ্যান্ডলার শেষে (metrics) — route: কমান্ড, "flow/step", callback code
+    """
+
+    def __init__(self, is_admin, state_of):
+        self.is_admin = is_admin
+        self.state_of = state_of
+        self._commands = {}
+        self._texts = {}
+        self._content = {}
+        self._steps = {}
+        self._callbacks = {}
+        self._legacy_callbacks = {}
+        self.on_denied_callback = None
+        self.observe = None
+
+    # ---- registration
+    def _add(self, table, key, route):
+        if key in table:
+            raise ValueError(f"duplicate route: {key!r}")
+        table[key] = route
+
+    def command(self, *names, admin=False):
+        def deco(fn):
+            for name in names:
+                self._add(self._commands, "/" + name, _Route(fn, admin))
+            return fn
+        return deco
+
+    def text(self, *texts, admin=False):
+        def deco(fn):
+            for t in texts:
+                self._add(self._texts, t, _Route(fn, admin))
+            return fn
+        return deco
+
+    def content(self, content_type, admin=False):
+        def deco(fn):
+            self._add(self._content, content_type, _Route(fn, admin))
+            return fn
+        return deco
+
+    def step(self, flow, *steps, admin=False, content_types=("text",)):
+        """content_types: যেমন ("document", "text") — ফ্লোর মাঝে ফাইল নেওয়ার স্টেপ"""
+        def deco(fn):
+            for s in steps:
+                self._add(self._steps, (flow, s), _Route(fn, admin, tuple(content_types)))
+            return fn
+        return deco
+
+    def callback(self, code, legacy=None, admin=False):
+        """legacy: পুরনো "approve_<id>" ধরনের prefix — আগের পাঠানো কার্ডের বাটন যাতে কাজ করে"""
+        def deco(fn):
+            route = _Route(fn, admin)
+            self._add(self._callbacks, CALLBACK_VERSION + code, route)
+            if legacy:
+                self._add(self._legacy_callbacks, legacy, route)
+            return fn
+        return deco
+
+    # ---- dispatch
+    def _allowed(self, route, uid):
+        return not route.admin or self.is_admin(uid)
+
+    def _run(self, route, name, *args):
+        if self.observe is None:
+            route.handler(*args)
+            return
+        started, ok = time.perf_counter(), False
+        try:
+            route.handler(*args)
+            ok = True
+        finally:
+            self.observe(route.handler.__name__, name, time.perf_counter() - started, ok)
+
+    def dispatch_message(self, message) -> bool:
+        uid = message.chat.id
+        if message.content_type != "text":
+            # ফ্লোর যে স্টেপ এই ধরনের মেসেজ চায় সে আগে পাবে (যেমন এডমিনের bulk credit ফাইল)
+            if self._dispatch_step(message, uid):
+                return True
+            route = self._content.get(message.content_type)
+            if route and self._allowed(route, uid):
+                self._run(route, message.content_type, message)
+                return True
+            return False
+
+        text_msg = message.text or ""
+        if text_msg.startswith("/"):
+            name = text_msg.split(maxsplit=1)[0].split("@", 1)[0]
+            route = self._commands.get(name)
+            if route and self._allowed(route, uid):
+                self._run(route, name, message)
+                return True
+
+        route = self._texts.get(text_msg)
+        if route and self._allowed(route, uid):
+            self._run(route, "text", message)
+            return True
+
+        return self._dispatch_step(message, uid)
+
+    def _dispatch_step(self, message, uid) -> bool:
+        current = self.state_of(uid)
+        if not current:
+            return False
+        flow, step, state = current
+        route = self._steps.get((flow, step))
+        if route is None:
+            log.warning("no step handler for %s/%s (user %s)", flow, step, uid)
+            return False
+        if message.content_type not in route.content_types or not self._allowed(route, uid):
+            return False
+        self._run(route, f"{flow}/{step}", message, state)
+        return True
+
+    def dispatch_callback(self, call) -> bool:
+        data = call.data or ""
+        head, sep, payload = data.partition(":")
+        route = self._callbacks.get(head) if sep else None
+        if route is None:
+            head, sep, payload = data.partition("_")
+            route = self._legacy_callbacks.get(head) if sep else None
+        if route is None:
+            return False
+        if not self._allowed(route, call.from_user.id):
+            if self.on_denied_callback:
+                self.on_denied_callback(call)
+            return True
+        self._run(route, head, call, payload)
+        return True
@@ -0,0 +1,182 @@
+"""
+SQLAlchemy engine event দিয়ে কুয়েরি প্রোফাইলার — কোন db.begin() ব্লক DB সময় খায়, কোন আপডেট বেশি স্টেটমেন্ট চালায়।
+  - স্টেটমেন্ট প্রতি (SQL টেক্সট ধরে) count / total / max সময়
+  - slow_ms এর বেশি হলে প্যারামিটারসহ log; explain=True হলে SELECT এর EXPLAIN (ANALYZE) ও
+    (শুধু SELECT — ANALYZE কুয়েরিটা আবার চালায়, INSERT/UPDATE হলে দুইবার লেখা হতো)
+  - track() ব্লকের (একটা আপডেট) স্টেটমেন্ট/transaction গোনা; max_statements ছাড়ালে log, সবচেয়ে খারাপগুলো report() এ
+enabled রানটাইমে বদলানো যায় (bot.py তে /sqlprofile); বন্ধ থাকলে প্রতি স্টেটমেন্টে শুধু একটা attribute চেক।
+"""
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+log = logging.getLogger(__name__)
+
+MAX_STATEMENTS = 500  # আলাদা SQL এর সংখ্যা এর বেশি হলে বাকিগুলো একসাথে
+OTHER = "<other>"
+
+
+def _short(sql: str, limit=300) -> str:
+    return " ".join(sql.split())[:limit]
+
+
+class QueryProfiler:
+    """install(engine) একবার (engine তৈরির সময়); track(label) আপডেট প্রতি; report() সারাংশ"""
+
+    def __init__(self, enabled=False, slow_ms=200.0, explain=False, max_statements=30, top=10):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.max_statements = max_statements
+        self.top = top
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._statements = {}            # sql -> [count, total_s, max_s]
+        self._slow = deque(maxlen=50)    # (ms, sql, params, plan)
+        self._worst = []                 # heap (statements, db_ms, label)
+        self._counts = {"updates": 0, "statements": 0, "transactions": 0, "slow": 0, "heavy_updates": 0}
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    # ---- engine hooks
+    def install(self, engine):
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+        event.listen(engine, "begin", self._begin)
+        return engine
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and context is not None:
+            context._sql_profile_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_sql_profile_started", None)
+        if started is None:
+            return  # before এর সময় বন্ধ ছিল
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            key = statement if statement in self._statements or len(self._statements) < MAX_STATEMENTS else OTHER
+            row = self._statements.setdefault(key, [0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += elapsed
+            row[2] = max(row[2], elapsed)
+            self._counts["statements"] += 1
+        scope = getattr(self._local, "scope", None)
+        if scope is not None:
+            scope["statements"] += 1
+            scope["db_s"] += elapsed
+        if elapsed * 1000 >= self.slow_ms:
+            self._record_slow(conn, statement, None if executemany else parameters, elapsed)
+
+    def _begin(self, conn):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts["transactions"] += 1
+        scope = getattr(self._local, "scope", None)
+        if scope is not None:
+            scope["transactions"] += 1
+
+    def _record_slow(self, conn, statement, parameters, elapsed):
+        plan = None
+        if self.explain and parameters is not None and statement.lstrip().upper().startswith("SELECT"):
+            # আলাদা DBAPI cursor — মূল cursor এর ফলাফল এখনো পড়া হয়নি, আর এটা event এ আবার ঢোকে না।
+            # আপডেটের transaction এর ভেতরে চলে, তাই SAVEPOINT এ: EXPLAIN ব্যর্থ হলেও transaction aborted থাকে না
+            try:
+                cur = conn.connection.cursor()
+                try:
+                    cur.execute("SAVEPOINT sql_profile_explain")
+                    try:
+                        cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+                        plan = "\n".join(r[0] for r in cur.fetchall())
+                    except Exception:
+                        cur.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+                        raise
+                    finally:
+                        cur.execute("RELEASE SAVEPOINT sql_profile_explain")
+                finally:
+                    cur.close()
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+        ms = elapsed * 1000
+        with self._lock:
+            self._counts["slow"] += 1
+            self._slow.append((round(ms, 1), _short(statement), repr(parameters)[:300], plan))
+        log.warning("slow query %.1fms: %s params=%.300r%s", ms, _short(statement), parameters,
+                    f"\n{plan}" if plan else "")
+
+    # ---- আপডেট প্রতি
+    @contextmanager
+    def track(self, label="update"):
+        """ভেতরের সব স্টেটমেন্ট এই scope এ গোনা; label পরে set_label() দিয়ে বদলানো যায় (যেমন হ্যান্ডলারের নাম)"""
+        if not self.enabled or getattr(self._local, "scope", None) is not None:
+            yield
+            return
+        scope = self._local.scope = {"label": label, "statements": 0, "transactions": 0, "db_s": 0.0}
+        try:
+            yield
+        finally:
+            self._local.scope = None
+            self._finish(scope)
+
+    def set_label(self, label):
+        scope = getattr(self._local, "scope", None)
+        if scope is not None:
+            scope["label"] = label
+
+    def _finish(self, scope):
+        db_ms = round(scope["db_s"] * 1000, 1)
+        entry = (scope["statements"], db_ms, scope["label"])
+        with self._lock:
+            self._counts["updates"] += 1
+            if len(self._worst) < self.top:
+                heapq.heappush(self._worst, entry)
+            elif entry > self._worst[0]:
+                heapq.heapreplace(self._worst, entry)
+            heavy = scope["statements"] > self.max_statements
+            if heavy:
+                self._counts["heavy_updates"] += 1
+        if heavy:
+            log.warning("update %s ran %d statements in %d transactions (%.1fms in DB)",
+                        scope["label"], scope["statements"], scope["transactions"], db_ms)
+
+    # ---- সারাংশ
+    def report(self) -> dict:
+        with self._lock:
+            by_total = sorted(self._statements.items(), key=lambda kv: kv[1][1], reverse=True)[:self.top]
+            return {
+                "enabled": self.enabled, "slow_ms": self.slow_ms, **self._counts,
+                "top_statements": [
+                    {"sql": _short(sql, 200), "count": n, "total_ms": round(total * 1000, 1),
+                     "avg_ms": round(total * 1000 / n, 2), "max_ms": round(mx * 1000, 1)}
+                    for sql, (n, total, mx) in by_total
+                ],
+                "worst_updates": [
+                    {"label": label, "statements": n, "db_ms": ms}
+                    for n, ms, label in sorted(self._worst, reverse=True)
+                ],
+                "recent_slow": [
+                    {"ms": ms, "sql": sql, "params": params, "plan": plan}
+                    for ms, sql, params, plan in list(self._slow)[-self.top:]
+                ],
+            }
+
+    def log_report(self):
+        rep = self.report()
+        log.info("sql profile: %d updates, %d statements, %d transactions, %d slow",
+                 rep["updates"], rep["statements"], rep["transactions"], rep["slow"])
+        for s in rep["top_statements"]:
+            log.info("  %8.1fms total %6d× avg %.2fms max %.1fms  %s",
+                     s["total_ms"], s["count"], s["avg_ms"], s["max_ms"], s["sql"])
+        for w in rep["worst_updates"]:
+            log.info("  update %s: %d statements, %.1fms", w["label"], w["statements"], w["db_ms"])
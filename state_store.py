@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from sqlalchemy import text
+
+
+class StateStore(ABC):
+    """
+    কথোপকথনের অবস্থা (withdraw/admin ফ্লো) রাখার ইন্টারফেস।
+    মান সবসময় ছোট JSON-যোগ্য dict; প্রতিটা set() এ TTL নতুন করে শুরু হয়,
+    তাই মাঝপথে ছেড়ে দেওয়া ফ্লো নিজে থেকেই মুছে যায়।
+    """
+
+    def __init__(self, ttl=1800):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key):
+        """মান, অথবা না থাকলে/মেয়াদ শেষ হলে None"""
+
+    @abstractmethod
+    def set(self, key, value: dict):
+        """মান রাখে, TTL নতুন করে শুরু"""
+
+    @abstractmethod
+    def delete(self, key):
+        """ফ্লো শেষ/বাতিল — না থাকলেও সমস্যা নেই"""
+
+
+class MemoryStateStore(StateStore):
+    """এক process এর ভেতরে — শুধু single worker এ চলে"""
+
+    def __init__(self, ttl=1800, sweep_interval=60):
+        super().__init__(ttl)
+        self.sweep_interval = sweep_interval
+        self._data = {}  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return dict(item[1])
+
+    def set(self, key, value: dict):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now + self.ttl, dict(value))
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _sweep(self, now):
+        for key in [k for k, (exp, _) in self._data.items() if exp <= now]:
+            del self._data[key]
+        self._last_sweep = now
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqlStateStore(StateStore):
+    """
+    conversation_state টেবিলে — সব worker একই DB দেখে।
+    engine: begin() আছে এমন যেকোনো কিছু — db.Database দিলে আপডেটের unit of work এর ভেতরেই চলে।
+    """
+
+    def __init__(self, engine, namespace="conv", ttl=1800, purge_interval=300):
+        super().__init__(ttl)
+        self.engine = engine
+        self.namespace = namespace
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+
+    def get(self, key):
+        with self.engine.begin() as conn:
+            row = conn.execute(text("""
+                SELECT data FROM conversation_state
+                WHERE ns=:ns AND key=:k AND expires_at > now()
+            """), {"ns": self.namespace, "k": str(key)}).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value: dict):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO conversation_state (ns, key, data, expires_at)
+                VALUES (:ns, :k, :d, now() + :ttl * interval '1 second')
+                ON CONFLICT (ns, key) DO UPDATE
+                SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+            """), {"ns": self.namespace, "k": str(key), "d": json.dumps(value), "ttl": self.ttl})
+            now = time.monotonic()
+            if now - self._last_purge >= self.purge_interval:
+                self._last_purge = now
+                conn.execute(text("DELETE FROM conversation_state WHERE expires_at <= now()"))
+
+    def delete(self, key):
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM conversation_state WHERE ns=:ns AND key=:k"),
+                         {"ns": self.namespace, "k": str(key)})
+
+
+class RedisStateStore(StateStore):
+    """
+    Redis প্রোটোকলের যেকোনো server (Redis, KeyDB, Dragonfly ...)।
+    client হলো redis-py এর মতো get/set(ex=)/delete সহ অবজেক্ট — টেস্টে fakeredis দেওয়া যায়।
+    """
+
+    def __init__(self, client, namespace="conv", ttl=1800):
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = f"state:{namespace}:"
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("❌ STATE_BACKEND redis এর জন্য `pip install redis` লাগবে")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value: dict):
+        self.client.set(self.prefix + str(key), json.dumps(value), ex=int(self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + str(key))
+
+
+def make_state_store(backend: str, engine=None, ttl=1800) -> StateStore:
+    """backend: "memory" | "sql" | "redis://host:6379/0" """
+    if backend == "memory":
+        return MemoryStateStore(ttl=ttl)
+    if backend == "sql":
+        return SqlStateStore(engine, ttl=ttl)
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateStore.from_url(backend, ttl=ttl)
+    raise ValueError(f"❌ unknown STATE_BACKEND: {backend}")
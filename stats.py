@@ -0,0 +1,113 @@
+"""
+ড্যাশবোর্ডের কাউন্টার — প্রতিটা লেখার পথে একই transaction এ বাড়ানো হয়, তাই পড়া সবসময় ধ্রুব খরচে
+(টেবিল যত বড়ই হোক, কয়েক ডজন রো যোগ)।
+  stat_counters(name, shard)      মোট হিসাব: users, balance, withdraw_count:Pending:bkash ...
+  stat_daily(day, name, shard)    দিনভিত্তিক: signups, referrals, tasks_approved ...
+shard: একই কাউন্টারে অনেকে একসাথে লিখলে এক রো তে লক-লাইন না পড়ে, তাই এলোমেলো shard এ লেখা হয়; পড়ার সময় SUM।
+"""
+import random
+
+from sqlalchemy import text
+
+SHARDS = 8
+
+# method কলামে বাটনের টেক্সট ("📲 Bkash") থাকে; কাউন্টারের নামে ছোট key
+METHOD_KEYS = {"📲 Bkash": "bkash", "📲 Nagad": "nagad"}
+WITHDRAW_STATUSES = ("Pending", "Approved", "Rejected")
+TASK_STATUSES = ("Pending", "Approved", "Rejected")
+
+
+def withdraw_counters(status: str, method: str, amount: int, sign=1) -> dict:
+    m = METHOD_KEYS.get(method, "other")
+    return {f"withdraw_count:{status}:{m}": sign, f"withdraw_amount:{status}:{m}": sign * amount}
+
+
+def bump(conn, counters=None, daily=None):
+    """
+    counters / daily: {name: delta}। নাম সাজিয়ে লেখা হয় — দুই transaction এর মধ্যে deadlock হয় না।
+    একটা স্টেটমেন্ট প্রতি টেবিলে।
+    """
+    shard = random.randrange(SHARDS)
+    for table, values, day in (("stat_counters", counters, False), ("stat_daily", daily, True)):
+        items = sorted((k, v) for k, v in (values or {}).items() if v)
+        if not items:
+            continue
+        params = {"s": shard}
+        rows = []
+        for i, (name, delta) in enumerate(items):
+            params[f"n{i}"], params[f"v{i}"] = name, delta
+            rows.append(f"(CURRENT_DATE, :n{i}, :s, :v{i})" if day else f"(:n{i}, :s, :v{i})")
+        cols = "day, name, shard, value" if day else "name, shard, value"
+        key = "day, name, shard" if day else "name, shard"
+        conn.execute(text(f"""
+            INSERT INTO {table} ({cols}) VALUES {", ".join(rows)}
+            ON CONFLICT ({key}) DO UPDATE SET value = {table}.value + EXCLUDED.value
+        """), params)
+
+
+def read_counters(conn) -> dict:
+    return {name: value for name, value in conn.execute(text(
+        "SELECT name, SUM(value) FROM stat_counters GROUP BY name"))}
+
+
+def read_all(conn, days=7):
+    """
+    (counters, daily) একটা স্টেটমেন্টে — daily: {day: {name: value}}, শেষ days দিন (আজ সহ)।
+    day NULL = stat_counters এর রো
+    """
+    counters, daily = {}, {}
+    for day, name, value in conn.execute(text("""
+        SELECT NULL AS day, name, SUM(value) FROM stat_counters GROUP BY name
+        UNION ALL
+        SELECT day, name, SUM(value) FROM stat_daily
+        WHERE day > CURRENT_DATE - CAST(:d AS INTEGER)
+        GROUP BY day, name
+    """), {"d": days}):
+        if day is None:
+            counters[name] = value
+        else:
+            daily.setdefault(day, {})[name] = value
+    return counters, daily
+
+
+def totals(conn, counters=None):
+    """
+    (মোট ইউজার, মোট ব্যালেন্স) — ব্যালেন্স = materialize হওয়া অংশ + এখনো pending লেজার।
+    counters আগেই পড়া থাকলে (dashboard) আবার পড়া হয় না।
+    """
+    c = read_counters(conn) if counters is None else counters
+    pending = conn.execute(text(
+        "SELECT COALESCE(SUM(delta), 0) FROM balance_ledger WHERE NOT applied")).scalar()
+    return c.get("users", 0), c.get("balance", 0) + pending
+
+
+def dashboard(conn, days=7) -> str:
+    c, daily = read_all(conn, days)
+    total_users, total_balance = totals(conn, c)
+
+    lines = ["📊 Stats", f"👥 মোট ইউজার: {total_users}", f"💰 মোট ব্যালেন্স: {total_balance}৳", ""]
+
+    lines.append(f"📅 শেষ {days} দিন (👤 সাইনআপ | 🔗 রেফার | ✅/❌ টাস্ক):")
+    for day in sorted(daily, reverse=True):
+        d = daily[day]
+        lines.append(f"{day:%d-%m}: 👤 {d.get('signups', 0)} | 🔗 {d.get('referrals', 0)} | "
+                     f"✅ {d.get('tasks_approved', 0)}/❌ {d.get('tasks_rejected', 0)}")
+    if not daily:
+        lines.append("—")
+    lines.append("")
+
+    lines.append("💳 Withdraw:")
+    icons = {"Pending": "⏳", "Approved": "✅", "Rejected": "❌"}
+    for status in WITHDRAW_STATUSES:
+        parts = []
+        for label, m in (("Bkash", "bkash"), ("Nagad", "nagad")):
+            n = c.get(f"withdraw_count:{status}:{m}", 0)
+            amount = c.get(f"withdraw_amount:{status}:{m}", 0)
+            parts.append(f"{label} {n} ({amount}৳)")
+        lines.append(f"{icons[status]} {status}: " + " | ".join(parts))
+    lines.append("")
+
+    tp, ta, tr = (c.get(f"tasks:{s}", 0) for s in TASK_STATUSES)
+    rate = f"{ta * 100 / (ta + tr):.0f}%" if ta + tr else "—"
+    lines.append(f"🗂️ Tasks: ⏳ {tp} | ✅ {ta} | ❌ {tr} | Approval rate {rate}")
+    return "\n".join(lines)
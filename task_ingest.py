@@ -0,0 +1,202 @@
+"""
+জমা দেওয়া টাস্ক .xlsx এর ব্যাকগ্রাউন্ড পাইপলাইন: ডাউনলোড → পার্স (process pool) → যাচাই → tasks রো তে সারাংশ।
+  parse_status: queued → parsing → parsed | failed
+  row_count:    বৈধ (ইউনিক) Gmail রো;  invalid_rows: বাদ পড়া রো
+  dup_rows:     এর মধ্যে কতগুলো আগের কোনো টাস্কে জমা পড়েছিল (gmail_dedup.py); dup_tasks: সেই টাস্কগুলোর কয়েকটা
+  payout:       (row_count - dup_rows) × settings.task_price (পার্স হওয়ার সময়ের দাম)
+এডমিন কার্ডে এগুলো দেখায়, তাই প্রতিটা ফাইল খুলে দেখতে হয় না।
+"""
+import io
+import logging
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import text
+
+import gmail_dedup
+from lazy import ForkSafeLazy
+
+log = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_PARSING = "parsing"
+STATUS_PARSED = "parsed"
+STATUS_FAILED = "failed"
+
+MAX_ROWS = 5000
+MAX_BYTES = 5 * 1024 * 1024
+MAX_ERRORS = 5
+
+GMAIL_RE = re.compile(r"^[a-z0-9][a-z0-9.]{4,28}[a-z0-9]@gmail\.com$")
+
+
+# ---- process pool এ চলে: module-level আর শুধু bytes/dict আদান-প্রদান
+def parse_task_xlsx(data: bytes, max_rows=MAX_ROWS) -> dict:
+    """
+    প্রথম শিটের প্রথম কলাম = Gmail ঠিকানা (বাকি কলাম — পাসওয়ার্ড ইত্যাদি — শুধু খালি কিনা দেখা হয়)।
+    read_only: রো এক এক করে আসে, পুরো শিট মেমোরিতে নেয় না। হেডার আর খালি রো বাদ।
+    একই ইনবক্স (gmail_dedup.normalize) দুইবার থাকলে একবার গোনা হয়।
+    return {"rows", "invalid", "duplicates", "errors", "hashes"}
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        seen, invalid, duplicates, errors = set(), 0, 0, []
+        for line_no, row in enumerate(wb.worksheets[0].iter_rows(values_only=True), start=1):
+            cells = [str(c).strip() for c in row if c is not None and str(c).strip()]
+            if not cells:
+                continue
+            email = cells[0].lower()
+            if not GMAIL_RE.match(email):
+                if line_no == 1 and "@" not in email:
+                    continue  # হেডার
+                invalid += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append(f"line {line_no}: Gmail নয় ({cells[0][:40]})")
+                continue
+            if len(cells) < 2:
+                invalid += 1
+                if len(errors) < MAX_ERRORS:
+                    errors.append(f"line {line_no}: পাসওয়ার্ড নেই")
+                continue
+            h = gmail_dedup.addr_hash(email)
+            if h in seen:
+                duplicates += 1
+                continue
+            seen.add(h)
+            if len(seen) + invalid + duplicates > max_rows:
+                raise ValueError(f"সর্বোচ্চ {max_rows} রো")
+        return {"rows": len(seen), "invalid": invalid, "duplicates": duplicates, "errors": errors,
+                "hashes": list(seen)}
+    finally:
+        wb.close()
+
+
+# describe() এর আর্গুমেন্টের ক্রমে — কার্ডের SELECT এ এভাবেই বসাও
+SUMMARY_COLUMNS = "parse_status, row_count, invalid_rows, payout, parse_error, dup_rows, dup_tasks, duplicate_of"
+
+
+def describe(parse_status, row_count, invalid_rows, payout, parse_error,
+             dup_rows=None, dup_tasks=None, duplicate_of=None) -> str:
+    """এডমিন কার্ড/লিস্টে ফাইলের সারাংশ"""
+    lines = [f"♻️ হুবহু একই ফাইল আগে জমা: Task #{duplicate_of}"] if duplicate_of else []
+    if parse_status == STATUS_PARSED:
+        line = f"📊 {row_count} Gmail → 💵 {float(payout or 0):g}৳"
+        if invalid_rows:
+            line += f" (❌ {invalid_rows} বাদ)"
+        lines.append(line)
+        if dup_rows:
+            lines.append(f"🔁 {dup_rows} টা আগে জমা পড়েছে" + (f" (Task {dup_tasks})" if dup_tasks else ""))
+        if parse_error:
+            lines.append(parse_error)
+    elif parse_status == STATUS_FAILED:
+        lines.append(f"⚠️ ফাইল পড়া যায়নি: {parse_error or '—'}")
+    elif parse_status in (STATUS_QUEUED, STATUS_PARSING):
+        lines.append("⏳ ফাইল যাচাই চলছে...")
+    else:
+        lines.append("📄 যাচাই হয়নি")
+    return "\n".join(lines)
+
+
+def _new_pool(workers):
+    # thread চলা process থেকে fork নিরাপদ না, তাই spawn; worker শুধু এই module import করে
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+class TaskIngestor:
+    """
+    run_pending(): queued টাস্ক ব্যাচে ধরে (SKIP LOCKED — একাধিক worker নিরাপদ), ফাইল নামিয়ে
+    process pool এ পার্স করায়, ফলাফল লেখে (PeriodicTask এর fn)। return কতগুলো প্রসেস হলো।
+    download(file_id) -> bytes: Telegram থেকে ফাইল (bot.py দেয়)।
+    index: gmail_dedup.GmailIndex — আগের টাস্কের সাথে মিলিয়ে দেখা; None হলে বন্ধ।
+    parsing অবস্থায় stale_after সেকেন্ডের বেশি আটকে থাকলে (worker মারা গেছে) আবার ধরা হয়।
+    """
+
+    def __init__(self, engine, download, index=None, workers=2, batch_size=20, stale_after=600):
+        self.engine = engine
+        self.download = download
+        self.index = index
+        self.batch_size = batch_size
+        self.stale_after = stale_after
+        self.pool = ForkSafeLazy("xlsx_pool", lambda: _new_pool(workers))
+        self._lock = threading.Lock()
+        self._counts = {"parsed": 0, "failed": 0}
+
+    def _claim(self):
+        with self.engine.begin() as conn:
+            return conn.execute(text("""
+                UPDATE tasks SET parse_status = :parsing, parsed_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT id FROM tasks
+                    WHERE parse_status = :queued
+                       OR (parse_status = :parsing AND parsed_at < CURRENT_TIMESTAMP - :stale * interval '1 second')
+                    ORDER BY id LIMIT :n
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, user_id, file_id
+            """), {"parsing": STATUS_PARSING, "queued": STATUS_QUEUED,
+                   "stale": self.stale_after, "n": self.batch_size}).fetchall()
+
+    def run_pending(self) -> int:
+        done = 0
+        while True:
+            batch = self._claim()
+            if not batch:
+                return done
+            # ডাউনলোড (network) এখানে, পার্স (CPU) pool এ — পরের ফাইল নামানোর সময় আগেরটা পার্স হয়
+            futures = []
+            for tid, uid, file_id in batch:
+                try:
+                    data = self.download(file_id)
+                    if len(data) > MAX_BYTES:
+                        raise ValueError(f"ফাইল বড় ({len(data) // 1024} KB)")
+                    futures.append((tid, uid, self.pool.submit(parse_task_xlsx, data)))
+                except Exception as e:
+                    log.warning("task %s download failed: %s", tid, e)
+                    self._store_failure(tid, e)
+            for tid, uid, future in futures:
+                try:
+                    self._store(tid, uid, future.result())
+                except Exception as e:
+                    log.warning("task %s parse failed: %s", tid, e)
+                    self._store_failure(tid, e)
+            done += len(batch)
+
+    def _store(self, tid, uid, result):
+        with self.engine.begin() as conn:
+            dups = self.index.record(conn, tid, uid, result["hashes"]) if self.index else {}
+            earlier = sorted({t for t in dups.values() if t is not None})
+            dup_tasks = ", ".join(f"#{t}" for t in earlier[:5]) + (" ..." if len(earlier) > 5 else "")
+            conn.execute(text("""
+                UPDATE tasks
+                SET parse_status = :st, row_count = :rows, invalid_rows = :bad, parse_error = :err,
+                    dup_rows = :dups, dup_tasks = :dup_tasks,
+                    payout = (:rows - :dups)
+                             * COALESCE((SELECT CAST(value AS NUMERIC) FROM settings WHERE key = 'task_price'), 0),
+                    parsed_at = CURRENT_TIMESTAMP
+                WHERE id = :id
+            """), {"id": tid, "st": STATUS_PARSED, "rows": result["rows"],
+                   "bad": result["invalid"] + result["duplicates"],
+                   "err": "\n".join(result["errors"]) or None,
+                   "dups": len(dups), "dup_tasks": dup_tasks or None})
+        with self._lock:
+            self._counts["parsed"] += 1
+
+    def _store_failure(self, tid, exc):
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE tasks SET parse_status = :st, parse_error = :err, parsed_at = CURRENT_TIMESTAMP
+                WHERE id = :id
+            """), {"id": tid, "st": STATUS_FAILED, "err": str(exc)[:200]})
+        with self._lock:
+            self._counts["failed"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {**self._counts, "pool": self.pool.initialized}
+        if self.index:
+            counts["dedup"] = self.index.stats()
+        return counts
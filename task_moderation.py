@@ -0,0 +1,67 @@
+"""
+টাস্ক approve/reject — একটা হোক বা শত শত, সবসময় একটাই শর্তসাপেক্ষ UPDATE (শুধু Pending রো)।
+Selection: ids (id = ANY), একজন ইউজারের সব, বা id রেঞ্জ — একাধিক দিলে সবগুলো মিলতে হবে।
+ফলাফল ইউজার ধরে ভাগ করা, যাতে প্রত্যেক ইউজার একটাই মেসেজ পায়।
+"""
+from collections import namedtuple
+
+from sqlalchemy import text
+
+import stats
+
+Selection = namedtuple("Selection", "ids user lo hi")
+Selection.__new__.__defaults__ = (None, None, None, None)
+
+USAGE = (
+    "/approve_tasks বা /reject_tasks এর সাথে:\n"
+    "  12 15 19        — এই টাস্কগুলো\n"
+    "  100-200         — id রেঞ্জ\n"
+    "  user 123456789  — এই ইউজারের সব Pending"
+)
+
+
+def parse_selection(args) -> Selection:
+    """কমান্ডের আর্গুমেন্ট (USAGE দেখো); ভুল হলে ValueError"""
+    if len(args) == 2 and args[0].lower() == "user":
+        return Selection(user=int(args[1]))
+    if len(args) == 1 and "-" in args[0]:
+        lo, hi = (int(x) for x in args[0].split("-", 1))
+        if lo > hi:
+            raise ValueError(args[0])
+        return Selection(lo=lo, hi=hi)
+    if args:
+        return Selection(ids=[int(a) for a in args])
+    raise ValueError("empty selection")
+
+
+def decide(conn, sel: Selection, approve: bool) -> dict:
+    """
+    return {user_id: [task_id, ...]} — শুধু যেগুলো এইবার Pending থেকে বদলাল
+    (আগেই প্রসেস হওয়া বা না থাকা id বাদ; দুইবার চাপলে দ্বিতীয়বার খালি আসে)
+    """
+    conds, params = ["status = 'Pending'"], {"st": "Approved" if approve else "Rejected"}
+    if sel.ids is not None:
+        conds.append("id = ANY(:ids)")
+        params["ids"] = list(sel.ids)
+    if sel.user is not None:
+        conds.append("user_id = :user")
+        params["user"] = sel.user
+    if sel.lo is not None:
+        conds.append("id BETWEEN :lo AND :hi")
+        params["lo"], params["hi"] = sel.lo, sel.hi
+    if len(conds) == 1:
+        raise ValueError("selection has no condition")
+
+    rows = conn.execute(text(f"""
+        UPDATE tasks SET status = :st
+        WHERE {" AND ".join(conds)}
+        RETURNING id, user_id
+    """), params).fetchall()
+    if rows:
+        stats.bump(conn, {"tasks:Pending": -len(rows), f"tasks:{params['st']}": len(rows)},
+                   {"tasks_approved" if approve else "tasks_rejected": len(rows)})
+
+    by_user = {}
+    for tid, uid in sorted(rows):
+        by_user.setdefault(uid, []).append(tid)
+    return by_user
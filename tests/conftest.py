@@ -0,0 +1,5 @@
+import os
+import sys
+
+# মডিউলগুলো রিপোর রুটে (flat) — `python -m pytest` যেখান থেকেই চালানো হোক
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,20 @@
+import math
+
+from balance_ops import REF_BONUS_RATE, ref_bonus
+
+
+def test_ref_bonus_floors():
+    assert ref_bonus(100) == 3
+    assert ref_bonus(50) == 1
+    assert ref_bonus(33) == 0
+
+
+def test_ref_bonus_only_on_credit():
+    assert ref_bonus(0) == 0
+    assert ref_bonus(-100) == 0
+
+
+def test_ref_bonus_matches_bulk_credit_sql():
+    # bulk_credit SQL এ FLOOR(amount * rate) — দুই পথে একই বোনাস
+    for amount in range(1, 2000):
+        assert ref_bonus(amount) == math.floor(amount * REF_BONUS_RATE)
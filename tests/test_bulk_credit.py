@@ -0,0 +1,85 @@
+import io
+
+import pytest
+
+import bulk_credit
+from bulk_credit import MAX_AMOUNT, MAX_USER_ID, parse_credit_file
+
+
+def parse_csv(body: str):
+    return parse_credit_file("credit.csv", body.encode("utf-8"))
+
+
+def test_header_and_blank_rows_skipped():
+    credits, errors = parse_csv("user_id,amount\n\n101,50\n102,20\n")
+    assert credits == {101: 50, 102: 20}
+    assert errors == []
+
+
+def test_duplicate_users_are_summed():
+    credits, errors = parse_csv("101,50\n101,25\n")
+    assert credits == {101: 75}
+    assert errors == []
+
+
+def test_excel_bom_and_semicolon_delimiter():
+    credits, errors = parse_credit_file("credit.csv", "\ufeffuser_id;amount\r\n101;50\r\n".encode("utf-8"))
+    assert credits == {101: 50}
+    assert errors == []
+
+
+def test_fraction_rejected_not_truncated():
+    credits, errors = parse_csv("101,10.7\n102,100.0\n")
+    assert credits == {102: 100}
+    assert errors == ["line 1: পূর্ণসংখ্যা নয় (101, 10.7)"]
+
+
+def test_not_a_number_after_header_is_an_error():
+    credits, errors = parse_csv("101,50\nabc,10\n102,inf\n")
+    assert credits == {101: 50}
+    assert [e.split(":")[0] for e in errors] == ["line 2", "line 3"]
+
+
+def test_huge_values_do_not_overflow():
+    # 1e30 আগে float হয়ে int এ গেলে চুপচাপ বিশাল ক্রেডিট হত
+    credits, errors = parse_csv(f"101,1e30\n{MAX_USER_ID + 1},5\n102,{MAX_AMOUNT + 1}\n")
+    assert credits == {}
+    assert len(errors) == 3
+
+
+def test_non_positive_values_rejected():
+    credits, errors = parse_csv("0,5\n101,0\n102,-3\n")
+    assert credits == {}
+    assert len(errors) == 3
+
+
+def test_per_user_total_capped():
+    credits, errors = parse_csv(f"101,{MAX_AMOUNT}\n101,1\n")
+    assert credits == {101: MAX_AMOUNT}
+    assert errors[0].startswith("line 2: amount অনেক বড়")
+
+
+def test_missing_second_column():
+    credits, errors = parse_csv("101,50\n102\n")
+    assert credits == {101: 50}
+    assert errors == ["line 2: দুইটা কলাম লাগবে"]
+
+
+def test_too_many_users(monkeypatch):
+    monkeypatch.setattr(bulk_credit, "MAX_ROWS", 2)
+    with pytest.raises(ValueError):
+        parse_csv("1,1\n2,1\n3,1\n")
+
+
+def test_xlsx_numeric_cells():
+    openpyxl = pytest.importorskip("openpyxl")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["user_id", "amount"])
+    ws.append([101, 50.0])
+    ws.append([102, 7.5])
+    buf = io.BytesIO()
+    wb.save(buf)
+    credits, errors = parse_credit_file("credit.xlsx", buf.getvalue())
+    assert credits == {101: 50}
+    assert errors == ["line 3: পূর্ণসংখ্যা নয় (102, 7.5)"]
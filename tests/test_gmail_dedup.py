@@ -0,0 +1,54 @@
+import random
+
+from gmail_dedup import BloomFilter, addr_hash, normalize
+
+
+def test_normalize_gmail_variants():
+    assert normalize(" John.Doe+tasks@GMAIL.com ") == "johndoe@gmail.com"
+    assert normalize("johndoe@googlemail.com") == "johndoe@gmail.com"
+
+
+def test_hash_same_inbox():
+    assert addr_hash("j.o.h.n.doe+1@gmail.com") == addr_hash("JohnDoe@googlemail.com")
+    assert addr_hash("johndoe@gmail.com") != addr_hash("johndoe1@gmail.com")
+
+
+def test_hash_fits_signed_bigint():
+    hashes = [addr_hash(f"user{i}@gmail.com") for i in range(2000)]
+    assert all(-2 ** 63 <= h < 2 ** 63 for h in hashes)
+    assert any(h < 0 for h in hashes)  # signed — নেগেটিভ মানও আসে
+    assert len(set(hashes)) == len(hashes)
+
+
+def test_bloom_no_false_negatives():
+    bloom = BloomFilter(1000)
+    hashes = [addr_hash(f"user{i}@gmail.com") for i in range(1000)]
+    for h in hashes:
+        bloom.add(h)
+    assert bloom.count == 1000
+    assert all(h in bloom for h in hashes)
+
+
+def test_bloom_false_positive_rate():
+    bloom = BloomFilter(5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(addr_hash(f"member{i}@gmail.com"))
+    rng = random.Random(1)
+    probes = [addr_hash(f"probe{rng.random()}@gmail.com") for _ in range(20000)]
+    rate = sum(h in bloom for h in probes) / len(probes)
+    assert rate < 0.03
+
+
+def test_bloom_sizing():
+    bloom = BloomFilter(1_000_000, error_rate=0.01)
+    # ~9.6 bit/key, k = 7
+    assert 9_000_000 < bloom.bits < 10_000_000
+    assert bloom.hashes == 7
+    assert len(bloom._array) == (bloom.bits + 7) // 8
+    assert BloomFilter(0).capacity == 1
+
+
+def test_bloom_empty():
+    bloom = BloomFilter(100)
+    assert addr_hash("x@gmail.com") not in bloom
+    assert 0 not in bloom
@@ -0,0 +1,43 @@
+from idempotency import UpdateDedup
+
+
+def test_unseen_until_remembered():
+    dedup = UpdateDedup(maxsize=10)
+    assert not dedup.recently_seen(1)
+    dedup.remember(1)
+    assert dedup.recently_seen(1)
+    assert not dedup.recently_seen(2)
+
+
+def test_evicts_least_recently_used():
+    dedup = UpdateDedup(maxsize=3)
+    for update_id in (1, 2, 3):
+        dedup.remember(update_id)
+    assert dedup.recently_seen(1)  # 1 আবার সাম্প্রতিক, এবার 2 সবচেয়ে পুরনো
+    dedup.remember(4)
+    assert not dedup.recently_seen(2)
+    assert all(dedup.recently_seen(u) for u in (1, 3, 4))
+    assert dedup.stats()["lru_size"] == 3
+
+
+def test_remember_twice_keeps_one_entry():
+    dedup = UpdateDedup(maxsize=2)
+    dedup.remember(1)
+    dedup.remember(2)
+    dedup.remember(1)
+    dedup.remember(3)
+    assert dedup.recently_seen(1)
+    assert not dedup.recently_seen(2)
+    assert dedup.stats()["lru_size"] == 2
+
+
+def test_stats_count_lru_drops():
+    dedup = UpdateDedup(maxsize=5)
+    dedup.remember(1)
+    dedup.recently_seen(1)
+    dedup.recently_seen(1)
+    dedup.recently_seen(2)
+    stats = dedup.stats()
+    assert stats["dropped_lru"] == 2
+    assert stats["claimed"] == 0
+    assert stats["lru_maxsize"] == 5
@@ -0,0 +1,59 @@
+import pytest
+
+import payouts
+from payouts import export_csv, parse_decisions
+
+
+def parse_csv(body: str):
+    return parse_decisions("payout.csv", body.encode("utf-8"))
+
+
+def test_round_trip_with_exported_file():
+    spool, summary = export_csv([(1, "📲 Bkash", "017", 100, 11), (2, "📲 Nagad", "018", 50, 12)])
+    try:
+        body = spool.read().decode("utf-8-sig")
+    finally:
+        spool.close()
+    assert summary == {"📲 Bkash": (1, 100), "📲 Nagad": (1, 50)}
+    lines = body.splitlines()
+    assert lines[0] == ",".join(payouts.CSV_COLUMNS)
+    lines[1] += "A"
+    lines[2] += "r"
+    decisions, errors = parse_csv("\n".join(lines))
+    assert decisions == {1: True, 2: False}
+    assert errors == []
+
+
+def test_columns_found_by_header():
+    decisions, errors = parse_csv("Decision,note,ID\nyes,x,7\n❌,y,8\n")
+    assert decisions == {7: True, 8: False}
+    assert errors == []
+
+
+def test_without_header_first_and_last_columns():
+    decisions, errors = parse_csv("5,bkash,017,100,11,paid\n")
+    assert decisions == {5: True}
+    assert errors == []
+
+
+def test_blank_decision_skipped():
+    decisions, errors = parse_csv("id,decision\n1,\n2,  \n\n3,A\n")
+    assert decisions == {3: True}
+    assert errors == []
+
+
+def test_bad_rows_reported():
+    decisions, errors = parse_csv("id,decision\nabc,A\n4,maybe\n5,R\n")
+    assert decisions == {5: False}
+    assert [e.split(":")[0] for e in errors] == ["line 2", "line 3"]
+
+
+def test_later_row_overrides():
+    decisions, _ = parse_csv("id,decision\n9,A\n9,R\n")
+    assert decisions == {9: False}
+
+
+def test_too_many_decisions(monkeypatch):
+    monkeypatch.setattr(payouts, "MAX_DECISIONS", 1)
+    with pytest.raises(ValueError):
+        parse_csv("id,decision\n1,A\n2,A\n")
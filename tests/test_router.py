@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+
+from router import CALLBACK_VERSION, Router, callback_data
+
+ADMIN = 1
+USER = 2
+
+
+def make_router():
+    calls = []
+    router = Router(is_admin=lambda uid: uid == ADMIN, state_of=lambda uid: None)
+    router.on_denied_callback = lambda call: calls.append(("denied", call.data))
+
+    @router.callback("wa", legacy="approve", admin=True)
+    def approve(call, payload):
+        calls.append(("approve", payload))
+
+    @router.callback("ta", legacy="tapprove", admin=True)
+    def task_approve(call, payload):
+        calls.append(("tapprove", payload))
+
+    @router.callback("cj")
+    def check_join(call, payload):
+        calls.append(("check_join", payload))
+
+    return router, calls
+
+
+def call(data, uid=ADMIN):
+    return SimpleNamespace(data=data, from_user=SimpleNamespace(id=uid))
+
+
+def test_callback_data_format():
+    assert callback_data("wa", 42) == f"{CALLBACK_VERSION}wa:42"
+    assert callback_data("x", 1, "b") == f"{CALLBACK_VERSION}x:1:b"
+    assert callback_data("cj") == f"{CALLBACK_VERSION}cj:"
+
+
+def test_callback_data_length_limit():
+    callback_data("x", "a" * (64 - len(CALLBACK_VERSION) - 2))
+    with pytest.raises(ValueError):
+        callback_data("x", "a" * (64 - len(CALLBACK_VERSION) - 1))
+    with pytest.raises(ValueError):
+        callback_data("x", "৳" * 21)  # সীমা বাইটে, অক্ষরে না
+
+
+def test_dispatch_versioned():
+    router, calls = make_router()
+    assert router.dispatch_callback(call(callback_data("wa", 42)))
+    assert router.dispatch_callback(call(callback_data("ta", 7, 3)))
+    assert calls == [("approve", "42"), ("tapprove", "7:3")]
+
+
+def test_dispatch_legacy_prefix():
+    router, calls = make_router()
+    assert router.dispatch_callback(call("approve_42"))
+    assert router.dispatch_callback(call("tapprove_7"))
+    assert calls == [("approve", "42"), ("tapprove", "7")]
+
+
+def test_unknown_callbacks_not_handled():
+    router, calls = make_router()
+    for data in ("", "approve", "1wa", "9wa:42", "nope_1", "1zz:1"):
+        assert not router.dispatch_callback(call(data))
+    assert router.dispatch_callback(SimpleNamespace(data=None, from_user=SimpleNamespace(id=ADMIN))) is False
+    assert calls == []
+
+
+def test_admin_callback_denied():
+    router, calls = make_router()
+    assert router.dispatch_callback(call(callback_data("wa", 42), uid=USER))
+    assert router.dispatch_callback(call("approve_42", uid=USER))
+    assert router.dispatch_callback(call(callback_data("cj"), uid=USER))
+    assert calls == [("denied", "1wa:42"), ("denied", "approve_42"), ("check_join", "")]
+
+
+def test_duplicate_routes_rejected():
+    router, _ = make_router()
+    with pytest.raises(ValueError):
+        router.callback("wa")(lambda call, payload: None)
+    with pytest.raises(ValueError):
+        router.callback("zz", legacy="approve")(lambda call, payload: None)
+
+
+def test_observe_reports_failure():
+    router, _ = make_router()
+    seen = []
+    router.observe = lambda handler, route, seconds, ok: seen.append((handler, route, ok))
+
+    @router.callback("bx")
+    def boom(call, payload):
+        raise RuntimeError("x")
+
+    with pytest.raises(RuntimeError):
+        router.dispatch_callback(call(callback_data("bx")))
+    router.dispatch_callback(call("approve_1"))
+    assert seen == [("boom", "1bx", False), ("approve", "approve", True)]
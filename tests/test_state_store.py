@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+import state_store
+from state_store import MemoryStateStore, RedisStateStore, StateStore
+
+
+class Clock:
+    """time.monotonic এর বদলে — MemoryStateStore এর মেয়াদ ঘুম ছাড়াই পার করা যায়"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(state_store.time, "monotonic", c)
+    return c
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return MemoryStateStore(ttl=60)
+    return RedisStateStore(request.getfixturevalue("redis_client"), ttl=60)
+
+
+def test_state_store_is_abstract():
+    with pytest.raises(TypeError):
+        StateStore()
+
+
+def test_round_trip(store):
+    assert store.get(42) is None
+    store.set(42, {"step": "withdraw_amount", "method": "bKash"})
+    assert store.get(42) == {"step": "withdraw_amount", "method": "bKash"}
+    store.set(42, {"step": "withdraw_number"})
+    assert store.get(42) == {"step": "withdraw_number"}
+    store.delete(42)
+    assert store.get(42) is None
+    store.delete(42)  # আবার মুছলেও সমস্যা নেই
+
+
+def test_keys_are_independent(store):
+    store.set(1, {"a": 1})
+    store.set(2, {"b": 2})
+    store.delete(1)
+    assert store.get(1) is None
+    assert store.get(2) == {"b": 2}
+
+
+def test_memory_returns_copies():
+    store = MemoryStateStore(ttl=60)
+    value = {"step": "x"}
+    store.set(7, value)
+    value["step"] = "changed"
+    got = store.get(7)
+    got["step"] = "changed again"
+    assert store.get(7) == {"step": "x"}
+
+
+def test_memory_ttl_expiry(clock):
+    store = MemoryStateStore(ttl=60)
+    store.set(7, {"step": "x"})
+    clock.now += 59
+    assert store.get(7) == {"step": "x"}
+    store.set(7, {"step": "y"})  # set() এ TTL নতুন করে শুরু
+    clock.now += 59
+    assert store.get(7) == {"step": "y"}
+    clock.now += 2
+    assert store.get(7) is None
+
+
+def test_memory_sweep_drops_expired(clock):
+    store = MemoryStateStore(ttl=10, sweep_interval=5)
+    store.set(1, {"a": 1})
+    clock.now += 11
+    store.set(2, {"b": 2})
+    assert len(store) == 1
+
+
+def test_redis_namespace_and_ttl(redis_client):
+    store = RedisStateStore(redis_client, namespace="admin", ttl=60)
+    store.set(7, {"step": "x"})
+    assert redis_client.exists("state:admin:7")
+    assert 0 < redis_client.ttl("state:admin:7") <= 60
+    assert RedisStateStore(redis_client, namespace="conv", ttl=60).get(7) is None
+
+
+def test_redis_ttl_expiry(redis_client):
+    store = RedisStateStore(redis_client, ttl=1)
+    store.set(7, {"step": "x"})
+    assert store.get(7) == {"step": "x"}
+    time.sleep(1.1)
+    assert store.get(7) is None